@@ -1,11 +1,31 @@
-from flask import Flask
-from app.routes.home import home_bp
-from app.routes.files import files_bp
-from app.routes.emg import emg_bp
-from app.routes.imu import imu_bp
+import multiprocessing
 
-def create_app():
+from config import Config
+from app.utils.resource_governor import governor
+
+def create_app(config_class=Config):
+    # BLAS/OpenMP read their thread counts when first imported, so the limits
+    # are applied before the routes import NumPy and the ML libraries. Done
+    # here rather than at import time so that importing a utility module
+    # (offline tools, model workers) leaves the environment alone.
+    governor.configure(config_class)
+    governor.apply_thread_limits()
+    
+    from flask import Flask
+    from app.routes.home import home_bp
+    from app.routes.files import files_bp
+    from app.routes.emg import emg_bp
+    from app.routes.imu import imu_bp
+    from app.utils.model_registry import registry
+    from app.utils import static_assets
+    
     app = Flask(__name__)
+    app.config.from_object(config_class)
+    
+    # Pin request threads to the web cores, if configured. They are short-lived
+    # (and greenlets under gevent), so they are pinned but not tracked.
+    if governor.core_sets['web']:
+        app.before_request(lambda: governor.pin_current_thread('web', track=False))
     
     # Register blueprints
     app.register_blueprint(home_bp, url_prefix='/')
@@ -13,4 +33,27 @@ def create_app():
     app.register_blueprint(emg_bp, url_prefix='/emg')
     app.register_blueprint(imu_bp, url_prefix='/imu')
     
-    return app 
\ No newline at end of file
+    # Fingerprinted, precompressed static assets (asset_url() in templates)
+    static_assets.init_app(app)
+    
+    # A spawned model worker that imports the app must not start a pool or a
+    # warm-up of its own
+    if multiprocessing.parent_process() is not None:
+        return app
+    
+    # Use the shared model server instead of in-process models if one is configured
+    if app.config.get('MODEL_SERVER_SOCKET'):
+        from app.utils.model_server import register_remote_models
+        register_remote_models(registry,
+                               app.config['MODEL_SERVER_AUTHKEY'],
+                               app.config['MODEL_SERVER_SOCKET'])
+    elif app.config.get('ML_EXECUTION_MODE') == 'process':
+        from app.utils.process_pool import register_process_models
+        register_process_models(registry, app.config['ML_WORKER_PROCESSES'])
+    
+    # Models load in the background so the web UI is available immediately;
+    # /api/models/status reports when they are ready
+    if app.config.get('MODEL_WARMUP', True):
+        registry.start_warmup()
+    
+    return app
@@ -1,12 +1,20 @@
-from flask import Blueprint, render_template, jsonify, send_file, abort
+from flask import Blueprint, render_template, jsonify, send_file, abort, request, Response
+from werkzeug.utils import safe_join
 import os
 import json
 import csv
 import datetime
 import pandas as pd
 
+from app.utils.compression import negotiate_encoding, compress_stream
+
 files_bp = Blueprint('files', __name__, url_prefix='/files')
 
+# Rows parsed at a time when streaming a file's contents
+READ_CHUNK_ROWS = 5000
+# Bytes read at a time when streaming a download
+DOWNLOAD_BLOCK_SIZE = 64 * 1024
+
 @files_bp.route('/')
 def files():
     """Render the file browser page."""
@@ -29,85 +37,119 @@ def get_files():
 
 @files_bp.route('/api/files/<filename>')
 def get_file(filename):
-    """Get the contents of a specific file with metadata."""
-    data_dir = os.path.join(os.getcwd(), 'data')
-    print(f"Data directory: {data_dir}")
-    file_path = os.path.join(data_dir, filename)
-    
-    # Check if file exists
-    if not os.path.exists(file_path):
-        abort(404)
+    """
+    Get the contents of a specific file with metadata.
+
+    The JSON document is streamed chunk by chunk from a chunked CSV reader,
+    so memory use doesn't grow with the file size. Headers and rows come
+    first; the metadata (with the final record count) closes the document.
+    """
+    file_path = data_file_path(filename)
     
     # Get file metadata
     file_stats = os.stat(file_path)
-    size_bytes = file_stats.st_size
-    created_timestamp = file_stats.st_ctime
-    
-    # Format file size
-    if size_bytes < 1024:
-        size_str = f"{size_bytes} bytes"
-    elif size_bytes < 1024 * 1024:
-        size_str = f"{size_bytes/1024:.1f} KB"
-    else:
-        size_str = f"{size_bytes/(1024*1024):.1f} MB"
+    metadata = {
+        'filename': filename,
+        'created': file_stats.st_ctime,
+        'size': format_size(file_stats.st_size)
+    }
     
     try:
-        # Determine file type by name to parse correctly
-        if '_emg' in filename:
-            # EMG file format
-            df = pd.read_csv(file_path)
-            headers = df.columns.tolist()
-            data = df.to_dict('records')
-        elif '_imu' in filename:
-            # IMU file format
-            df = pd.read_csv(file_path)
-            headers = df.columns.tolist()
-            data = df.to_dict('records')
-        else:
-            # Generic CSV format
-            df = pd.read_csv(file_path)
-            headers = df.columns.tolist()
-            data = df.to_dict('records')
-        
-        # Create response
-        response = {
-            'metadata': {
-                'filename': filename,
-                'created': created_timestamp,
-                'size': size_str,
-                'records': len(data)
-            },
-            'headers': headers,
-            'data': data
-        }
-        
-        return jsonify(response)
-    
+        # Reading the header row up front turns unreadable files into a
+        # normal error response before streaming starts
+        headers = pd.read_csv(file_path, nrows=0).columns.tolist()
     except Exception as e:
         return jsonify({
             'error': f"Error reading file: {str(e)}",
-            'metadata': {
-                'filename': filename,
-                'created': created_timestamp,
-                'size': size_str
-            },
+            'metadata': metadata,
             'headers': [],
             'data': []
         })
+    
+    def generate():
+        yield '{"headers":' + json.dumps(headers) + ',"data":['
+        records = 0
+        tail = {}
+        try:
+            for chunk in pd.read_csv(file_path, chunksize=READ_CHUNK_ROWS):
+                if not len(chunk):
+                    continue
+                # Strip the brackets of each chunk's array to join them into one
+                yield (',' if records else '') + chunk.to_json(orient='records')[1:-1]
+                records += len(chunk)
+        except Exception as e:
+            # Headers are already sent; report the error at the end of the document
+            print(f"[ERROR] Error streaming {filename}: {e}")
+            tail['error'] = f"Error reading file: {str(e)}"
+        tail['metadata'] = dict(metadata, records=records)
+        yield '],' + json.dumps(tail)[1:]
+    
+    return compressed_response(generate(), 'application/json')
 
 @files_bp.route('/api/files/<filename>/download')
 def download_file(filename):
-    """Download a specific file."""
-    data_dir = os.path.join(os.getcwd(), 'data')
-    file_path = os.path.join(data_dir, filename)
+    """
+    Download a specific file.
+
+    Range requests (e.g. resumed downloads) and conditional requests are
+    answered from the file as is; otherwise the file is streamed compressed
+    if the client accepts it.
+    """
+    file_path = data_file_path(filename)
     
-    # Check if file exists
-    if not os.path.exists(file_path):
-        abort(404)
+    encoding = None if request.range else negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        response = send_file(
+            file_path,
+            mimetype='text/csv',
+            as_attachment=True,
+            download_name=filename,
+            conditional=True
+        )
+        response.vary.add('Accept-Encoding')
+        return response
     
-    return send_file(
-        file_path,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=filename
-    ) 
\ No newline at end of file
+    def read_blocks():
+        with open(file_path, 'rb') as f:
+            while True:
+                block = f.read(DOWNLOAD_BLOCK_SIZE)
+                if not block:
+                    return
+                yield block
+    
+    response = compressed_response(read_blocks(), 'text/csv', encoding)
+    response.headers.set('Content-Disposition', 'attachment', filename=filename)
+    return response
+
+def data_file_path(filename):
+    """Path of a file in the data directory; aborts with 404 if there is none"""
+    data_dir = os.path.join(os.getcwd(), 'data')
+    file_path = safe_join(data_dir, filename)
+    if file_path is None or not os.path.isfile(file_path):
+        abort(404)
+    return file_path
+
+def format_size(size_bytes):
+    """Human-readable file size"""
+    if size_bytes < 1024:
+        return f"{size_bytes} bytes"
+    elif size_bytes < 1024 * 1024:
+        return f"{size_bytes/1024:.1f} KB"
+    return f"{size_bytes/(1024*1024):.1f} MB"
+
+def compressed_response(chunks, mimetype, encoding=None):
+    """
+    Streamed response, compressed with the best encoding the client accepts
+
+    Args:
+        chunks: Iterable of str/bytes body chunks
+        mimetype: Content type of the body
+        encoding: Encoding to use; negotiated from Accept-Encoding if None
+    """
+    if encoding is None:
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    response = Response(compress_stream(chunks, encoding), mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
@@ -19,29 +19,18 @@ document.addEventListener('DOMContentLoaded', function() {
     const imuGyroPlot = document.getElementById('imu-gyro-plot');
     const emgLivePlot = document.getElementById('emg-live-plot');
     
-    // Data buffer for IMU plots
-    const dataBufferSize = 50;
-    const imuAccelData = {
-        x: Array(dataBufferSize).fill(0).map((_, i) => i),
-        accelX: Array(dataBufferSize).fill(0),
-        accelY: Array(dataBufferSize).fill(0),
-        accelZ: Array(dataBufferSize).fill(0)
-    };
+    // Display series computed by the server (/api/display): the plots only
+    // append new points and keep the last displayWindowSeconds of them
+    const displayWindowSeconds = 10;
+    const displayCursors = { emg: 0, imu: 0 };
+    let displayRequestPending = false;
     
-    const imuGyroData = {
-        x: Array(dataBufferSize).fill(0).map((_, i) => i),
-        gyroX: Array(dataBufferSize).fill(0),
-        gyroY: Array(dataBufferSize).fill(0),
-        gyroZ: Array(dataBufferSize).fill(0)
-    };
-    
-    // Data buffer for EMG plot
-    const emgData = {
-        x: Array(dataBufferSize).fill(0).map((_, i) => i),
-        bicep: Array(dataBufferSize).fill(0),
-        shoulder: Array(dataBufferSize).fill(0),
-        tricep: Array(dataBufferSize).fill(0)
-    };
+    // EMG channels, each drawn as a min/max band plus its RMS envelope
+    const emgChannels = [
+        { key: 'bicep', name: 'Bicep', color: '255, 87, 51' },
+        { key: 'shoulder', name: 'Shoulder', color: '46, 204, 113' },
+        { key: 'tricep', name: 'Tricep', color: '52, 152, 219' }
+    ];
     
     // IMU Data elements
     const accelX = document.getElementById('accel-x');
@@ -120,8 +109,8 @@ document.addEventListener('DOMContentLoaded', function() {
         if (imuAccelPlot) {
             Plotly.newPlot(imuAccelPlot, [
                 {
-                    x: imuAccelData.x,
-                    y: imuAccelData.accelX,
+                    x: [],
+                    y: [],
                     name: 'X',
                     mode: 'lines',
                     line: { 
@@ -133,8 +122,8 @@ document.addEventListener('DOMContentLoaded', function() {
                     fill: 'none'
                 },
                 {
-                    x: imuAccelData.x,
-                    y: imuAccelData.accelY,
+                    x: [],
+                    y: [],
                     name: 'Y',
                     mode: 'lines',
                     line: { 
@@ -146,8 +135,8 @@ document.addEventListener('DOMContentLoaded', function() {
                     fill: 'none'
                 },
                 {
-                    x: imuAccelData.x,
-                    y: imuAccelData.accelZ,
+                    x: [],
+                    y: [],
                     name: 'Z',
                     mode: 'lines',
                     line: { 
@@ -187,8 +176,8 @@ document.addEventListener('DOMContentLoaded', function() {
         if (imuGyroPlot) {
             Plotly.newPlot(imuGyroPlot, [
                 {
-                    x: imuGyroData.x,
-                    y: imuGyroData.gyroX,
+                    x: [],
+                    y: [],
                     name: 'X',
                     mode: 'lines',
                     line: { 
@@ -200,8 +189,8 @@ document.addEventListener('DOMContentLoaded', function() {
                     fill: 'none'
                 },
                 {
-                    x: imuGyroData.x,
-                    y: imuGyroData.gyroY,
+                    x: [],
+                    y: [],
                     name: 'Y',
                     mode: 'lines',
                     line: { 
@@ -213,8 +202,8 @@ document.addEventListener('DOMContentLoaded', function() {
                     fill: 'none'
                 },
                 {
-                    x: imuGyroData.x,
-                    y: imuGyroData.gyroZ,
+                    x: [],
+                    y: [],
                     name: 'Z',
                     mode: 'lines',
                     line: { 
@@ -252,50 +241,46 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Create EMG Plot
         if (emgLivePlot) {
-            Plotly.newPlot(emgLivePlot, [
-                {
-                    x: emgData.x,
-                    y: emgData.bicep,
-                    name: 'Bicep',
+            // Per channel: max (band top), min (filled up to the max) and RMS envelope
+            const emgTraces = [];
+            emgChannels.forEach(channel => {
+                emgTraces.push({
+                    x: [],
+                    y: [],
+                    name: channel.name,
+                    legendgroup: channel.key,
+                    showlegend: false,
+                    hoverinfo: 'skip',
                     mode: 'lines',
-                    line: { 
-                        color: 'rgba(255, 87, 51, 0.9)', 
-                        width: 2,
-                        shape: 'spline',
-                        smoothing: 1.3
-                    },
-                    fill: 'tozeroy',
-                    fillcolor: 'rgba(255, 87, 51, 0.1)'
-                },
-                {
-                    x: emgData.x,
-                    y: emgData.shoulder,
-                    name: 'Shoulder',
+                    line: { color: `rgba(${channel.color}, 0.3)`, width: 0 }
+                });
+                emgTraces.push({
+                    x: [],
+                    y: [],
+                    name: channel.name,
+                    legendgroup: channel.key,
+                    showlegend: false,
+                    hoverinfo: 'skip',
                     mode: 'lines',
-                    line: { 
-                        color: 'rgba(46, 204, 113, 0.9)', 
-                        width: 2,
-                        shape: 'spline',
-                        smoothing: 1.3
-                    },
-                    fill: 'tozeroy',
-                    fillcolor: 'rgba(46, 204, 113, 0.1)'
-                },
-                {
-                    x: emgData.x,
-                    y: emgData.tricep,
-                    name: 'Tricep',
+                    line: { color: `rgba(${channel.color}, 0.3)`, width: 0 },
+                    fill: 'tonexty',
+                    fillcolor: `rgba(${channel.color}, 0.15)`
+                });
+                emgTraces.push({
+                    x: [],
+                    y: [],
+                    name: channel.name,
+                    legendgroup: channel.key,
+                    yaxis: 'y2',
                     mode: 'lines',
                     line: { 
-                        color: 'rgba(52, 152, 219, 0.9)', 
-                        width: 2,
-                        shape: 'spline',
-                        smoothing: 1.3
-                    },
-                    fill: 'tozeroy',
-                    fillcolor: 'rgba(52, 152, 219, 0.1)'
-                }
-            ], {
+                        color: `rgba(${channel.color}, 0.9)`, 
+                        width: 2
+                    }
+                });
+            });
+            
+            Plotly.newPlot(emgLivePlot, emgTraces, {
                 ...commonLayout,
                 title: {
                     text: 'EMG Signals',
@@ -313,6 +298,17 @@ document.addEventListener('DOMContentLoaded', function() {
                         color: '#666'
                     }
                 },
+                // RMS envelope of the filtered signal, on its own scale
+                yaxis2: {
+                    overlaying: 'y',
+                    side: 'right',
+                    rangemode: 'tozero',
+                    showgrid: false,
+                    tickfont: {
+                        size: 9,
+                        color: '#666'
+                    }
+                },
                 height: 140
             }, {
                 responsive: true,
@@ -708,107 +704,86 @@ document.addEventListener('DOMContentLoaded', function() {
                     gyroY.textContent = data.imu.gyro_y.toFixed(2);
                     gyroZ.textContent = data.imu.gyro_z.toFixed(2);
                     
-                    // Update IMU plots
-                    updateIMUPlots(data.imu);
-                    
                     // Update EMG data text display
                     emgTime.textContent = data.emg.time;
                     emgBicep.textContent = data.emg.bicep;
                     emgShoulder.textContent = data.emg.shoulder;
                     emgTricep.textContent = data.emg.tricep;
                     
-                    // Update EMG plot
-                    updateEMGPlot(data.emg);
-                    
                     // Update ML results
                     updateMLResults(data);
                 })
                 .catch(error => {
                     console.error('Error fetching data:', error);
                 });
+            
+            updateDisplaySeries();
         }, 100);
     }
     
-    // Function to update IMU plots with new data
-    function updateIMUPlots(imuData) {
-        // Timestamps for hover information
-        const now = new Date();
-        const timestamp = now.toLocaleTimeString([], {hour: '2-digit', minute:'2-digit', second:'2-digit', fractionalSecondDigits: 3});
-        
-        // Shift out the oldest data point and add the new one for accelerometer
-        imuAccelData.accelX.shift();
-        imuAccelData.accelY.shift();
-        imuAccelData.accelZ.shift();
+    // Fetch the display points added since the last update and append them
+    function updateDisplaySeries() {
+        if (displayRequestPending) {
+            return;
+        }
+        displayRequestPending = true;
         
-        imuAccelData.accelX.push(imuData.accel_x);
-        imuAccelData.accelY.push(imuData.accel_y);
-        imuAccelData.accelZ.push(imuData.accel_z);
+        fetch(`/api/display?emg=${displayCursors.emg}&imu=${displayCursors.imu}`)
+            .then(response => response.json())
+            .then(data => {
+                appendEMGSeries(data.emg);
+                appendIMUSeries(data.imu);
+            })
+            .catch(error => {
+                console.error('Error fetching display series:', error);
+            })
+            .finally(() => {
+                displayRequestPending = false;
+            });
+    }
+    
+    // Append new points to all traces of a plot, or replace them after a reset
+    function appendToPlot(plot, x, ys, maxPoints, reset) {
+        const indices = ys.map((_, i) => i);
+        if (reset) {
+            const first = Math.max(0, x.length - maxPoints);
+            Plotly.restyle(plot, { x: ys.map(() => x.slice(first)), y: ys.map(y => y.slice(first)) }, indices);
+        } else if (x.length) {
+            Plotly.extendTraces(plot, { x: ys.map(() => x), y: ys }, indices, maxPoints);
+        }
+    }
+    
+    function appendIMUSeries(series) {
+        if (!series) {
+            return;
+        }
+        displayCursors.imu = series.next;
+        const x = series.t.map(t => new Date(t * 1000));
+        const maxPoints = displayWindowSeconds * series.points_per_second;
         
-        // Update the accelerometer plot
         if (imuAccelPlot) {
-            const accelHoverTexts = [
-                imuAccelData.accelX.map(val => `X: ${val.toFixed(2)} m/s²<br>Time: ${timestamp}`),
-                imuAccelData.accelY.map(val => `Y: ${val.toFixed(2)} m/s²<br>Time: ${timestamp}`),
-                imuAccelData.accelZ.map(val => `Z: ${val.toFixed(2)} m/s²<br>Time: ${timestamp}`)
-            ];
-            
-            Plotly.update(imuAccelPlot, {
-                y: [imuAccelData.accelX, imuAccelData.accelY, imuAccelData.accelZ],
-                hovertext: accelHoverTexts
-            }, {}, [0, 1, 2]);
+            appendToPlot(imuAccelPlot, x, [series.accel_x, series.accel_y, series.accel_z], maxPoints, series.reset);
         }
-        
-        // Shift out the oldest data point and add the new one for gyroscope
-        imuGyroData.gyroX.shift();
-        imuGyroData.gyroY.shift();
-        imuGyroData.gyroZ.shift();
-        
-        imuGyroData.gyroX.push(imuData.gyro_x);
-        imuGyroData.gyroY.push(imuData.gyro_y);
-        imuGyroData.gyroZ.push(imuData.gyro_z);
-        
-        // Update the gyroscope plot
         if (imuGyroPlot) {
-            const gyroHoverTexts = [
-                imuGyroData.gyroX.map(val => `X: ${val.toFixed(2)} °/s<br>Time: ${timestamp}`),
-                imuGyroData.gyroY.map(val => `Y: ${val.toFixed(2)} °/s<br>Time: ${timestamp}`),
-                imuGyroData.gyroZ.map(val => `Z: ${val.toFixed(2)} °/s<br>Time: ${timestamp}`)
-            ];
-            
-            Plotly.update(imuGyroPlot, {
-                y: [imuGyroData.gyroX, imuGyroData.gyroY, imuGyroData.gyroZ],
-                hovertext: gyroHoverTexts
-            }, {}, [0, 1, 2]);
+            appendToPlot(imuGyroPlot, x, [series.gyro_x, series.gyro_y, series.gyro_z], maxPoints, series.reset);
         }
     }
     
-    // Function to update EMG plot with new data
-    function updateEMGPlot(emgDataNew) {
-        // Timestamps for hover information
-        const now = new Date();
-        const timestamp = now.toLocaleTimeString([], {hour: '2-digit', minute:'2-digit', second:'2-digit', fractionalSecondDigits: 3});
-        
-        // Shift out the oldest data point and add the new one for EMG signals
-        emgData.bicep.shift();
-        emgData.shoulder.shift();
-        emgData.tricep.shift();
-        
-        emgData.bicep.push(emgDataNew.bicep);
-        emgData.shoulder.push(emgDataNew.shoulder);
-        emgData.tricep.push(emgDataNew.tricep);
+    function appendEMGSeries(series) {
+        if (!series) {
+            return;
+        }
+        displayCursors.emg = series.next;
+        const x = series.t.map(t => new Date(t * 1000));
+        const maxPoints = displayWindowSeconds * series.points_per_second;
         
-        // Update the EMG plot
         if (emgLivePlot) {
-            const emgHoverTexts = [
-                emgData.bicep.map(val => `Bicep: ${val}<br>Time: ${timestamp}`),
-                emgData.shoulder.map(val => `Shoulder: ${val}<br>Time: ${timestamp}`),
-                emgData.tricep.map(val => `Tricep: ${val}<br>Time: ${timestamp}`)
-            ];
-            
-            Plotly.update(emgLivePlot, {
-                y: [emgData.bicep, emgData.shoulder, emgData.tricep],
-                hovertext: emgHoverTexts
-            }, {}, [0, 1, 2]);
+            // Same trace order as in initializePlots: max, min, rms per channel
+            const ys = [];
+            emgChannels.forEach(channel => {
+                ys.push(series[`${channel.key}_max`], series[`${channel.key}_min`], series[`${channel.key}_rms`]);
+            });
+            appendToPlot(emgLivePlot, x, ys, maxPoints, series.reset);
         }
     }
     
@@ -0,0 +1,111 @@
+import threading
+
+
+class Subscription:
+    """A subscriber's cursor into a BroadcastHub"""
+    def __init__(self, hub, cursor):
+        self.hub = hub
+        self.cursor = cursor
+        self.dropped = False
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    def read(self, timeout=None):
+        """
+        Wait for frames after this subscriber's cursor
+
+        Returns:
+            List of encoded frames (empty if the timeout expired), or None if
+            the subscriber fell too far behind and was dropped
+        """
+        return self.hub.read(self, timeout)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class BroadcastHub:
+    """
+    Fan-out of encoded frames to many subscribers
+
+    The producer publishes each frame once into a fixed-size ring; every
+    subscriber only keeps a cursor (frame number) into it, so publishing costs
+    the same for one viewer or hundreds and never waits for a subscriber.
+
+    Subscribers that fall more than `skip_after` frames behind are skipped
+    ahead to the newest frame (they lose the frames in between, which the
+    frames' sequence numbers make visible); subscribers whose frames were
+    already overwritten are dropped.
+    """
+    def __init__(self, capacity=256, skip_after=None):
+        """
+        Args:
+            capacity: Number of frames kept in the ring
+            skip_after: Lag (frames) beyond which a subscriber only gets the
+                        newest frame; defaults to a quarter of the capacity
+        """
+        self.capacity = capacity
+        self.skip_after = skip_after or max(1, capacity // 4)
+        self.frames = [None] * capacity
+        self.head = 0  # Number of the next frame to publish
+        self.subscribers = []
+        self.changed = threading.Condition(threading.Lock())
+        self.subscriber_drops = 0
+
+    def publish(self, frame):
+        """Add an encoded frame and wake the waiting subscribers"""
+        with self.changed:
+            self.frames[self.head % self.capacity] = frame
+            self.head += 1
+            self.changed.notify_all()
+
+    def subscribe(self):
+        """New subscriber that receives frames published from now on"""
+        with self.changed:
+            subscription = Subscription(self, self.head)
+            self.subscribers.append(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self.changed:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self.subscribers)
+
+    def read(self, subscription, timeout=None):
+        with self.changed:
+            if subscription.dropped:
+                return None
+            if subscription.cursor == self.head:
+                self.changed.wait_for(lambda: subscription.cursor != self.head or subscription.dropped, timeout)
+
+            lag = self.head - subscription.cursor
+            if lag > self.capacity:
+                # Frames it hasn't read were overwritten
+                subscription.dropped = True
+                self.subscriber_drops += 1
+                if subscription in self.subscribers:
+                    self.subscribers.remove(subscription)
+                print(f"[WARNING] Dropping broadcast subscriber {lag} frames behind")
+                return None
+            if lag > self.skip_after:
+                subscription.frames_skipped += lag - 1
+                subscription.cursor = self.head - 1
+
+            frames = [self.frames[i % self.capacity] for i in range(subscription.cursor, self.head)]
+            subscription.cursor = self.head
+            subscription.frames_sent += len(frames)
+            return frames
+
+    def stats(self):
+        """Frames published and per-hub subscriber counters"""
+        with self.changed:
+            return {
+                'frames': self.head,
+                'subscribers': len(self.subscribers),
+                'subscriber_drops': self.subscriber_drops,
+                'frames_skipped': sum(s.frames_skipped for s in self.subscribers)
+            }
@@ -0,0 +1,100 @@
+"""
+Content-Encoding negotiation and incremental compression of streamed responses.
+
+Brotli is used when the optional `brotli` package is installed and the client
+accepts it, gzip otherwise.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred encodings, best first
+ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Quality levels above ~5 cost much more CPU for streamed text
+
+
+def accepted_encodings(accept_encoding):
+    """
+    Parse an Accept-Encoding header
+
+    Returns:
+        Dict mapping encoding name to its q-value
+    """
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding, available=None):
+    """
+    Pick the response encoding for an Accept-Encoding header
+
+    Args:
+        accept_encoding: The request's Accept-Encoding header (may be None)
+        available: Encodings the caller can produce, best first (default: ENCODINGS)
+
+    Returns:
+        'br', 'gzip' or None for an uncompressed response
+    """
+    accepted = accepted_encodings(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in (ENCODINGS if available is None else available):
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compress an iterable of str/bytes chunks incrementally
+
+    Args:
+        chunks: Iterable of response chunks
+        encoding: 'br', 'gzip' or None (chunks are passed through)
+
+    Yields:
+        Compressed bytes, as the compressor produces them
+    """
+    if encoding is None:
+        for chunk in chunks:
+            yield chunk.encode() if isinstance(chunk, str) else chunk
+        return
+
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress, finish = compressor.process, compressor.finish
+    else:
+        # wbits 31: zlib stream with a gzip header and trailer
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        compress, finish = compressor.compress, compressor.flush
+
+    for chunk in chunks:
+        output = compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if output:
+            yield output
+    yield finish()
+
+
+def compress_bytes(data, encoding):
+    """Compress a whole payload at the highest level, for files compressed ahead of time"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
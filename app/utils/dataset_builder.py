@@ -0,0 +1,331 @@
+"""
+Training dataset builder.
+
+Turns the *_imu.csv / *_emg.csv recordings made on the EMG and IMU pages into
+labeled feature windows, using the Repetition column written while recording
+(the rep counter is incremented when a rep is marked, so rows with value k are
+the samples of rep k + 1; samples after the last mark are an unfinished rep
+and are dropped).
+
+Feature plans:
+    rep_detection  Sliding IMU windows, TSFEL temporal features of all six axes;
+                   label 1 if a rep was marked during the window
+    exercise       One IMU window per rep, TSFEL temporal features of the
+                   accelerometer with the live model's sampling rate and input
+                   length; label is the exercise named in the file name
+    fatigue_emg    One EMG window per rep, TSFEL features of all domains;
+                   label is the rep number within the recording
+
+Features are extracted in parallel and cached on disk per recording, keyed by
+the file's content hash, the window parameters and the feature plan, so a
+rebuild only extracts recordings or plans that changed. Each plan is written as
+memory-mappable .npy arrays plus an index.json:
+
+    python -m app.utils.dataset_builder --data-dir data --output data/datasets
+
+and loaded for training with load_dataset('data/datasets', 'exercise').
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from app.utils.ml_handlers import ExerciseClassificationModel
+from app.utils.offline_analysis import IMU_COLUMNS, EMG_COLUMNS
+from app.utils.windowing import REP_BATCH_SIZE, MIN_REP_WINDOW, MIN_FATIGUE_WINDOW
+
+# Bump when the extraction code changes, to invalidate every cache entry
+CACHE_VERSION = 2
+
+FEATURE_PLANS = {
+    'rep_detection': {
+        'stream': 'imu', 'columns': IMU_COLUMNS, 'domains': ['temporal'], 'fs': 130,
+        'segmentation': 'sliding', 'window': REP_BATCH_SIZE, 'hop': REP_BATCH_SIZE, 'label': 'rep_marked'
+    },
+    'exercise': {
+        # Same features as ExerciseClassificationModel.preprocess computes live
+        'stream': 'imu', 'columns': IMU_COLUMNS[:3], 'domains': ['temporal'],
+        'fs': ExerciseClassificationModel.fs, 'num_features': ExerciseClassificationModel.num_features,
+        'segmentation': 'rep', 'min_samples': MIN_REP_WINDOW, 'label': 'exercise'
+    },
+    'fatigue_emg': {
+        'stream': 'emg', 'columns': EMG_COLUMNS, 'domains': None, 'fs': 1000,
+        'segmentation': 'rep', 'min_samples': MIN_FATIGUE_WINDOW, 'label': 'rep_number'
+    }
+}
+
+
+def file_hash(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(content_hash, plan_name, plan):
+    """Content address of one recording's features under one plan"""
+    key = json.dumps({'version': CACHE_VERSION, 'file': content_hash, 'plan': plan_name, 'params': plan},
+                     sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def find_recordings(data_dir, stream):
+    """Recordings of a stream that have a Repetition column"""
+    recordings = []
+    for path in sorted(glob.glob(os.path.join(data_dir, f"*_{stream}.csv"))):
+        with open(path) as f:
+            header = f.readline().strip().split(',')
+        if 'Repetition' in header:
+            recordings.append(path)
+        else:
+            print(f"[INFO] Skipping {os.path.basename(path)}: no Repetition column")
+    return recordings
+
+
+def exercise_label(path):
+    """Index of the exercise named in a recording's file name, -1 if none is"""
+    name = os.path.basename(path).lower()
+    for i, exercise_type in enumerate(ExerciseClassificationModel.exercise_types):
+        if exercise_type in name:
+            return i
+    return -1
+
+
+def segment_windows(data, repetitions, plan, path):
+    """
+    Cut a recording into the plan's windows
+
+    Returns:
+        (windows, labels, positions) where positions are the window start
+        sample (sliding) or the rep number (per rep)
+    """
+    windows, labels, positions = [], [], []
+    if plan['segmentation'] == 'sliding':
+        window, hop = plan['window'], plan['hop']
+        for start in range(0, len(data) - window + 1, hop):
+            reps = repetitions[start:start + window]
+            windows.append(data[start:start + window])
+            labels.append(int(reps[-1] != reps[0]))
+            positions.append(start)
+        return windows, labels, positions
+
+    # Per rep: runs of equal Repetition values, without the unfinished last one
+    boundaries = np.flatnonzero(np.diff(repetitions)) + 1
+    starts = np.concatenate([[0], boundaries])
+    ends = np.concatenate([boundaries, [len(data)]])
+    label = exercise_label(path) if plan['label'] == 'exercise' else None
+    for rep_number, (start, end) in enumerate(zip(starts[:-1], ends[:-1]), start=1):
+        if end - start < plan['min_samples']:
+            continue
+        windows.append(data[start:end])
+        labels.append(label if label is not None else rep_number)
+        positions.append(rep_number)
+    return windows, labels, positions
+
+
+def extract_recording(path, plan_name, plan):
+    """
+    Extract one recording's windows and features under a plan
+
+    Returns:
+        Dict with 'features' [windows, features], 'labels', 'positions' and
+        'feature_names'
+    """
+    import tsfel
+
+    df = pd.read_csv(path)
+    data = df[plan['columns']].to_numpy(dtype=np.float64)
+    repetitions = df['Repetition'].to_numpy()
+    windows, labels, positions = segment_windows(data, repetitions, plan, path)
+
+    result = {
+        'features': np.empty((0, 0), dtype=np.float32),
+        'labels': np.array(labels, dtype=np.int32),
+        'positions': np.array(positions, dtype=np.int32),
+        'feature_names': np.array([], dtype=str)
+    }
+    if not windows:
+        return result
+
+    cfg = tsfel.get_features_by_domain(plan['domains'])
+    if plan['segmentation'] == 'sliding':
+        # Equal-sized windows go through TSFEL in one call, like predict_batch
+        features_df = tsfel.time_series_features_extractor(
+            cfg, pd.DataFrame(np.concatenate(windows), columns=plan['columns']),
+            fs=plan['fs'], window_size=plan['window'], overlap=0, verbose=0)
+    else:
+        features_df = pd.concat([
+            tsfel.time_series_features_extractor(
+                cfg, pd.DataFrame(window, columns=plan['columns']),
+                fs=plan['fs'], window_size=None, overlap=0, verbose=0)
+            for window in windows
+        ], ignore_index=True)
+
+    if 'num_features' in plan:
+        features_df = features_df.iloc[:, :plan['num_features']]
+
+    # NaN features are zeroed, like in training
+    result['features'] = np.nan_to_num(features_df.to_numpy(dtype=np.float32), nan=0.0)
+    result['feature_names'] = np.array(features_df.columns, dtype=str)
+    return result
+
+
+def _extract_to_cache(path, plan_name, plan, cache_path):
+    """Worker job: extract a recording and store the result in the cache"""
+    result = extract_recording(path, plan_name, plan)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + '.tmp.npz'
+    np.savez(tmp_path, **result)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def build_datasets(data_dir, output_dir, plan_names=None, workers=None, window=None, hop=None):
+    """
+    Build (or incrementally rebuild) the datasets of the given feature plans
+
+    Args:
+        data_dir: Directory with the *_imu.csv / *_emg.csv recordings
+        output_dir: Dataset directory; the feature cache lives in output_dir/cache
+        plan_names: Plans to build, all by default
+        workers: Number of extraction processes
+        window / hop: Override the sliding-window size and hop of rep_detection
+
+    Returns:
+        Dict mapping plan name to its index
+    """
+    plans = {}
+    for plan_name in plan_names or FEATURE_PLANS:
+        plan = dict(FEATURE_PLANS[plan_name])
+        if plan['segmentation'] == 'sliding':
+            plan['window'] = window or plan['window']
+            plan['hop'] = hop or plan['hop']
+        plans[plan_name] = plan
+
+    cache_dir = os.path.join(output_dir, 'cache')
+    hashes = {}
+    jobs = {}
+    entries = {}
+    for plan_name, plan in plans.items():
+        entries[plan_name] = []
+        for path in find_recordings(data_dir, plan['stream']):
+            if path not in hashes:
+                hashes[path] = file_hash(path)
+            cache_path = os.path.join(cache_dir, plan_name, cache_key(hashes[path], plan_name, plan) + '.npz')
+            entries[plan_name].append((path, cache_path))
+            if not os.path.exists(cache_path):
+                jobs[cache_path] = (path, plan_name, plan)
+
+    cached = sum(len(plan_entries) for plan_entries in entries.values()) - len(jobs)
+    print(f"[INFO] {cached} cached extractions, {len(jobs)} to compute")
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_extract_to_cache, *job, cache_path): job
+                       for cache_path, job in jobs.items()}
+            for future in as_completed(futures):
+                path, plan_name, _ = futures[future]
+                try:
+                    future.result()
+                    print(f"[INFO] Extracted {plan_name} features of {os.path.basename(path)}")
+                except Exception as e:
+                    print(f"[ERROR] Failed to extract {plan_name} features of {path}: {e}")
+
+    indexes = {}
+    for plan_name, plan in plans.items():
+        available = [(path, cache_path) for path, cache_path in entries[plan_name] if os.path.exists(cache_path)]
+        indexes[plan_name] = write_dataset(os.path.join(output_dir, plan_name), plan_name, plan, available, hashes)
+    return indexes
+
+
+def write_dataset(plan_dir, plan_name, plan, entries, hashes):
+    """Concatenate the cached extractions of a plan into memory-mappable arrays"""
+    results = []
+    for path, cache_path in entries:
+        with np.load(cache_path) as data:
+            if len(data['labels']):
+                results.append((path, {name: data[name] for name in data.files}))
+
+    num_rows = sum(len(result['labels']) for _, result in results)
+    num_features = results[0][1]['features'].shape[1] if results else 0
+    os.makedirs(plan_dir, exist_ok=True)
+
+    features = np.lib.format.open_memmap(os.path.join(plan_dir, 'features.npy'), mode='w+',
+                                         dtype=np.float32, shape=(num_rows, num_features))
+    labels = np.empty(num_rows, dtype=np.int32)
+    recordings = np.empty(num_rows, dtype=np.int32)
+    positions = np.empty(num_rows, dtype=np.int32)
+
+    index = {
+        'plan': plan_name,
+        'params': plan,
+        'num_windows': num_rows,
+        'feature_names': list(results[0][1]['feature_names']) if results else [],
+        'recordings': []
+    }
+    if plan['label'] == 'exercise':
+        index['classes'] = list(ExerciseClassificationModel.exercise_types)
+
+    row = 0
+    for i, (path, result) in enumerate(results):
+        count = len(result['labels'])
+        if result['features'].shape[1] != num_features:
+            raise ValueError(f"{path} has {result['features'].shape[1]} {plan_name} features, expected {num_features}")
+        features[row:row + count] = result['features']
+        labels[row:row + count] = result['labels']
+        recordings[row:row + count] = i
+        positions[row:row + count] = result['positions']
+        index['recordings'].append({'file': os.path.basename(path), 'hash': hashes[path], 'rows': [row, row + count]})
+        row += count
+    features.flush()
+    del features
+
+    np.save(os.path.join(plan_dir, 'labels.npy'), labels)
+    np.save(os.path.join(plan_dir, 'recordings.npy'), recordings)
+    np.save(os.path.join(plan_dir, 'positions.npy'), positions)
+    with open(os.path.join(plan_dir, 'index.json'), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    print(f"[INFO] {plan_name}: {num_rows} windows x {num_features} features from {len(results)} recordings")
+    return index
+
+
+def load_dataset(output_dir, plan_name, mmap_mode='r'):
+    """
+    Load a built dataset without reading the arrays into memory
+
+    Returns:
+        (features, labels, recordings, positions, index)
+    """
+    plan_dir = os.path.join(output_dir, plan_name)
+    arrays = [np.load(os.path.join(plan_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+              for name in ('features', 'labels', 'recordings', 'positions')]
+    with open(os.path.join(plan_dir, 'index.json')) as f:
+        index = json.load(f)
+    return (*arrays, index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build training datasets from labeled FleX recordings')
+    parser.add_argument('--data-dir', default=os.path.join(os.getcwd(), 'data'),
+                        help='Directory containing *_imu.csv / *_emg.csv recordings')
+    parser.add_argument('--output', default=os.path.join(os.getcwd(), 'data', 'datasets'),
+                        help='Dataset directory')
+    parser.add_argument('--plan', action='append', choices=list(FEATURE_PLANS),
+                        help='Feature plan to build (repeatable, default: all)')
+    parser.add_argument('--window', type=int, help='Sliding window size for rep_detection')
+    parser.add_argument('--hop', type=int, help='Sliding window hop for rep_detection')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    args = parser.parse_args()
+
+    build_datasets(args.data_dir, args.output, args.plan, args.workers, args.window, args.hop)
+
+
+if __name__ == '__main__':
+    main()
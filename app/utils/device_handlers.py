@@ -7,6 +7,7 @@ import math
 import time
 import threading
 import serial  # Requires pySerial
+from app.utils.resource_governor import governor
 
 class EMGHandler:
     def __init__(self):
@@ -51,6 +52,7 @@ class EMGHandler:
         each line of data to contain four comma-separated values:
         time (ms), bicep, shoulder, and tricep.
         """
+        governor.pin_current_thread('ingest')
         while self.thread_running:
             try:
                 # Read a line from the serial port
@@ -71,7 +73,7 @@ class EMGHandler:
                             continue
                         
                         # Notify registered callbacks
-                        for callback in self.data_callbacks:
+                        for callback in list(self.data_callbacks):
                             callback(self.data)
                     else:
                         print(f"[DEBUG] Unexpected data format: {line}")
@@ -84,6 +86,11 @@ class EMGHandler:
         if callback not in self.data_callbacks:
             self.data_callbacks.append(callback)
 
+    def unregister_callback(self, callback):
+        """Stop calling a registered callback."""
+        if callback in self.data_callbacks:
+            self.data_callbacks.remove(callback)
+
     def disconnect(self):
         """
         Disconnect from the EMG device by stopping the read thread and closing the serial port.
@@ -156,6 +163,7 @@ class BluetoothManager:
     
     def _run_loop(self):
         """Run the asyncio event loop"""
+        governor.pin_current_thread('ingest')
         asyncio.set_event_loop(self.loop)
         try:
             self.loop.run_forever()
@@ -385,6 +393,11 @@ class IMUHandler:
         if callback not in self.notification_callbacks:
             self.notification_callbacks.append(callback)
     
+    def unregister_callback(self, callback):
+        """Stop calling a registered callback"""
+        if callback in self.notification_callbacks:
+            self.notification_callbacks.remove(callback)
+    
     def get_data(self):
         """Get the current IMU data"""
         return self.data.copy()  # Return a copy to avoid reference issues
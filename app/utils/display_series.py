@@ -0,0 +1,165 @@
+"""
+Ready-to-plot display series of the live streams.
+
+The dashboard can't draw 1 kHz EMG, and single samples picked by a poll
+alias away its fast structure. Instead the full-rate streams are reduced
+incrementally, as they arrive, to a fixed number of points per second:
+
+    emg  per channel min and max of the raw signal in each bucket (a band
+         that keeps every spike visible) and the moving RMS envelope of the
+         conditioned signal at the end of the bucket
+    imu  mean of each axis per bucket
+
+Finished points are kept in a WindowingEngine, so clients read them by
+sequence number and only ever append.
+"""
+import numpy as np
+
+from app.utils.windowing import WindowingEngine
+
+EMG_CHANNELS = ['bicep', 'shoulder', 'tricep']
+IMU_CHANNELS = ['accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z']
+
+# Columns of each display stream, in storage order
+DISPLAY_COLUMNS = {
+    'emg': [f"{channel}_{kind}" for kind in ['min', 'max', 'rms'] for channel in EMG_CHANNELS],
+    'imu': IMU_CHANNELS
+}
+
+
+class BucketReducer:
+    """
+    Min, max, mean and last value of a stream per fixed-length time bucket,
+    fed block by block. A bucket is finished when the first sample of a later
+    bucket arrives.
+    """
+    def __init__(self, channels, points_per_second):
+        self.channels = channels
+        self.interval = 1.0 / points_per_second
+        self.reset()
+
+    def reset(self):
+        self.bucket = None  # Index of the open bucket
+        self.minimum = None
+        self.maximum = None
+        self.total = None
+        self.count = 0
+        self.last = None
+
+    def push(self, timestamps, data):
+        """
+        Add a block of samples
+
+        Args:
+            timestamps: Sample timestamps [n] (seconds)
+            data: Samples [n, channels]
+
+        Returns:
+            (times [k], minimum [k, channels], maximum, mean, last) of the
+            k buckets finished by this block; times are bucket start times
+        """
+        finished = []
+        if len(timestamps):
+            buckets = np.floor(np.asarray(timestamps) / self.interval).astype(np.int64)
+            # Late samples count towards the open bucket instead of reopening an old one
+            if self.bucket is not None:
+                buckets = np.maximum(buckets, self.bucket)
+            buckets = np.maximum.accumulate(buckets)
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            ends = np.r_[starts[1:], len(buckets)]
+            for start, end in zip(starts, ends):
+                segment = data[start:end]
+                if buckets[start] != self.bucket:
+                    if self.bucket is not None:
+                        finished.append(self._finish())
+                    self.bucket = buckets[start]
+                    self.minimum = segment.min(axis=0)
+                    self.maximum = segment.max(axis=0)
+                    self.total = segment.sum(axis=0)
+                    self.count = len(segment)
+                else:
+                    self.minimum = np.minimum(self.minimum, segment.min(axis=0))
+                    self.maximum = np.maximum(self.maximum, segment.max(axis=0))
+                    self.total = self.total + segment.sum(axis=0)
+                    self.count += len(segment)
+                self.last = segment[-1]
+
+        if not finished:
+            empty = np.empty((0, self.channels))
+            return np.empty(0), empty, empty, empty, empty
+        times, minimum, maximum, mean, last = zip(*finished)
+        return np.array(times), np.array(minimum), np.array(maximum), np.array(mean), np.array(last)
+
+    def _finish(self):
+        return (self.bucket * self.interval, self.minimum, self.maximum,
+                self.total / self.count, self.last)
+
+
+class DisplaySeries:
+    """Incrementally computed display series of a live session"""
+    def __init__(self, emg_points_per_second=50, imu_points_per_second=25, history_seconds=60):
+        """
+        Args:
+            emg_points_per_second: Points per second of the EMG series
+            imu_points_per_second: Points per second of the IMU series
+            history_seconds: Seconds of points kept for clients that poll
+        """
+        self.points_per_second = {'emg': emg_points_per_second, 'imu': imu_points_per_second}
+        self.emg_reducer = BucketReducer(2 * len(EMG_CHANNELS), emg_points_per_second)
+        self.imu_reducer = BucketReducer(len(IMU_CHANNELS), imu_points_per_second)
+
+        self.windows = WindowingEngine()
+        for stream, points_per_second in self.points_per_second.items():
+            self.windows.add_stream(stream, len(DISPLAY_COLUMNS[stream]), points_per_second * history_seconds)
+
+    def reset(self):
+        """Drop all points, e.g. for a new session"""
+        self.emg_reducer.reset()
+        self.imu_reducer.reset()
+        self.windows.reset()
+
+    def push_emg_block(self, block):
+        """
+        Add a conditioned EMG block (see EMGConditioner)
+
+        Min/max come from the raw channels, the envelope from the block's
+        moving RMS of the filtered signal.
+        """
+        values = np.hstack([block['raw'][:, 1:1 + len(EMG_CHANNELS)], block['rms']])
+        times, minimum, maximum, _, last = self.emg_reducer.push(block['timestamps'], values)
+        if len(times):
+            raw = slice(0, len(EMG_CHANNELS))
+            rms = slice(len(EMG_CHANNELS), None)
+            self.windows.extend('emg', np.hstack([minimum[:, raw], maximum[:, raw], last[:, rms]]), times)
+
+    def push_imu(self, timestamps, data):
+        """Add a block of IMU samples [n, 6]"""
+        times, _, _, mean, _ = self.imu_reducer.push(timestamps, data)
+        if len(times):
+            self.windows.extend('imu', mean, times)
+
+    def read_since(self, stream, seq, decimals=3):
+        """
+        Points of a display stream after a sequence number, channel-major
+
+        Returns:
+            Dict with 'start' (sequence number of the first point), 'next'
+            (cursor for the next read), 'gap' (points lost before 'start'),
+            't' (bucket start times) and one list of values per column
+        """
+        data, timestamps, start = self.windows.read_since(stream, seq)
+        series = {
+            'start': start,
+            'next': start + len(data),
+            'gap': max(0, start - seq),
+            'points_per_second': self.points_per_second[stream],
+            't': np.round(timestamps, 3).tolist()
+        }
+        values = np.round(data, decimals).T.tolist()
+        for column, column_values in zip(DISPLAY_COLUMNS[stream], values):
+            series[column] = column_values
+        return series
+
+    def count(self, stream):
+        """Number of points produced on a display stream"""
+        return self.windows.count(stream)
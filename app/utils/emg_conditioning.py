@@ -0,0 +1,145 @@
+import threading
+
+import numpy as np
+from scipy import signal
+
+
+class EMGConditioner:
+    """
+    Streaming EMG conditioning: band-pass, mains notch, rectification and
+    envelopes, applied in blocks as samples arrive.
+
+    Filters are second-order sections whose state is carried from block to
+    block, so each sample is filtered exactly once and the output is identical
+    to filtering the whole recording in one go.
+
+    Every completed block is passed to the registered callbacks as a dict with
+    'timestamps' [n], 'raw' [n, 4] (time + channels as received), 'filtered',
+    'envelope' (linear envelope) and 'rms' (moving RMS), each [n, channels].
+    """
+    CHANNELS = ['bicep', 'shoulder', 'tricep']
+
+    def __init__(self, fs=1000, band=(20, 450), mains=50, notch_q=30, envelope_cutoff=6,
+                 rms_window=0.1, block_size=20):
+        """
+        Args:
+            fs: EMG sampling frequency (Hz)
+            band: Band-pass corner frequencies (Hz)
+            mains: Mains frequency to notch out (50 or 60 Hz), None to disable
+            notch_q: Quality factor of the notch filter
+            envelope_cutoff: Low-pass cutoff of the linear envelope (Hz)
+            rms_window: Length of the moving RMS window (s)
+            block_size: Samples collected before a block is filtered
+        """
+        self.fs = fs
+        self.block_size = block_size
+        self.rms_length = max(1, int(rms_window * fs))
+
+        # Band-pass and notch as one cascade of second-order sections
+        sos = signal.butter(4, band, btype='bandpass', fs=fs, output='sos')
+        if mains:
+            b, a = signal.iirnotch(mains, notch_q, fs=fs)
+            sos = np.vstack([sos, signal.tf2sos(b, a)])
+        self.filter_sos = sos
+        self.envelope_sos = signal.butter(2, envelope_cutoff, btype='lowpass', fs=fs, output='sos')
+
+        self.callbacks = []
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear the filter state and any partial block"""
+        num_channels = len(self.CHANNELS)
+        with self.lock:
+            self.filter_state = np.zeros((self.filter_sos.shape[0], 2, num_channels))
+            self.envelope_state = np.zeros((self.envelope_sos.shape[0], 2, num_channels))
+            self.rms_tail = np.zeros((self.rms_length - 1, num_channels))
+            self.pending_timestamps = []
+            self.pending_rows = []
+            self.latest = {channel: 0.0 for channel in self.CHANNELS}
+            self.sample_count = 0
+            self.initialized = False
+
+    def register_callback(self, callback):
+        """Call callback(block) for every conditioned block"""
+        if callback not in self.callbacks:
+            self.callbacks.append(callback)
+
+    def unregister_callback(self, callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def push(self, timestamp, reading):
+        """
+        Add one EMG sample, conditioning the block once it is complete
+
+        Args:
+            timestamp: Arrival time of the sample
+            reading: [time, bicep, shoulder, tricep] as received from the device
+
+        Returns:
+            The conditioned block if this sample completed one, else None
+        """
+        with self.lock:
+            self.pending_timestamps.append(timestamp)
+            self.pending_rows.append(reading)
+            if len(self.pending_rows) < self.block_size:
+                return None
+            block = self._condition_pending()
+        self._notify(block)
+        return block
+
+    def flush(self):
+        """Condition a partial block, e.g. at the end of a session"""
+        with self.lock:
+            if not self.pending_rows:
+                return None
+            block = self._condition_pending()
+        self._notify(block)
+        return block
+
+    def process_block(self, raw):
+        """Condition a block of [n, 4] readings directly, e.g. from a recording"""
+        with self.lock:
+            return self._condition(np.zeros(len(raw)), np.asarray(raw, dtype=np.float64))
+
+    def _condition_pending(self):
+        block = self._condition(np.array(self.pending_timestamps), np.array(self.pending_rows, dtype=np.float64))
+        self.pending_timestamps = []
+        self.pending_rows = []
+        return block
+
+    def _notify(self, block):
+        for callback in list(self.callbacks):
+            try:
+                callback(block)
+            except Exception as e:
+                print(f"[ERROR] Error in EMG conditioning callback: {e}")
+
+    def _condition(self, timestamps, raw):
+        channels = raw[:, 1:]
+        if not self.initialized:
+            # Start from steady state on the first sample, so the DC offset of
+            # the raw counts doesn't ring through the band-pass
+            self.filter_state = signal.sosfilt_zi(self.filter_sos)[:, :, np.newaxis] * channels[0]
+            self.initialized = True
+        filtered, self.filter_state = signal.sosfilt(self.filter_sos, channels, axis=0, zi=self.filter_state)
+        rectified = np.abs(filtered)
+        envelope, self.envelope_state = signal.sosfilt(self.envelope_sos, rectified, axis=0, zi=self.envelope_state)
+
+        # Moving RMS over the last rms_length samples, continuing from the previous block
+        squares = np.vstack([self.rms_tail, filtered ** 2])
+        cumulative = np.vstack([np.zeros((1, squares.shape[1])), np.cumsum(squares, axis=0)])
+        rms = np.sqrt(np.maximum(cumulative[self.rms_length:] - cumulative[:-self.rms_length], 0) / self.rms_length)
+        if self.rms_length > 1:
+            self.rms_tail = squares[-(self.rms_length - 1):]
+
+        self.sample_count += len(raw)
+        self.latest = dict(zip(self.CHANNELS, envelope[-1].tolist()))
+        return {
+            'timestamps': timestamps,
+            'raw': raw,
+            'filtered': filtered,
+            'envelope': envelope,
+            'rms': rms
+        }
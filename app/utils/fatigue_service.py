@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from app.utils.resource_governor import governor
+
+
+class FatigueService:
+    """
+    Runs every fatigue model on a rep with one shared feature extraction and
+    groups concurrent requests into a single batched forward pass per model.
+
+    Each athlete/session keeps its own rep feature sequence, keyed by session id,
+    so one service can serve many concurrent sessions.
+    """
+    def __init__(self, models, max_batch_size=32, max_wait=0.005):
+        """
+        Args:
+            models: Dict mapping exercise type to FatigueClassificationModel
+            max_batch_size: Maximum number of requests grouped into one forward pass
+            max_wait: Seconds to wait for more requests after the first one arrives
+        """
+        self.models = models
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        # session_id -> {exercise_type: [rep feature vectors]}
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+
+        self.requests = queue.Queue()
+        self.worker_thread = None
+        self.worker_lock = threading.Lock()
+
+        # Counters for monitoring batching efficiency
+        self.request_count = 0
+        self.batch_count = 0
+        self.extraction_count = 0
+
+    def start(self):
+        """Start the batching worker thread if it is not running yet"""
+        with self.worker_lock:
+            if self.worker_thread is None or not self.worker_thread.is_alive():
+                self.worker_thread = threading.Thread(target=self._run, daemon=True)
+                self.worker_thread.start()
+
+    def reset_session(self, session_id):
+        """Forget the rep sequence of a session"""
+        with self.sessions_lock:
+            self.sessions.pop(session_id, None)
+
+    def extract_features(self, emg_data):
+        """
+        Extract the rep's EMG features once per distinct feature key
+
+        Returns:
+            Dict mapping feature key to feature vector
+        """
+        features = {}
+        for model in self.models.values():
+            if model.model is None:
+                continue
+            key = model.feature_key
+            if key not in features:
+                features[key] = model.extract_features(emg_data)
+                self.extraction_count += 1
+        return features
+
+    def submit(self, session_id, emg_data):
+        """
+        Queue a rep for fatigue classification
+
+        Feature extraction runs in the calling thread so it parallelises across
+        sessions; only the model forward passes are batched.
+
+        Returns:
+            Future resolving to a dict mapping exercise type to fatigue level
+        """
+        return self.submit_with_features(session_id, emg_data)[0]
+
+    def submit_with_features(self, session_id, emg_data):
+        """
+        Like submit(), but also return the rep's extracted features
+
+        Returns:
+            (Future, dict mapping feature key to feature vector)
+        """
+        self.start()
+        future = Future()
+        features = self.extract_features(emg_data)
+        self.requests.put((session_id, emg_data, features, future))
+        return future, features
+
+    def predict(self, session_id, emg_data, timeout=None):
+        """Classify a rep and wait for the result"""
+        return self.submit(session_id, emg_data).result(timeout=timeout)
+
+    def stats(self):
+        """Return batching counters"""
+        return {
+            'requests': self.request_count,
+            'batches': self.batch_count,
+            'extractions': self.extraction_count,
+            'mean_batch_size': self.request_count / self.batch_count if self.batch_count else 0.0
+        }
+
+    def _run(self):
+        """Collect requests into micro-batches and process them"""
+        governor.pin_current_thread('inference')
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self._process_batch(batch)
+            except Exception as e:
+                print(f"[ERROR] Fatigue batch failed: {e}")
+                for _, _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _process_batch(self, batch):
+        """Append each rep to its session sequence and run one forward pass per model"""
+        self.request_count += len(batch)
+        self.batch_count += 1
+        results = [{} for _ in batch]
+
+        for exercise_type, model in self.models.items():
+            if model.model is None:
+                # Fallback logic works directly on the raw EMG window
+                for i, (_, emg_data, _, _) in enumerate(batch):
+                    results[i][exercise_type] = model.fallback_predict(emg_data)
+                continue
+
+            # Build each request's sequence in arrival order, so two reps of the
+            # same session in one batch each see their own prefix
+            sequences = []
+            lengths = []
+            with self.sessions_lock:
+                for session_id, _, features, _ in batch:
+                    session = self.sessions.setdefault(session_id, {})
+                    rep_features = session.setdefault(exercise_type, [])
+                    rep_features.append(features[model.feature_key])
+                    sequences.append(model.build_sequence(rep_features))
+                    lengths.append(len(rep_features))
+
+            predictions = model.model.predict(np.concatenate(sequences, axis=0), verbose=0)
+            for i, prediction in enumerate(predictions):
+                results[i][exercise_type] = model.decode_prediction(prediction, lengths[i])
+
+        for result, (_, _, _, future) in zip(results, batch):
+            future.set_result(result)
@@ -0,0 +1,223 @@
+"""
+Persistent per-rep feature store.
+
+Every rep's feature vectors (exercise-classifier IMU features and fatigue EMG
+features), its boundaries and the model outputs are kept per session in a
+compact columnar .npz file, so sessions can be re-scored with new model
+versions without redoing feature extraction from the raw CSV files.
+
+Re-score the whole archive with:
+    python -m app.utils.feature_store --dir data/features \\
+        --fatigue-model bicep_curl=new_bicep.h5 --output rescored.csv
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import threading
+
+import numpy as np
+
+FEATURE_DIR_NAME = 'features'
+FILE_SUFFIX = '_features.npz'
+
+SCALAR_COLUMNS = ['rep', 'set', 'start_time', 'end_time', 'exercise', 'bicep_fatigue', 'shoulder_fatigue']
+STRING_COLUMNS = ['exercise', 'bicep_fatigue', 'shoulder_fatigue']
+
+
+def session_feature_path(data_dir, session_name):
+    """Path of a session's feature file"""
+    return os.path.join(data_dir, FEATURE_DIR_NAME, f"{session_name}{FILE_SUFFIX}")
+
+
+class SessionFeatureStore:
+    """
+    Collects the features and outputs of each rep of one session
+
+    Results of one rep arrive from different pipeline stages, so rows are keyed
+    by rep number and merged as fields come in. flush() rewrites the session's
+    columnar file atomically.
+    """
+    def __init__(self, path, flush_every=10):
+        self.path = path
+        self.flush_every = flush_every
+        self.rows = {}
+        self.emg_feature_keys = []
+        self.lock = threading.Lock()
+        # Serializes flushes, which can come from several pipeline threads at
+        # once and share the temporary file
+        self.write_lock = threading.Lock()
+        self.unflushed = 0
+
+    def record(self, rep, imu_features=None, emg_features=None, **fields):
+        """
+        Merge fields into a rep's row
+
+        Args:
+            rep: Rep number within the session
+            imu_features: Exercise-classifier feature vector of the rep
+            emg_features: Dict mapping fatigue feature key to feature vector
+            fields: Scalar columns, e.g. start_time, exercise, bicep_fatigue
+        """
+        with self.lock:
+            row = self.rows.setdefault(rep, {'rep': rep})
+            row.update(fields)
+            if imu_features is not None:
+                row['imu_features'] = np.asarray(imu_features, dtype=np.float32)
+            if emg_features:
+                for key, vector in emg_features.items():
+                    key = list(key)
+                    if key not in self.emg_feature_keys:
+                        self.emg_feature_keys.append(key)
+                    row[f"emg_features_{self.emg_feature_keys.index(key)}"] = np.asarray(vector, dtype=np.float32)
+            self.unflushed += 1
+            should_flush = self.unflushed >= self.flush_every
+
+        if should_flush:
+            try:
+                self.flush()
+            except Exception as e:
+                # A failed write must not break the pipeline stage that recorded
+                # the rep; the rows are written again by the next flush
+                print(f"[ERROR] Error writing features to {self.path}: {e}")
+
+    def flush(self):
+        """Write all rows to the session's feature file"""
+        with self.write_lock:
+            with self.lock:
+                rows = [self.rows[rep] for rep in sorted(self.rows)]
+                emg_feature_keys = list(self.emg_feature_keys)
+                self.unflushed = 0
+            if not rows:
+                return
+
+            columns = {}
+            for name in SCALAR_COLUMNS:
+                if name in STRING_COLUMNS:
+                    columns[name] = np.array([str(row.get(name, 'unknown')) for row in rows])
+                elif name in ('rep', 'set'):
+                    columns[name] = np.array([row.get(name, -1) for row in rows], dtype=np.int32)
+                else:
+                    columns[name] = np.array([row.get(name, np.nan) for row in rows], dtype=np.float64)
+
+            vector_names = ['imu_features'] + [f"emg_features_{i}" for i in range(len(emg_feature_keys))]
+            for name in vector_names:
+                columns[name] = _stack_vectors([row.get(name) for row in rows])
+
+            columns['metadata'] = np.array(json.dumps({'emg_feature_keys': emg_feature_keys}))
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp.npz'
+            np.savez_compressed(tmp_path, **columns)
+            os.replace(tmp_path, self.path)
+
+
+def _stack_vectors(vectors):
+    """Stack per-rep vectors into a 2D array, NaN rows for reps without features"""
+    width = max((len(v) for v in vectors if v is not None), default=0)
+    matrix = np.full((len(vectors), width), np.nan, dtype=np.float32)
+    for i, vector in enumerate(vectors):
+        if vector is not None:
+            matrix[i, :len(vector)] = vector
+    return matrix
+
+
+def load_session_features(path):
+    """Load a session's feature file as a dict of column arrays"""
+    with np.load(path) as data:
+        columns = {name: data[name] for name in data.files}
+    columns['metadata'] = json.loads(str(columns['metadata']))
+    return columns
+
+
+def rescore_session(path, fatigue_models=None, exercise_model=None):
+    """
+    Re-score a stored session using only its stored features
+
+    Args:
+        path: Session feature file
+        fatigue_models: Dict mapping muscle column (e.g. 'bicep_fatigue') to a
+            FatigueClassificationModel
+        exercise_model: ExerciseClassificationModel
+
+    Returns:
+        Dict of the stored columns with the re-scored output columns replaced
+    """
+    columns = load_session_features(path)
+    num_reps = len(columns['rep'])
+
+    if exercise_model is not None and exercise_model.model is not None:
+        features = columns['imu_features']
+        has_features = ~np.isnan(features).all(axis=1) if features.size else np.zeros(num_reps, dtype=bool)
+        exercises = np.array(columns['exercise'], dtype=object)
+        if has_features.any():
+            exercises[has_features] = exercise_model.predict_features(features[has_features])
+        # Reps the live set tracker didn't classify take their set's label
+        for set_number in np.unique(columns['set']):
+            in_set = columns['set'] == set_number
+            labels = [label for label in exercises[in_set & has_features]]
+            if labels:
+                exercises[in_set & ~has_features] = max(set(labels), key=labels.count)
+        columns['exercise'] = exercises.astype(str)
+
+    emg_feature_keys = columns['metadata']['emg_feature_keys']
+    for column, model in (fatigue_models or {}).items():
+        if model.model is None:
+            continue
+        key = list(model.feature_key)
+        if key not in emg_feature_keys:
+            print(f"[WARNING] {path} has no stored EMG features for {key}")
+            continue
+        features = columns[f"emg_features_{emg_feature_keys.index(key)}"]
+        scored = ~np.isnan(features).all(axis=1)
+        levels = np.array(columns[column], dtype=object)
+        levels[scored] = model.predict_session([features[i] for i in np.flatnonzero(scored)])
+        columns[column] = levels.astype(str)
+
+    return columns
+
+
+def rescore_archive(feature_dir, fatigue_models=None, exercise_model=None):
+    """Re-score every stored session in a directory; returns {session_name: columns}"""
+    results = {}
+    for path in sorted(glob.glob(os.path.join(feature_dir, f"*{FILE_SUFFIX}"))):
+        session_name = os.path.basename(path)[:-len(FILE_SUFFIX)]
+        try:
+            results[session_name] = rescore_session(path, fatigue_models, exercise_model)
+        except Exception as e:
+            print(f"[ERROR] Failed to re-score {session_name}: {e}")
+    return results
+
+
+def main():
+    from app.utils.ml_handlers import ExerciseClassificationModel, FatigueClassificationModel
+
+    parser = argparse.ArgumentParser(description='Re-score stored session features with new models')
+    parser.add_argument('--dir', default=os.path.join(os.getcwd(), 'data', FEATURE_DIR_NAME),
+                        help='Directory with *_features.npz files')
+    parser.add_argument('--fatigue-model', action='append', default=[],
+                        help='exercise_type=path.h5, e.g. bicep_curl=models/new_bicep.h5')
+    parser.add_argument('--exercise-model', help='Path of a new exercise classifier (.h5)')
+    parser.add_argument('--output', default='rescored.csv', help='Results CSV file')
+    args = parser.parse_args()
+
+    muscle_columns = {'bicep_curl': 'bicep_fatigue', 'lat_raise': 'shoulder_fatigue'}
+    fatigue_models = {}
+    for spec in args.fatigue_model:
+        exercise_type, model_path = spec.split('=', 1)
+        fatigue_models[muscle_columns[exercise_type]] = FatigueClassificationModel(exercise_type, model_path)
+    exercise_model = ExerciseClassificationModel(args.exercise_model) if args.exercise_model else None
+
+    results = rescore_archive(args.dir, fatigue_models, exercise_model)
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['session'] + SCALAR_COLUMNS)
+        for session_name, columns in results.items():
+            for i in range(len(columns['rep'])):
+                writer.writerow([session_name] + [columns[name][i] for name in SCALAR_COLUMNS])
+    print(f"[INFO] Re-scored {len(results)} sessions. Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
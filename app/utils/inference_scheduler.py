@@ -0,0 +1,187 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from app.utils.resource_governor import governor
+
+
+class InferenceScheduler:
+    """
+    Priority and deadline aware scheduler for ML inference.
+
+    Tasks belong to a class (e.g. 'rep_detection', 'exercise', 'fatigue') with
+    a priority; lower numbers run first. Tasks of the most urgent priority run
+    on their own express lane, so latency-critical rep detection never waits
+    behind a slow fatigue prediction that is already running, while the
+    general lane works through everything else in priority order.
+
+    Tasks submitted with a coalesce_key replace a queued task with the same key,
+    and droppable tasks whose deadline passed before they started are dropped.
+    Queueing-plus-run latencies are kept per class for percentile reporting.
+    """
+    def __init__(self, priorities, history_size=500):
+        """
+        Args:
+            priorities: Dict mapping task class to priority (lower runs first)
+            history_size: Number of recent latencies kept per class
+        """
+        self.priorities = priorities
+        self.express_priority = min(priorities.values())
+        self.history_size = history_size
+
+        self._heaps = {'express': [], 'general': []}
+        self._pending = {}  # coalesce_key -> queued task
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._workers = []
+
+        self._stats = {name: self._new_class_stats() for name in priorities}
+
+    def _new_class_stats(self):
+        return {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'coalesced': 0,
+            'dropped': 0,
+            'deadline_misses': 0,
+            'latencies': deque(maxlen=self.history_size)
+        }
+
+    def start(self):
+        """Start the express and general worker lanes"""
+        if self._workers:
+            return
+        for name in self._heaps:
+            worker = threading.Thread(target=self._run, args=(name,),
+                                      name=f"inference-{name}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, task_class, fn, *args, deadline=None, coalesce_key=None, droppable=False):
+        """
+        Queue a task
+
+        Args:
+            task_class: Name of the task class, determines the priority
+            fn, args: Callable and arguments to run
+            deadline: Seconds from now by which the task should have finished
+            coalesce_key: Queued tasks with the same key are replaced by this one
+            droppable: Drop the task instead of running it late
+
+        Returns:
+            Future with the task's result; superseded or dropped tasks are cancelled
+        """
+        self.start()
+        now = time.time()
+        task = {
+            'class': task_class,
+            'fn': fn,
+            'args': args,
+            'submitted': now,
+            'deadline': now + deadline if deadline is not None else None,
+            'droppable': droppable,
+            'coalesce_key': coalesce_key,
+            'future': Future(),
+            'cancelled': False
+        }
+        priority = self.priorities[task_class]
+
+        with self._condition:
+            self._stats[task_class]['submitted'] += 1
+            if coalesce_key is not None:
+                previous = self._pending.get(coalesce_key)
+                if previous is not None:
+                    previous['cancelled'] = True
+                    previous['future'].cancel()
+                    self._stats[previous['class']]['coalesced'] += 1
+                self._pending[coalesce_key] = task
+
+            deadline_order = task['deadline'] if task['deadline'] is not None else float('inf')
+            lane = 'express' if priority <= self.express_priority else 'general'
+            heapq.heappush(self._heaps[lane], (priority, deadline_order, next(self._sequence), task))
+            self._condition.notify_all()
+        return task['future']
+
+    def _next_task(self, lane):
+        """Block until the lane has a task to run"""
+        heap = self._heaps[lane]
+        with self._condition:
+            while True:
+                # Discard superseded tasks at the top of the queue
+                while heap and heap[0][3]['cancelled']:
+                    heapq.heappop(heap)
+                if heap:
+                    task = heapq.heappop(heap)[3]
+                    if task['coalesce_key'] is not None and self._pending.get(task['coalesce_key']) is task:
+                        del self._pending[task['coalesce_key']]
+                    return task
+                self._condition.wait()
+
+    def _run(self, lane):
+        """Worker loop of one lane"""
+        governor.pin_current_thread('inference')
+        while True:
+            task = self._next_task(lane)
+            stats = self._stats[task['class']]
+            future = task['future']
+
+            if task['droppable'] and task['deadline'] is not None and time.time() > task['deadline']:
+                with self._condition:
+                    stats['dropped'] += 1
+                future.cancel()
+                continue
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = task['fn'](*task['args'])
+            except Exception as e:
+                with self._condition:
+                    stats['failed'] += 1
+                print(f"[ERROR] Inference task '{task['class']}' failed: {e}")
+                future.set_exception(e)
+                continue
+
+            finished = time.time()
+            with self._condition:
+                stats['completed'] += 1
+                stats['latencies'].append(finished - task['submitted'])
+                if task['deadline'] is not None and finished > task['deadline']:
+                    stats['deadline_misses'] += 1
+            future.set_result(result)
+
+    def queue_lag(self):
+        """Age in seconds of the oldest queued task"""
+        with self._condition:
+            queued = [entry[3]['submitted'] for heap in self._heaps.values()
+                      for entry in heap if not entry[3]['cancelled']]
+        return time.time() - min(queued) if queued else 0.0
+
+    def stats(self):
+        """Return per-class counters and latency percentiles in milliseconds"""
+        with self._condition:
+            queued = {name: 0 for name in self._stats}
+            for heap in self._heaps.values():
+                for entry in heap:
+                    if not entry[3]['cancelled']:
+                        queued[entry[3]['class']] += 1
+            snapshot = {name: dict(values, latencies=list(values['latencies']))
+                        for name, values in self._stats.items()}
+
+        result = {}
+        for name, values in snapshot.items():
+            latencies = sorted(values.pop('latencies'))
+            for label, fraction in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+                if latencies:
+                    index = min(len(latencies) - 1, int(fraction * len(latencies)))
+                    values[label] = round(latencies[index] * 1000.0, 2)
+                else:
+                    values[label] = None
+            values['queued'] = queued[name]
+            result[name] = values
+        result['queue_lag'] = self.queue_lag()
+        return result
@@ -0,0 +1,564 @@
+"""
+Remote ingest gateway for devices attached to edge nodes.
+
+Edge boxes next to each station read the EMG (serial) and IMU (BLE) devices
+with the usual handlers and forward their samples in batched frames over UDP
+or WebSocket. The gateway on the central server decodes the frames, tracks
+per-device sequence numbers and exposes every station's devices as
+RemoteEMGHandler / RemoteIMUHandler objects with the same interface as the
+local handlers (connected, register_callback, get_data, disconnect).
+
+Frame layout (all little-endian):
+
+    header   4s   magic b'FLXI'
+             B    format version (1)
+             B    stream (1 = emg, 2 = imu)
+             B    number of channels
+             B    length of the station id in bytes
+             Q    sequence number of the first sample (per station and stream)
+             H    number of samples
+    station  utf-8 station id
+    body     float64 [samples] sample timestamps (edge clock, seconds)
+             float64 [samples][channels] values, one row per sample
+
+Edge side, forwarding a station's local devices to the server:
+
+    python -m app.utils.ingest_gateway --station bench-1 --server 10.0.0.5 --emg-port /dev/ttyACM0
+"""
+import argparse
+import asyncio
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from app.utils.resource_governor import governor
+
+MAGIC = b'FLXI'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBBQH')
+MAX_STATION_LENGTH = 64
+
+DEFAULT_UDP_PORT = 9750
+DEFAULT_WEBSOCKET_PORT = 9751
+
+STREAM_IDS = {'emg': 1, 'imu': 2}
+STREAM_NAMES = {stream_id: name for name, stream_id in STREAM_IDS.items()}
+STREAM_COLUMNS = {
+    'emg': ['time', 'bicep', 'shoulder', 'tricep'],
+    'imu': ['accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z']
+}
+
+# Samples per frame sent by the edge: ~20 ms of EMG at 1 kHz, ~0.1 s of IMU at 130 Hz
+DEFAULT_BATCH_SIZES = {'emg': 20, 'imu': 13}
+
+
+def encode_frame(station, stream, seq, timestamps, values):
+    """
+    Pack a batch of samples of one stream
+
+    Args:
+        station: Station id
+        stream: 'emg' or 'imu'
+        seq: Sequence number of the first sample
+        timestamps: Sample timestamps [n]
+        values: Samples [n, channels]
+    """
+    station_id = station.encode()
+    if len(station_id) > MAX_STATION_LENGTH:
+        raise ValueError(f"Station id longer than {MAX_STATION_LENGTH} bytes: {station}")
+    values = np.asarray(values, dtype='<f8')
+    count, channels = values.shape
+    return (HEADER.pack(MAGIC, VERSION, STREAM_IDS[stream], channels, len(station_id), seq, count)
+            + station_id
+            + np.asarray(timestamps, dtype='<f8').tobytes()
+            + values.tobytes())
+
+
+def decode_frame(payload):
+    """
+    Unpack a frame
+
+    Returns:
+        (station, stream, seq, timestamps [n], values [n, channels])
+    """
+    if len(payload) < HEADER.size:
+        raise ValueError('Frame shorter than its header')
+    magic, version, stream_id, channels, station_length, seq, count = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a FleX ingest frame')
+    stream = STREAM_NAMES.get(stream_id)
+    if stream is None or channels != len(STREAM_COLUMNS[stream]):
+        raise ValueError(f"Unknown stream {stream_id} with {channels} channels")
+    offset = HEADER.size + station_length
+    if len(payload) != offset + 8 * count * (1 + channels):
+        raise ValueError('Frame length does not match its sample count')
+    station = payload[HEADER.size:offset].decode()
+    timestamps = np.frombuffer(payload, dtype='<f8', count=count, offset=offset)
+    values = np.frombuffer(payload, dtype='<f8', count=count * channels, offset=offset + 8 * count)
+    return station, stream, seq, timestamps, values.reshape(count, channels)
+
+
+class ClockMapper:
+    """
+    Maps edge timestamps onto the server clock
+
+    The offset is the smallest (arrival - edge timestamp) seen over recent
+    frames, i.e. the clock difference plus the minimum network delay, so
+    mapped timestamps keep the edge's sample spacing and are never later
+    than the arrival.
+    """
+    def __init__(self, history=200):
+        self.candidates = deque(maxlen=history)
+        self.offset = None
+
+    def update(self, last_timestamp, arrival):
+        self.candidates.append(arrival - last_timestamp)
+        self.offset = min(self.candidates)
+
+    def to_server(self, timestamps):
+        return timestamps + self.offset
+
+    def reset(self):
+        self.candidates.clear()
+        self.offset = None
+
+
+class RemoteDeviceHandler:
+    """
+    A station's device whose samples arrive through the IngestGateway
+
+    Callbacks get one data dict per sample, as with the local handlers, with
+    an added 'timestamp' (sample time mapped onto the server clock).
+    """
+    STREAM = None
+
+    def __init__(self, station):
+        self.station = station
+        self.connected = False
+        self.data = {column: 0 for column in STREAM_COLUMNS[self.STREAM]}
+        self.data_callbacks = []
+        self.clock = ClockMapper()
+        self.lock = threading.Lock()
+        self.frame_received = threading.Condition(self.lock)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.next_seq = None
+        self.frames = 0
+        self.samples = 0
+        self.lost_samples = 0
+        self.duplicate_samples = 0
+        self.restarts = 0
+        self.last_arrival = None
+        self.address = None
+
+    def connect(self, timeout=10.0):
+        """Wait until the station's edge node is streaming this device"""
+        with self.frame_received:
+            if not self.frame_received.wait_for(
+                    lambda: self.last_arrival is not None and time.time() - self.last_arrival < timeout, timeout):
+                return f"No {self.STREAM.upper()} data from station {self.station}"
+            self.connected = True
+        print(f"[DEBUG] Remote {self.STREAM} device of station {self.station} streaming from {self.address}")
+        return f"Connected to remote {self.STREAM.upper()} device of station {self.station}."
+
+    def disconnect(self):
+        """Stop delivering samples; the edge node keeps sending until it is stopped"""
+        if not self.connected:
+            return f"Not connected to remote {self.STREAM.upper()} device."
+        self.connected = False
+        return f"Disconnected from remote {self.STREAM.upper()} device of station {self.station}."
+
+    def register_callback(self, callback):
+        """Register a callback function to be called when new data arrives."""
+        if callback not in self.data_callbacks:
+            self.data_callbacks.append(callback)
+
+    def unregister_callback(self, callback):
+        if callback in self.data_callbacks:
+            self.data_callbacks.remove(callback)
+
+    def get_data(self):
+        """Return the most recent sample."""
+        return dict(self.data)
+
+    def receive(self, seq, timestamps, values, address, arrival):
+        """
+        Handle a decoded frame: drop duplicate samples, count lost ones and
+        deliver the new samples to the callbacks
+        """
+        with self.frame_received:
+            if self.next_seq is not None and seq == 0 and self.next_seq > 0:
+                # The edge node restarted its sequence numbers
+                self.restarts += 1
+                self.next_seq = None
+                self.clock.reset()
+            if self.next_seq is not None:
+                if seq > self.next_seq:
+                    self.lost_samples += seq - self.next_seq
+                elif seq < self.next_seq:
+                    # Retransmitted or reordered samples that were already delivered or given up on
+                    overlap = min(self.next_seq - seq, len(values))
+                    self.duplicate_samples += overlap
+                    timestamps, values, seq = timestamps[overlap:], values[overlap:], seq + overlap
+            self.frames += 1
+            self.last_arrival = arrival
+            self.address = address
+            if not len(values):
+                self.frame_received.notify_all()
+                return
+            self.next_seq = seq + len(values)
+            self.samples += len(values)
+            self.clock.update(timestamps[-1], arrival)
+            server_timestamps = self.clock.to_server(timestamps)
+            self.frame_received.notify_all()
+
+        columns = STREAM_COLUMNS[self.STREAM]
+        for timestamp, row in zip(server_timestamps.tolist(), values.tolist()):
+            data = self._sample(columns, row)
+            data['timestamp'] = timestamp
+            self.data = data
+            if not self.connected:
+                continue
+            for callback in list(self.data_callbacks):
+                try:
+                    callback(dict(data))
+                except Exception as e:
+                    print(f"[ERROR] Error in remote {self.STREAM} callback: {e}")
+
+    def _sample(self, columns, row):
+        return dict(zip(columns, row))
+
+    def stats(self):
+        """Frame, sample and loss counters of this device"""
+        with self.lock:
+            expected = self.samples + self.lost_samples
+            return {
+                'connected': self.connected,
+                'address': f"{self.address[0]}:{self.address[1]}" if self.address else None,
+                'frames': self.frames,
+                'samples': self.samples,
+                'lost_samples': self.lost_samples,
+                'duplicate_samples': self.duplicate_samples,
+                'loss_rate': round(self.lost_samples / expected, 4) if expected else 0.0,
+                'restarts': self.restarts,
+                'last_frame_age': round(time.time() - self.last_arrival, 3) if self.last_arrival else None,
+                'clock_offset': round(self.clock.offset, 4) if self.clock.offset is not None else None
+            }
+
+
+class RemoteEMGHandler(RemoteDeviceHandler):
+    STREAM = 'emg'
+
+    def _sample(self, columns, row):
+        # The EMG board sends integers, as read by EMGHandler
+        return {column: int(value) for column, value in zip(columns, row)}
+
+
+class RemoteIMUHandler(RemoteDeviceHandler):
+    STREAM = 'imu'
+
+    def process_imu_data(self, data):
+        """Same hook as IMUHandler.process_imu_data"""
+        pass
+
+
+class IngestGateway:
+    """
+    Receives sample frames from edge nodes over UDP and (optionally)
+    WebSocket and routes them to the stations' remote device handlers
+    """
+    def __init__(self):
+        self.host = '0.0.0.0'
+        self.udp_port = DEFAULT_UDP_PORT
+        self.websocket_port = None
+        self.devices = {}  # (station, stream) -> RemoteDeviceHandler
+        self.lock = threading.Lock()
+        self.running = False
+        self.udp_socket = None
+        self.threads = []
+        self.websocket_loop = None
+        self.invalid_frames = 0
+
+    def configure(self, config):
+        """
+        Read the listen addresses from a config object
+
+        Args:
+            config: Mapping or object with INGEST_HOST, INGEST_UDP_PORT and
+                    INGEST_WEBSOCKET_PORT (None disables WebSocket)
+        """
+        get = config.get if hasattr(config, 'get') else lambda name, default=None: getattr(config, name, default)
+        self.host = get('INGEST_HOST', self.host)
+        self.udp_port = get('INGEST_UDP_PORT', self.udp_port)
+        self.websocket_port = get('INGEST_WEBSOCKET_PORT', self.websocket_port)
+
+    def start(self):
+        """Start the listeners (no-op if already running)"""
+        if self.running:
+            return
+        self.running = True
+        if self.udp_port:
+            try:
+                self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                # Room for bursts from many stations while the thread is busy
+                self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+                self.udp_socket.bind((self.host, self.udp_port))
+                self.udp_socket.settimeout(0.5)
+            except OSError:
+                # Not running, so the next start() tries again
+                if self.udp_socket:
+                    self.udp_socket.close()
+                    self.udp_socket = None
+                self.running = False
+                raise
+            self._start_thread(self._run_udp, 'ingest-udp')
+            print(f"[INFO] Ingest gateway listening on udp://{self.host}:{self.udp_port}")
+        if self.websocket_port:
+            self._start_thread(self._run_websocket, 'ingest-websocket')
+
+    def _start_thread(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        if self.websocket_loop and not self.websocket_loop.is_closed():
+            self.websocket_loop.call_soon_threadsafe(self.websocket_loop.stop)
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+        self.threads = []
+        if self.udp_socket:
+            self.udp_socket.close()
+            self.udp_socket = None
+
+    def device(self, station, stream):
+        """The remote handler of a station's 'emg' or 'imu' device (created on first use)"""
+        with self.lock:
+            handler = self.devices.get((station, stream))
+            if handler is None:
+                handler = (RemoteEMGHandler if stream == 'emg' else RemoteIMUHandler)(station)
+                self.devices[(station, stream)] = handler
+            return handler
+
+    def handle_frame(self, payload, address):
+        """Decode a frame and pass it to its device"""
+        arrival = time.time()
+        try:
+            station, stream, seq, timestamps, values = decode_frame(payload)
+        except (ValueError, UnicodeDecodeError) as e:
+            self.invalid_frames += 1
+            print(f"[WARNING] Invalid ingest frame from {address}: {e}")
+            return
+        self.device(station, stream).receive(seq, timestamps, values, address, arrival)
+
+    def _run_udp(self):
+        governor.pin_current_thread('ingest')
+        while self.running:
+            try:
+                payload, address = self.udp_socket.recvfrom(65536)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if self.running:
+                    print(f"[ERROR] Ingest UDP error: {e}")
+                continue
+            self.handle_frame(payload, address)
+
+    def _run_websocket(self):
+        """Serve WebSocket producers (requires the `websockets` package)"""
+        governor.pin_current_thread('ingest')
+        try:
+            import websockets
+        except ImportError:
+            print("[ERROR] WebSocket ingest needs the websockets package; only UDP is available")
+            return
+
+        async def handle_producer(websocket, path=None):
+            address = websocket.remote_address
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    self.handle_frame(message, address)
+
+        self.websocket_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.websocket_loop)
+        try:
+            server = self.websocket_loop.run_until_complete(
+                websockets.serve(handle_producer, self.host, self.websocket_port, max_size=2 ** 20))
+            print(f"[INFO] Ingest gateway listening on ws://{self.host}:{self.websocket_port}")
+            self.websocket_loop.run_forever()
+            server.close()
+            self.websocket_loop.run_until_complete(server.wait_closed())
+        except Exception as e:
+            print(f"[ERROR] Ingest WebSocket server error: {e}")
+        finally:
+            self.websocket_loop.close()
+
+    def stats(self):
+        """Per-station device counters"""
+        with self.lock:
+            devices = dict(self.devices)
+        stations = {}
+        for (station, stream), handler in devices.items():
+            stations.setdefault(station, {})[stream] = handler.stats()
+        return {'running': self.running, 'udp_port': self.udp_port, 'websocket_port': self.websocket_port,
+                'invalid_frames': self.invalid_frames, 'stations': stations}
+
+
+class EdgeSender:
+    """
+    Batches a station's samples into frames and sends them to the gateway
+
+    A stream's batch is sent when it is full or its oldest sample is older
+    than max_delay; a background timer sends batches of streams that stop
+    delivering samples.
+    """
+    def __init__(self, station, server, udp_port=DEFAULT_UDP_PORT, websocket_url=None,
+                 batch_sizes=None, max_delay=0.05):
+        """
+        Args:
+            station: Station id, unique per edge node
+            server: Gateway host (UDP)
+            udp_port: Gateway UDP port
+            websocket_url: Send over WebSocket (ws://host:port) instead of UDP
+            batch_sizes: Samples per frame per stream
+            max_delay: Longest time (s) a sample waits for its batch to fill
+        """
+        self.station = station
+        self.address = (server, udp_port)
+        self.batch_sizes = dict(DEFAULT_BATCH_SIZES, **(batch_sizes or {}))
+        self.max_delay = max_delay
+        self.pending = {stream: ([], []) for stream in STREAM_COLUMNS}
+        self.next_seq = {stream: 0 for stream in STREAM_COLUMNS}
+        self.lock = threading.Lock()
+        self.frames_sent = 0
+        self._closed = threading.Event()
+
+        self.websocket = None
+        self.udp_socket = None
+        if websocket_url:
+            from websockets.sync.client import connect
+            self.websocket = connect(websocket_url)
+        else:
+            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        self._timer = threading.Thread(target=self._flush_due, name=f"edge-sender-{station}", daemon=True)
+        self._timer.start()
+
+    def add(self, stream, data, timestamp=None):
+        """
+        Queue one sample
+
+        Args:
+            stream: 'emg' or 'imu'
+            data: Sample dict as produced by the local handlers
+            timestamp: Sample time (defaults to now)
+        """
+        with self.lock:
+            timestamps, rows = self.pending[stream]
+            timestamps.append(time.time() if timestamp is None else timestamp)
+            rows.append([data[column] for column in STREAM_COLUMNS[stream]])
+            due = (len(rows) >= self.batch_sizes[stream]
+                   or time.time() - timestamps[0] >= self.max_delay)
+            if due:
+                self._send(stream)
+
+    def flush(self):
+        """Send every partial batch"""
+        with self.lock:
+            for stream in STREAM_COLUMNS:
+                self._send(stream)
+
+    def _flush_due(self):
+        """Timer thread: send batches whose oldest sample waited max_delay"""
+        while not self._closed.wait(self.max_delay / 2):
+            with self.lock:
+                now = time.time()
+                for stream, (timestamps, _) in self.pending.items():
+                    if timestamps and now - timestamps[0] >= self.max_delay:
+                        self._send(stream)
+
+    def _send(self, stream):
+        timestamps, rows = self.pending[stream]
+        if not rows:
+            return
+        frame = encode_frame(self.station, stream, self.next_seq[stream], timestamps, rows)
+        self.next_seq[stream] += len(rows)
+        self.pending[stream] = ([], [])
+        try:
+            if self.websocket is not None:
+                self.websocket.send(frame)
+            else:
+                self.udp_socket.sendto(frame, self.address)
+            self.frames_sent += 1
+        except OSError as e:
+            # The samples count as lost on the server; keep streaming
+            print(f"[WARNING] Could not send {stream} frame: {e}")
+
+    def close(self):
+        self._closed.set()
+        self._timer.join(timeout=1.0)
+        self.flush()
+        if self.websocket is not None:
+            self.websocket.close()
+        if self.udp_socket is not None:
+            self.udp_socket.close()
+
+
+# Shared by the whole process
+gateway = IngestGateway()
+
+
+def main():
+    """Edge node: forward the locally attached EMG and IMU devices to a gateway"""
+    parser = argparse.ArgumentParser(description='Forward local FleX devices to a remote ingest gateway')
+    parser.add_argument('--station', required=True, help='Station id, unique per edge node')
+    parser.add_argument('--server', help='Gateway host for UDP')
+    parser.add_argument('--udp-port', type=int, default=DEFAULT_UDP_PORT)
+    parser.add_argument('--websocket', help='Send over WebSocket instead, e.g. ws://10.0.0.5:9751')
+    parser.add_argument('--emg-port', help='Serial port of the EMG board (omit to skip EMG)')
+    parser.add_argument('--emg-baudrate', type=int, default=115200)
+    parser.add_argument('--no-imu', action='store_true', help="Don't connect the BLE IMU")
+    args = parser.parse_args()
+    if not (args.server or args.websocket):
+        parser.error('--server or --websocket is required')
+
+    from app.utils.device_handlers import EMGHandler, IMUHandler, BluetoothManager
+
+    sender = EdgeSender(args.station, args.server, args.udp_port, websocket_url=args.websocket)
+    bt_manager = None
+    imu_handler = None
+    emg_handler = None
+    try:
+        if not args.no_imu:
+            bt_manager = BluetoothManager()
+            bt_manager.start()
+            imu_handler = IMUHandler()
+            print(f"[INFO] {bt_manager.run_coroutine(imu_handler.connect())}")
+            imu_handler.register_callback(lambda data: sender.add('imu', data))
+        if args.emg_port:
+            emg_handler = EMGHandler()
+            print(f"[INFO] {emg_handler.connect(args.emg_port, args.emg_baudrate)}")
+            emg_handler.register_callback(lambda data: sender.add('emg', data))
+
+        print(f"[INFO] Station {args.station} forwarding to {args.websocket or f'{args.server}:{args.udp_port}'}")
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        print("[INFO] Stopping")
+    finally:
+        if emg_handler:
+            emg_handler.disconnect()
+        if imu_handler and bt_manager:
+            bt_manager.run_coroutine(imu_handler.disconnect())
+            bt_manager.stop()
+        sender.close()
+
+
+if __name__ == '__main__':
+    main()
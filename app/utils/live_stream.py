@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+
+from app.utils.broadcast import BroadcastHub
+
+# Column names of the streams pushed to live subscribers
+STREAM_COLUMNS = {
+    'imu': ['accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z'],
+    'emg': ['time', 'bicep', 'shoulder', 'tricep']
+}
+
+
+def format_event(event, data, event_id=None):
+    """Encode one Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class LiveStreamEncoder:
+    """
+    Pushes batched deltas of a live session to Server-Sent Event subscribers
+
+    At every frame, all samples that arrived since the previous frame and any
+    changed ML results are encoded once and published to a BroadcastHub that
+    all subscribers read from, so the cost per frame doesn't grow with the
+    number of viewers. The encoder only runs while someone is subscribed.
+
+    Subscribers that lag are skipped ahead by the hub; the samples' sequence
+    numbers show them the gap, and the ML results are repeated every
+    keyframe_interval frames so they catch up with those too.
+    """
+    def __init__(self, windows, get_results, frame_rate=10, buffered_frames=256, keyframe_interval=10):
+        """
+        Args:
+            windows: WindowingEngine with the session's 'imu' and 'emg' streams
+            get_results: Callable returning the session's current ML results dict
+            frame_rate: Frames pushed per second
+            buffered_frames: Frames kept for subscribers that are behind
+            keyframe_interval: Frames between repeats of unchanged ML results
+        """
+        self.windows = windows
+        self.get_results = get_results
+        self.frame_rate = frame_rate
+        self.keyframe_interval = keyframe_interval
+
+        self.hub = BroadcastHub(buffered_frames)
+        # Guards the encoder thread and the cursors it advances
+        self.lock = threading.Lock()
+        self.thread = None
+        self.reset()
+
+    def reset(self):
+        """Start from the current position of the streams, e.g. for a new session"""
+        with self.lock:
+            self.cursors = {stream: self.windows.count(stream) for stream in STREAM_COLUMNS}
+            self.last_results = None
+            self.frame_id = 0
+
+    def subscribe(self):
+        """
+        Add a subscriber
+
+        Returns:
+            Subscription to read encoded frames from
+        """
+        subscriber = self.hub.subscribe()
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='live-stream', daemon=True)
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.hub.unsubscribe(subscriber)
+
+    def hello(self, frame_rate=None):
+        """
+        Event sent to a new subscriber: stream layout and the current results
+
+        Args:
+            frame_rate: Rate the subscriber is served at (default: the encoder's)
+        """
+        return format_event('hello', {
+            'columns': STREAM_COLUMNS,
+            'frame_rate': frame_rate or self.frame_rate,
+            'ml_results': self.get_results()
+        })
+
+    def encode_frame(self):
+        """
+        Encode everything new since the previous frame
+
+        Returns:
+            The encoded frame, or None if nothing changed
+        """
+        frame = {'streams': {}}
+        for stream in STREAM_COLUMNS:
+            data, _, start = self.windows.read_since(stream, self.cursors[stream])
+            if not len(data):
+                continue
+            entry = {'start': start, 'samples': data.tolist()}
+            if start > self.cursors[stream]:
+                # Samples older than the buffer were lost
+                entry['gap'] = start - self.cursors[stream]
+            frame['streams'][stream] = entry
+            self.cursors[stream] = start + len(data)
+
+        results = dict(self.get_results())
+        if results != self.last_results or (self.frame_id + 1) % self.keyframe_interval == 0:
+            frame['ml_results'] = results
+            self.last_results = results
+
+        if not frame['streams'] and 'ml_results' not in frame:
+            return None
+        self.frame_id += 1
+        frame['frame'] = self.frame_id
+        return format_event('frame', frame, self.frame_id)
+
+    def _run(self):
+        """Encode and fan out frames until the last subscriber leaves"""
+        while True:
+            with self.lock:
+                if not self.hub.subscriber_count:
+                    self.thread = None
+                    return
+            started = time.time()
+
+            try:
+                with self.lock:
+                    encoded = self.encode_frame()
+            except Exception as e:
+                print(f"[ERROR] Error encoding live frame: {e}")
+                encoded = None
+
+            if encoded is not None:
+                self.hub.publish(encoded)
+
+            time.sleep(max(0.0, 1.0 / self.frame_rate - (time.time() - started)))
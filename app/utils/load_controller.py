@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+
+
+class LoadController:
+    """
+    Overload controller that trades ML accuracy for timeliness under CPU pressure.
+
+    Every interval it samples the inference queue lag and CPU use. When either
+    stays above its high threshold for degrade_after seconds the degradation
+    level steps down one level; when both stay below the low thresholds for
+    recover_after seconds it steps back up. Levels, in order:
+
+        0 normal             full pipeline
+        1 reduced_hop        rep detection runs on every 2nd IMU batch
+        2 sparse_fatigue     ...and fatigue is only analysed on every 3rd rep
+        3 light_detector     ...and the streaming segmenter replaces the rep model
+    """
+    LEVELS = [
+        {'name': 'normal', 'hop_multiplier': 1, 'fatigue_every': 1, 'rep_detector': None},
+        {'name': 'reduced_hop', 'hop_multiplier': 2, 'fatigue_every': 1, 'rep_detector': None},
+        {'name': 'sparse_fatigue', 'hop_multiplier': 2, 'fatigue_every': 3, 'rep_detector': None},
+        {'name': 'light_detector', 'hop_multiplier': 2, 'fatigue_every': 3, 'rep_detector': 'segmenter'},
+    ]
+
+    def __init__(self, queue_lag, lag_high=0.5, lag_low=0.1, cpu_high=0.85, cpu_low=0.6,
+                 degrade_after=2.0, recover_after=10.0, interval=0.5):
+        """
+        Args:
+            queue_lag: Callable returning the current inference queue lag in seconds
+            lag_high / lag_low: Queue lag (s) above which to degrade / below which to recover
+            cpu_high / cpu_low: CPU use (fraction of all cores) thresholds
+            degrade_after / recover_after: Seconds a condition must hold before changing level
+            interval: Seconds between samples
+        """
+        self.queue_lag = queue_lag
+        self.lag_high = lag_high
+        self.lag_low = lag_low
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.degrade_after = degrade_after
+        self.recover_after = recover_after
+        self.interval = interval
+
+        self.level = 0
+        self.last_lag = 0.0
+        self.last_cpu = 0.0
+        self.overloaded_since = None
+        self.idle_since = None
+        self.level_changes = 0
+        self.listeners = []
+        self.sample_listeners = []
+
+        # Cores the process may run on (fewer than the host's when pinned)
+        if hasattr(os, 'sched_getaffinity'):
+            self._cpu_count = len(os.sched_getaffinity(0)) or 1
+        else:
+            self._cpu_count = os.cpu_count() or 1
+        self._last_sample = (time.time(), time.process_time())
+        # update() runs on the sampling thread while stop() resets the level
+        # from request threads; re-entrant because update() calls _set_level()
+        self.lock = threading.RLock()
+        self._thread = None
+        self._stopped = None
+
+    @property
+    def settings(self):
+        """Pipeline settings of the current level"""
+        return self.LEVELS[self.level]
+
+    def register_listener(self, callback):
+        """Call callback(level_settings) whenever the level changes"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def unregister_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def register_sample_listener(self, callback):
+        """Call callback(stats()) after every sample of the background thread"""
+        if callback not in self.sample_listeners:
+            self.sample_listeners.append(callback)
+
+    def unregister_sample_listener(self, callback):
+        if callback in self.sample_listeners:
+            self.sample_listeners.remove(callback)
+
+    def start(self):
+        """Start sampling in a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            if not self._stopped.is_set():
+                return
+            # A previous run that didn't stop in time; never run two samplers
+            self._thread.join(timeout=self.interval + 1.0)
+            if self._thread.is_alive():
+                print("[WARNING] Load controller thread still stopping, not restarted")
+                return
+        # A fresh event per run, so a thread of a previous run can't miss its stop
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stopped,), name='load-controller',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and return to full accuracy"""
+        thread = self._thread
+        if self._stopped is not None:
+            self._stopped.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=self.interval + 1.0)
+        if thread is not None and not thread.is_alive():
+            self._thread = None
+        with self.lock:
+            self.overloaded_since = None
+            self.idle_since = None
+            self._set_level(0)
+
+    def cpu_usage(self):
+        """CPU use of this process since the last sample, as a fraction of the cores it may run on
+
+        Only this process's CPU time counts: it reacts within one interval,
+        and it is the load that degrading the pipeline can shed.
+        """
+        now, cpu = time.time(), time.process_time()
+        last_now, last_cpu = self._last_sample
+        self._last_sample = (now, cpu)
+        return (cpu - last_cpu) / max(now - last_now, 1e-6) / self._cpu_count
+
+    def update(self, lag, cpu, now=None):
+        """Feed one sample and step the level if a threshold held long enough"""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.last_lag = lag
+            self.last_cpu = cpu
+
+            if lag > self.lag_high or cpu > self.cpu_high:
+                self.idle_since = None
+                if self.overloaded_since is None:
+                    self.overloaded_since = now
+                if now - self.overloaded_since >= self.degrade_after and self.level < len(self.LEVELS) - 1:
+                    self._set_level(self.level + 1)
+                    self.overloaded_since = now
+            elif lag < self.lag_low and cpu < self.cpu_low:
+                self.overloaded_since = None
+                if self.idle_since is None:
+                    self.idle_since = now
+                if now - self.idle_since >= self.recover_after and self.level > 0:
+                    self._set_level(self.level - 1)
+                    self.idle_since = now
+            else:
+                self.overloaded_since = None
+                self.idle_since = None
+            return self.level
+
+    def _set_level(self, level):
+        with self.lock:
+            if level == self.level:
+                return
+            print(f"[INFO] ML degradation level {self.level} -> {level} ({self.LEVELS[level]['name']})")
+            self.level = level
+            self.level_changes += 1
+            for callback in list(self.listeners):
+                try:
+                    callback(self.settings)
+                except Exception as e:
+                    print(f"[ERROR] Error in load listener: {e}")
+
+    def _run(self, stopped):
+        while not stopped.is_set():
+            try:
+                self.update(self.queue_lag(), self.cpu_usage())
+                stats = self.stats()
+                for callback in list(self.sample_listeners):
+                    callback(stats)
+            except Exception as e:
+                print(f"[ERROR] Load controller error: {e}")
+            stopped.wait(self.interval)
+
+    def stats(self):
+        """Return the current level and the inputs it was based on"""
+        return {
+            'level': self.level,
+            'name': self.settings['name'],
+            'queue_lag': round(self.last_lag, 3),
+            'cpu': round(self.last_cpu, 3),
+            'level_changes': self.level_changes
+        }
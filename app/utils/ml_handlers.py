@@ -5,8 +5,25 @@ from pathlib import Path
 import numpy as np
 import os
 from pathlib import Path
-import tsfel
-from tensorflow.keras.models import load_model
+
+# TSFEL and TensorFlow are imported inside the functions that need them, so that
+# importing this module stays cheap and models can be loaded lazily by the registry
+
+def extract_emg_features(emg_data, cfg, fs):
+    """Extract a TSFEL feature vector from a single rep's EMG data"""
+    import tsfel
+    
+    features_df = tsfel.time_series_features_extractor(
+        cfg, 
+        emg_data, 
+        fs=fs, 
+        window_size=None, 
+        overlap=0, 
+        verbose=0
+    )
+
+    # Convert to feature vector
+    return features_df.iloc[0].values.astype(np.float32)
 
 class BaseModel:
     """Base class for ML models"""
@@ -25,6 +42,9 @@ class BaseModel:
         model_path_str = str(model_path)
         
         if model_path_str.endswith('.h5'):
+            from app.utils.resource_governor import governor
+            governor.configure_tensorflow()
+            from tensorflow.keras.models import load_model
             return load_model(model_path)
         else:
             import joblib
@@ -41,9 +61,21 @@ class BaseModel:
         
         processed_data = self.preprocess(data)
         return self.model.predict(processed_data)
+    
+    # Shape of a representative input window, used for warm-up inference
+    warmup_shape = None
+    
+    def warmup(self):
+        """Run one dummy inference so the first real prediction doesn't pay
+        feature-extraction setup and graph-tracing costs"""
+        if self.model is None or self.warmup_shape is None:
+            return
+        self.predict(np.zeros(self.warmup_shape, dtype=np.float32))
 
 class RepDetectionModel(BaseModel):
     """Model for detecting exercise repetitions"""
+    warmup_shape = (30, 6)
+    
     def __init__(self):
         model_path = Path(__file__).parent.parent / 'models' / 'rf_rep_counter_tsfel.h5'
         super().__init__(model_path)
@@ -61,6 +93,10 @@ class RepDetectionModel(BaseModel):
             with h5py.File(model_path, 'r') as hf:
                 model_bytes = hf['model'][()]
                 self.model = pickle.loads(model_bytes.tobytes())
+            
+            # Limit the random forest's prediction jobs
+            from app.utils.resource_governor import governor
+            governor.configure_estimator(self.model)
                 
             # Load the scaler if it exists
             scaler_path = model_path.parent / 'rf_scaler.pkl'
@@ -148,16 +184,60 @@ class RepDetectionModel(BaseModel):
         else:
             result = 0  # No new rep
         return result
+    
+    def predict_batch(self, imu_windows):
+        """
+        Predict rep detection for many equally sized windows in one call
+        
+        Args:
+            imu_windows: Array of shape [num_windows, window_size, 6]
+        
+        Returns:
+            Array with 1 (new rep detected) or 0 (no new rep) per window
+        """
+        import tsfel
+        import pandas as pd
+        
+        imu_windows = np.asarray(imu_windows, dtype=np.float32)
+        num_windows, window_size = imu_windows.shape[:2]
+        if num_windows == 0:
+            return np.zeros(0, dtype=int)
+        
+        if self.model is None:
+            # Fallback: 10% chance of detecting a new rep
+            return (np.random.random(num_windows) < 0.1).astype(int)
+        
+        # Concatenate the windows and let TSFEL split them again, which extracts
+        # one feature row per window in a single call
+        df = pd.DataFrame(imu_windows.reshape(-1, imu_windows.shape[2]),
+                          columns=["Accel_X", "Accel_Y", "Accel_Z",
+                                   "Gyro_X", "Gyro_Y", "Gyro_Z"])
+        cfg = tsfel.get_features_by_domain(["temporal"])
+        features_df = tsfel.time_series_features_extractor(
+            cfg, df, fs=130, window_size=window_size, overlap=0, verbose=0)
+        features = np.nan_to_num(features_df.values, nan=0.0)
+        
+        if hasattr(self, 'scaler') and self.scaler is not None:
+            features = self.scaler.transform(features)
+        
+        prediction = self.model.predict(features)
+        return (prediction == 1).astype(int)
 
 class ExerciseClassificationModel(BaseModel):
     """Model for classifying exercise type using TSFEL features"""
-    def __init__(self):
+    warmup_shape = (300, 6)
+    exercise_types = ['bicep_curl', 'shoulder_press', 'lat_raise']
+    fs = 1000  # Sampling frequency in Hz, adjust if needed.
+    num_features = 468  # Length of the model's input vector
+    
+    def __init__(self, model_path=None):
         # Change the model file to an .h5 model for this updated pipeline
-        model_path = Path(__file__).parent.parent / 'models' / 'mlp_exercise_classifier.h5'
+        if model_path is None:
+            model_path = Path(__file__).parent.parent / 'models' / 'mlp_exercise_classifier.h5'
         super().__init__(model_path)
         
         # Setup TSFEL configuration for extracting features from the IMU data.
-        self.fs = 1000  # Sampling frequency in Hz, adjust if needed.
+        import tsfel
         self.cfg = tsfel.get_features_by_domain()
         
         # Fallback logic if model file doesn't exist.
@@ -165,6 +245,8 @@ class ExerciseClassificationModel(BaseModel):
             print("[WARNING] Exercise classification model not found, using fallback logic")
     
     def extract_features(self, imu_data):
+        import tsfel
+        
         # Select acceleration data (assuming columns 1,2,3 correspond to indices 0, 1, 2)
         accel_data = imu_data[:, :3]
         
@@ -194,7 +276,7 @@ class ExerciseClassificationModel(BaseModel):
         """
         # Calculate TSFEL features from the raw IMU data
         features = self.extract_features(imu_data)
-        features = features[:468]
+        features = features[:self.num_features]
         # Reshape features into a 2D array [batch, num_features]
         processed_features = np.expand_dims(features, axis=0)
         return processed_features
@@ -211,24 +293,66 @@ class ExerciseClassificationModel(BaseModel):
             predicted_class_idx = np.argmax(prediction, axis=1)[0]
 
             # Map the class index to an exercise type. Adjust the mapping as needed.
-            exercise_types = ['bicep_curl', 'shoulder_press', 'lat_raise']
             print("predicted class index is:", predicted_class_idx)
-            return exercise_types[predicted_class_idx]
+            return self.exercise_types[predicted_class_idx]
         else:
             # Fallback logic if the model is not available
             print("[INFO] Using fallback logic for exercise classification")
             return 'bicep_curl'
+    
+    def predict_with_features(self, imu_data):
+        """
+        Predict the exercise type and also return the feature vector it was
+        predicted from, so it can be stored for later re-scoring
+        
+        Returns:
+            (exercise type, feature vector or None when using fallback logic)
+        """
+        if self.model is None:
+            return self.predict(imu_data), None
+        
+        processed_features = self.preprocess(imu_data)
+        prediction = self.model.predict(processed_features, verbose=0)
+        return self.exercise_types[np.argmax(prediction, axis=1)[0]], processed_features[0]
+    
+    def predict_features(self, features):
+        """Predict exercise types from stored feature vectors, shape [num_reps, num_features]"""
+        prediction = self.model.predict(np.asarray(features, dtype=np.float32)[:, :self.num_features], verbose=0)
+        return [self.exercise_types[idx] for idx in np.argmax(prediction, axis=1)]
+    
+    def predict_batch(self, imu_windows):
+        """
+        Predict the exercise type for several IMU windows with one model call
+        
+        Args:
+            imu_windows: List of arrays of shape [window_size, 6]; sizes may differ
+        
+        Returns:
+            List of exercise types, one per window
+        """
+        if len(imu_windows) == 0:
+            return []
+        if self.model is None:
+            return ['bicep_curl'] * len(imu_windows)
+        
+        features = np.stack([self.extract_features(np.asarray(w))[:self.num_features] for w in imu_windows])
+        prediction = self.model.predict(features, verbose=0)
+        return [self.exercise_types[idx] for idx in np.argmax(prediction, axis=1)]
 
 
 class FatigueClassificationModel(BaseModel):
     """Model for classifying fatigue level using TSFEL features with sequence handling"""
-    def __init__(self, exercise_type):
+    warmup_shape = (1000, 4)
+    
+    def __init__(self, exercise_type, model_path=None):
         # Update model path to use .h5 file
-        model_path = Path(__file__).parent.parent / 'models' / f'{exercise_type}_fatigue_model.h5'
+        if model_path is None:
+            model_path = Path(__file__).parent.parent / 'models' / f'{exercise_type}_fatigue_model.h5'
         super().__init__(model_path)
         self.exercise_type = exercise_type
         
         # Set up TSFEL configuration
+        import tsfel
         self.fs = 1000  # Sampling frequency (Hz)
         self.cfg = tsfel.get_features_by_domain()
         
@@ -239,25 +363,18 @@ class FatigueClassificationModel(BaseModel):
         if self.model is None:
             print(f"[WARNING] Fatigue model for {exercise_type} not found, using fallback logic")
     
+    @property
+    def feature_key(self):
+        """Identifies the feature extraction this model needs, so models with the
+        same key can share one extraction per rep"""
+        return ('tsfel_all_domains', self.fs)
+    
     def extract_features(self, emg_data):
         """Extract TSFEL features from a single rep's EMG data"""
         if self.model is None:
             return emg_data  # Return original data for fallback logic
         
-        # Extract features using TSFEL
-        features_df = tsfel.time_series_features_extractor(
-            self.cfg, 
-            emg_data, 
-            fs=self.fs, 
-            window_size=None, 
-            overlap=0, 
-            verbose=0
-        )
-
-        # Convert to feature vector
-        features_vector = features_df.iloc[0].values.astype(np.float32)
-
-        return features_vector
+        return extract_emg_features(emg_data, self.cfg, self.fs)
     
     def add_rep(self, emg_data):
         """Add a rep to the current session sequence and return its features"""
@@ -269,6 +386,14 @@ class FatigueClassificationModel(BaseModel):
         """Reset the session rep sequence"""
         self.session_rep_features = []
     
+    def warmup(self):
+        """Warm up feature extraction and the sequence model without touching
+        the session rep sequence"""
+        if self.model is None:
+            return
+        features = self.extract_features(np.zeros(self.warmup_shape, dtype=np.float32))
+        self.model.predict(self.build_sequence([features]), verbose=0)
+    
     def preprocess(self, emg_data=None):
         """
         Prepare the model input from the current session's rep sequence
@@ -286,6 +411,18 @@ class FatigueClassificationModel(BaseModel):
         if emg_data is not None:
             self.add_rep(emg_data)
         
+        return self.build_sequence(self.session_rep_features)
+    
+    def build_sequence(self, rep_features):
+        """
+        Build the padded model input for a sequence of rep feature vectors
+        
+        Args:
+            rep_features: List of per-rep feature vectors in session order
+            
+        Returns:
+            Array of shape [1, max_sequence_length, num_features]
+        """
         # Get expected input shape from the model
         input_shape = self.model.input_shape
         max_sequence_length = input_shape[1]  # Usually 31 from the training code
@@ -295,16 +432,32 @@ class FatigueClassificationModel(BaseModel):
         padded_seq = np.zeros((1, max_sequence_length, num_features), dtype=np.float32)
         
         # Fill with available rep features (most recent at the end)
-        num_reps = min(len(self.session_rep_features), max_sequence_length)
+        num_reps = min(len(rep_features), max_sequence_length)
         
         for i in range(num_reps):
             # Get rep features, possibly truncating if dimensions don't match
-            rep_features = self.session_rep_features[-(num_reps-i)]  # Get in sequence order
-            feature_count = min(len(rep_features), num_features)
-            padded_seq[0, i, :feature_count] = rep_features[:feature_count]
+            features = rep_features[-(num_reps-i)]  # Get in sequence order
+            feature_count = min(len(features), num_features)
+            padded_seq[0, i, :feature_count] = features[:feature_count]
         
         return padded_seq
     
+    def decode_prediction(self, prediction, num_reps):
+        """
+        Map one sequence's model output to the fatigue level of its most recent rep
+        
+        Args:
+            prediction: Model output for a single sequence, shape [timesteps, classes]
+            num_reps: Number of reps in the sequence
+        """
+        # The model predicts a fatigue level for each timestep/rep
+        last_rep_idx = min(num_reps - 1, prediction.shape[0] - 1)
+        fatigue_level_idx = np.argmax(prediction[last_rep_idx])
+        
+        # Map index to fatigue level
+        fatigue_levels = ['low', 'medium', 'high']
+        return fatigue_levels[fatigue_level_idx]
+    
     def predict(self, emg_data=None):
         """
         Classify the fatigue level based on the current sequence of reps
@@ -325,17 +478,34 @@ class FatigueClassificationModel(BaseModel):
                 prediction = self.model.predict(processed_data, verbose=0)
                 
                 # Get the predicted fatigue level for the most recent rep
-                # The model predicts a fatigue level for each timestep/rep
-                last_rep_idx = min(len(self.session_rep_features) - 1, processed_data.shape[1] - 1)
-                fatigue_level_idx = np.argmax(prediction[0][last_rep_idx])
-                
-                # Map index to fatigue level
-                fatigue_levels = ['low', 'medium', 'high']
-                return fatigue_levels[fatigue_level_idx]
+                return self.decode_prediction(prediction[0], len(self.session_rep_features))
             else:
                 return 'unknown'
         
-        # Fallback logic for when model is not available
+        return self.fallback_predict(emg_data)
+    
+    def predict_session(self, rep_features):
+        """
+        Classify the fatigue level after every rep of a recorded session with
+        a single batched model call
+        
+        Args:
+            rep_features: List of per-rep feature vectors in session order
+            
+        Returns:
+            List with the fatigue level after each rep
+        """
+        if not rep_features:
+            return []
+        
+        # Rep i is classified from the sequence of reps 0..i, as it would be live
+        sequences = np.concatenate([self.build_sequence(rep_features[:i + 1])
+                                    for i in range(len(rep_features))], axis=0)
+        predictions = self.model.predict(sequences, verbose=0)
+        return [self.decode_prediction(prediction, i + 1) for i, prediction in enumerate(predictions)]
+    
+    def fallback_predict(self, emg_data):
+        """Amplitude-based fatigue estimate used when the model file is missing"""
         if self.exercise_type == 'bicep_curl':
             # Simple amplitude-based logic for bicep curls
             bicep_emg = emg_data[:, 1] if emg_data.ndim > 1 else emg_data
@@ -0,0 +1,127 @@
+import threading
+import time
+
+from app.utils.resource_governor import governor
+
+
+class ModelRegistry:
+    """
+    Registry of lazily loaded ML models.
+
+    Blueprints register a factory per model name at import time without loading
+    anything. A model is built on first use, or ahead of time by the background
+    warm-up thread, which also runs a dummy inference so the first real
+    prediction doesn't pay TensorFlow/TSFEL start-up costs mid-session.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    def register(self, name, factory, warmup=True):
+        """
+        Register a model factory under a name
+
+        Args:
+            name: Name used to look the model up
+            factory: Callable returning the model instance
+            warmup: Whether the warm-up thread should call the model's warmup()
+        """
+        with self._lock:
+            self._entries[name] = {
+                'factory': factory,
+                'warmup': warmup,
+                'instance': None,
+                'state': 'registered',
+                'error': None,
+                'load_time': None,
+                'lock': threading.Lock()
+            }
+
+    def get(self, name):
+        """Return the model registered under name, loading it on first use"""
+        entry = self._entries[name]
+        if entry['instance'] is not None:
+            return entry['instance']
+
+        with entry['lock']:
+            # Another thread may have finished loading while we waited
+            if entry['instance'] is not None:
+                return entry['instance']
+
+            entry['state'] = 'loading'
+            start = time.time()
+            try:
+                instance = entry['factory']()
+            except Exception as e:
+                entry['state'] = 'failed'
+                entry['error'] = str(e)
+                print(f"[ERROR] Failed to load model '{name}': {e}")
+                raise
+            entry['load_time'] = time.time() - start
+            entry['instance'] = instance
+            entry['state'] = 'loaded' if entry['warmup'] else 'ready'
+            print(f"[INFO] Model '{name}' loaded in {entry['load_time']:.2f}s")
+            return instance
+
+    def is_ready(self, name=None):
+        """Whether a model (or all models, if name is None) is loaded and warmed up"""
+        names = [name] if name else list(self._entries)
+        return all(self._entries[n]['state'] == 'ready' for n in names)
+
+    def start_warmup(self):
+        """Load and warm up every registered model in a background thread"""
+        if self._warmup_thread and self._warmup_thread.is_alive():
+            return
+        self._warmup_thread = threading.Thread(target=self._warmup_all, name='model-warmup', daemon=True)
+        self._warmup_thread.start()
+
+    def _warmup_all(self):
+        """Load each model and run its dummy inference"""
+        governor.pin_current_thread('inference')
+        for name in list(self._entries):
+            entry = self._entries[name]
+            try:
+                instance = self.get(name)
+                if entry['warmup'] and hasattr(instance, 'warmup'):
+                    instance.warmup()
+                entry['state'] = 'ready'
+            except Exception as e:
+                entry['state'] = 'failed'
+                entry['error'] = str(e)
+                print(f"[ERROR] Warm-up failed for model '{name}': {e}")
+
+    def status(self):
+        """Return the load state of every registered model"""
+        models = {}
+        for name, entry in self._entries.items():
+            models[name] = {
+                'state': entry['state'],
+                'load_time': entry['load_time'],
+                'error': entry['error']
+            }
+        return {
+            'ready': self.is_ready(),
+            'models': models
+        }
+
+
+def register_default_models(registry):
+    """Register the app's models, loaded in this process"""
+    from app.utils.ml_handlers import RepDetectionModel, ExerciseClassificationModel, FatigueClassificationModel
+    from app.utils.fatigue_service import FatigueService
+
+    registry.register('rep_detection', RepDetectionModel)
+    registry.register('exercise_classification', ExerciseClassificationModel)
+    registry.register('bicep_curl_fatigue', lambda: FatigueClassificationModel(exercise_type='bicep_curl'))
+    registry.register('lat_raise_fatigue', lambda: FatigueClassificationModel(exercise_type='lat_raise'))
+
+    # Shares EMG feature extraction between the fatigue models and batches their predictions
+    registry.register('fatigue_service', lambda: FatigueService({
+        'bicep_curl': registry.get('bicep_curl_fatigue'),
+        'lat_raise': registry.get('lat_raise_fatigue')
+    }), warmup=False)
+
+
+# Shared registry used by all blueprints
+registry = ModelRegistry()
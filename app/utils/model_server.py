@@ -0,0 +1,314 @@
+"""
+Optional out-of-process model server.
+
+One server process per host owns the ML models from ml_handlers.py and serves
+predictions over a Unix socket, so multiple web workers and device processes
+share a single copy of TensorFlow and the models.
+
+Start it with:
+    python -m app.utils.model_server --socket /tmp/flex-models.sock
+
+and point the web app at it by setting FLEX_MODEL_SERVER_SOCKET to the same path.
+Requests are pickles, so both sides need the same secret in
+FLEX_MODEL_SERVER_AUTHKEY; the server refuses to start without one.
+"""
+import argparse
+import os
+import pickle
+import socket
+import struct
+import threading
+import uuid
+from concurrent.futures import Future
+from multiprocessing.connection import Listener, answer_challenge, deliver_challenge
+
+from app.utils.model_registry import ModelRegistry, register_default_models
+
+DEFAULT_SOCKET = '/tmp/flex-models.sock'
+
+
+def check_authkey(authkey):
+    """
+    Validate the shared secret of the model server
+
+    Returns:
+        The key as bytes
+
+    Raises:
+        ValueError: No key is set
+    """
+    if not authkey:
+        raise ValueError('FLEX_MODEL_SERVER_AUTHKEY must be set to use the model server')
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+class ModelServer:
+    """Serves predictions from a local model registry over a Unix socket"""
+    def __init__(self, authkey, socket_path=DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self.authkey = check_authkey(authkey)
+        self.registry = ModelRegistry()
+        register_default_models(self.registry)
+        self.listener = None
+        self.running = False
+
+    def serve_forever(self):
+        """Accept client connections, handling each one in its own thread"""
+        # Remove a stale socket left behind by a previous server
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self.listener = Listener(self.socket_path, family='AF_UNIX', authkey=self.authkey)
+        # Only this user may connect, on top of the authkey handshake
+        os.chmod(self.socket_path, 0o600)
+        self.running = True
+        self.registry.start_warmup()
+        print(f"[INFO] Model server listening on {self.socket_path}")
+
+        try:
+            while self.running:
+                try:
+                    conn = self.listener.accept()
+                except Exception as e:
+                    if self.running:
+                        print(f"[ERROR] Error accepting model client: {e}")
+                    continue
+                threading.Thread(target=self._handle_client, args=(conn,), daemon=True).start()
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop accepting connections and remove the socket"""
+        self.running = False
+        if self.listener:
+            self.listener.close()
+            self.listener = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _handle_client(self, conn):
+        """
+        Answer requests from one client until it disconnects
+
+        The first message names the client (one ID per ModelClient, shared by
+        its connections), so session IDs of different web processes, which
+        all have a 'default' session, get separate fatigue sequences.
+        """
+        try:
+            try:
+                command, client_id = conn.recv()
+            except (EOFError, OSError, ValueError, TypeError):
+                return
+            if command != 'hello':
+                return
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    conn.send(('ok', self._dispatch(client_id, *request)))
+                except Exception as e:
+                    conn.send(('error', str(e)))
+        finally:
+            conn.close()
+
+    def _dispatch(self, client_id, command, *args):
+        """Run a single request of a client against the local registry"""
+        if command == 'predict':
+            name, data = args
+            return self.registry.get(name).predict(data)
+        elif command == 'predict_with_features':
+            name, data = args
+            return self.registry.get(name).predict_with_features(data)
+        elif command == 'fatigue':
+            session_id, emg_data = args
+            return self.registry.get('fatigue_service').predict((client_id, session_id), emg_data)
+        elif command == 'fatigue_with_features':
+            session_id, emg_data = args
+            future, features = self.registry.get('fatigue_service').submit_with_features((client_id, session_id),
+                                                                                       emg_data)
+            return future.result(), features
+        elif command == 'fatigue_reset':
+            session_id, = args
+            return self.registry.get('fatigue_service').reset_session((client_id, session_id))
+        elif command == 'status':
+            return self.registry.status()
+        raise ValueError(f"Unknown model server command: {command}")
+
+
+class SocketConnection:
+    """
+    Client end of a multiprocessing.connection connection, on a plain socket
+
+    multiprocessing.connection reads and writes the raw file descriptor, which
+    gevent can't patch, so every request would block the whole event loop of
+    serve.py. This speaks the same framing (a 4-byte big-endian length, or -1
+    and an 8-byte length for huge messages, then a pickle) through
+    socket.socket, which gevent's monkey-patching makes cooperative.
+    """
+    def __init__(self, socket_path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(socket_path)
+        except OSError:
+            self.sock.close()
+            raise
+
+    def send_bytes(self, data):
+        size = len(data)
+        if size > 0x7fffffff:
+            header = struct.pack('!i', -1) + struct.pack('!Q', size)
+        else:
+            header = struct.pack('!i', size)
+        self.sock.sendall(header + data)
+
+    def recv_bytes(self, maxlength=None):
+        size, = struct.unpack('!i', self._recv_exactly(4))
+        if size == -1:
+            size, = struct.unpack('!Q', self._recv_exactly(8))
+        if maxlength is not None and size > maxlength:
+            raise OSError('Model server message too long')
+        return self._recv_exactly(size)
+
+    def send(self, obj):
+        self.send_bytes(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def recv(self):
+        return pickle.loads(self.recv_bytes())
+
+    def close(self):
+        self.sock.close()
+
+    def _recv_exactly(self, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = self.sock.recv_into(view[received:])
+            if count == 0:
+                raise EOFError('Model server closed the connection')
+            received += count
+        return bytes(buffer)
+
+
+class ModelClient:
+    """Client side of the model server, with one connection per calling thread"""
+    def __init__(self, authkey, socket_path=DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self.authkey = check_authkey(authkey)
+        self.client_id = uuid.uuid4().hex
+        self._local = threading.local()
+
+    def connect(self):
+        """Open a connection and run the server's authentication handshake"""
+        conn = SocketConnection(self.socket_path)
+        try:
+            # Same handshake as multiprocessing.connection.Client
+            answer_challenge(conn, self.authkey)
+            deliver_challenge(conn, self.authkey)
+            conn.send(('hello', self.client_id))
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def request(self, command, *args):
+        """Send a request and return the server's result"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+
+        try:
+            conn.send((command,) + args)
+            status, result = conn.recv()
+        except (EOFError, OSError):
+            # Drop the broken connection so the next call reconnects
+            self._local.conn = None
+            conn.close()
+            raise
+
+        if status == 'error':
+            raise RuntimeError(f"Model server error: {result}")
+        return result
+
+
+class RemoteModel:
+    """Stand-in for a model that lives in the model server"""
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def predict(self, data):
+        return self.client.request('predict', self.name, data)
+
+    def predict_with_features(self, data):
+        return self.client.request('predict_with_features', self.name, data)
+
+    def warmup(self):
+        """Fail early if the model server can't be reached"""
+        self.client.request('status')
+
+
+class RemoteFatigueService:
+    """Stand-in for the FatigueService that lives in the model server"""
+    def __init__(self, client):
+        self.client = client
+
+    def predict(self, session_id, emg_data, timeout=None):
+        return self.client.request('fatigue', session_id, emg_data)
+
+    def submit(self, session_id, emg_data):
+        """Classify a rep on the server; returns an already completed Future"""
+        return self.submit_with_features(session_id, emg_data)[0]
+
+    def submit_with_features(self, session_id, emg_data):
+        """Classify a rep on the server and return (completed Future, features)"""
+        future = Future()
+        features = {}
+        try:
+            levels, features = self.client.request('fatigue_with_features', session_id, emg_data)
+            future.set_result(levels)
+        except Exception as e:
+            future.set_exception(e)
+        return future, features
+
+    def reset_session(self, session_id):
+        self.client.request('fatigue_reset', session_id)
+
+
+def register_remote_models(registry, authkey, socket_path=DEFAULT_SOCKET):
+    """
+    Point the registry's models at a running model server
+
+    Raises:
+        ValueError: No authkey is set
+    """
+    client = ModelClient(authkey, socket_path)
+    registry.register('rep_detection', lambda: RemoteModel(client, 'rep_detection'))
+    registry.register('exercise_classification', lambda: RemoteModel(client, 'exercise_classification'))
+    registry.register('bicep_curl_fatigue', lambda: RemoteModel(client, 'bicep_curl_fatigue'))
+    registry.register('lat_raise_fatigue', lambda: RemoteModel(client, 'lat_raise_fatigue'))
+    registry.register('fatigue_service', lambda: RemoteFatigueService(client), warmup=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FleX local model server')
+    parser.add_argument('--socket', default=os.environ.get('FLEX_MODEL_SERVER_SOCKET', DEFAULT_SOCKET),
+                        help='Unix socket path to listen on')
+    args = parser.parse_args()
+
+    authkey = os.environ.get('FLEX_MODEL_SERVER_AUTHKEY')
+    if not authkey:
+        parser.error('FLEX_MODEL_SERVER_AUTHKEY must be set to a secret shared with the web app')
+
+    server = ModelServer(authkey, args.socket)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[INFO] Model server stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap motion-energy pre-filter that skips rep-detection inference while the
+    athlete is at rest.
+
+    Each IMU block is scored by its accelerometer variance and mean gyroscope
+    magnitude. The gate opens when either exceeds its start threshold and only
+    closes after both stay below the lower stop thresholds for hold_blocks
+    consecutive blocks, so the tail of a rep is never cut off.
+
+    While closed, every audit_interval-th block is still evaluated so that reps
+    the gate would have missed show up in the counters.
+    """
+    EVALUATE = 'evaluate'
+    AUDIT = 'audit'
+    SKIP = 'skip'
+
+    def __init__(self, accel_start=0.002, accel_stop=0.001,
+                 gyro_start=15.0, gyro_stop=8.0, hold_blocks=2, audit_interval=20):
+        """
+        Args:
+            accel_start / accel_stop: Summed per-axis accelerometer variance (g^2)
+                that opens / closes the gate
+            gyro_start / gyro_stop: Mean gyroscope magnitude (deg/s) that opens /
+                closes the gate
+            hold_blocks: Number of quiet blocks required before the gate closes
+            audit_interval: Evaluate one in this many skipped blocks (0 disables)
+        """
+        self.accel_start = accel_start
+        self.accel_stop = accel_stop
+        self.gyro_start = gyro_start
+        self.gyro_stop = gyro_stop
+        self.hold_blocks = hold_blocks
+        self.audit_interval = audit_interval
+        self.reset()
+
+    def reset(self):
+        """Reset the gate state and counters for a new session"""
+        self.active = False
+        self.quiet_blocks = 0
+        self.skipped_since_audit = 0
+        self.evaluated = 0
+        self.skipped = 0
+        self.audited = 0
+        self.activations = 0
+        self.missed_reps = 0
+        self.last_accel_energy = 0.0
+        self.last_gyro_energy = 0.0
+
+    def check(self, imu_block):
+        """
+        Decide whether the rep detector should run on this block
+
+        Args:
+            imu_block: Array of shape [block_size, 6] with accel then gyro axes
+
+        Returns:
+            EVALUATE, AUDIT (evaluate although the gate is closed) or SKIP
+        """
+        accel_energy = float(np.var(imu_block[:, :3], axis=0).sum())
+        gyro_energy = float(np.mean(np.linalg.norm(imu_block[:, 3:6], axis=1)))
+        self.last_accel_energy = accel_energy
+        self.last_gyro_energy = gyro_energy
+
+        if accel_energy > self.accel_start or gyro_energy > self.gyro_start:
+            if not self.active:
+                self.activations += 1
+            self.active = True
+            self.quiet_blocks = 0
+        elif self.active and accel_energy < self.accel_stop and gyro_energy < self.gyro_stop:
+            self.quiet_blocks += 1
+            if self.quiet_blocks >= self.hold_blocks:
+                self.active = False
+        else:
+            self.quiet_blocks = 0
+
+        if self.active:
+            self.evaluated += 1
+            return self.EVALUATE
+
+        self.skipped_since_audit += 1
+        if self.audit_interval and self.skipped_since_audit >= self.audit_interval:
+            self.skipped_since_audit = 0
+            self.audited += 1
+            return self.AUDIT
+
+        self.skipped += 1
+        return self.SKIP
+
+    def record(self, decision, rep_status):
+        """Record the rep detector's output for a block that was evaluated"""
+        if decision == self.AUDIT and rep_status == 1:
+            # The model found a rep in a block the gate would have skipped,
+            # so treat the athlete as moving again
+            self.missed_reps += 1
+            self.active = True
+            self.quiet_blocks = 0
+
+    def stats(self):
+        """Return skipped-vs-evaluated counters"""
+        total = self.evaluated + self.audited + self.skipped
+        return {
+            'active': self.active,
+            'evaluated': self.evaluated,
+            'audited': self.audited,
+            'skipped': self.skipped,
+            'skip_ratio': self.skipped / total if total else 0.0,
+            'activations': self.activations,
+            'missed_reps': self.missed_reps,
+            'accel_energy': self.last_accel_energy,
+            'gyro_energy': self.last_gyro_energy
+        }
@@ -0,0 +1,195 @@
+"""
+Offline analysis of recorded sessions.
+
+Replays the *_imu.csv / *_emg.csv pairs in the data directory through the same
+windowing and models used by live sessions (app/utils/session.py), spreading sessions across a process
+pool, and writes one result row per detected rep.
+
+Usage:
+    python -m app.utils.offline_analysis --data-dir data --output analysis_results.csv
+"""
+import argparse
+import csv
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from app.utils.model_registry import ModelRegistry, register_default_models
+from app.utils.windowing import REP_BATCH_SIZE, IMU_WINDOW_SIZE, EMG_WINDOW_SIZE, MIN_REP_WINDOW, MIN_FATIGUE_WINDOW
+
+IMU_COLUMNS = ['Accel_X', 'Accel_Y', 'Accel_Z', 'Gyro_X', 'Gyro_Y', 'Gyro_Z']
+EMG_COLUMNS = ['Time_ms', 'Bicep', 'Shoulder', 'Tricep']
+
+RESULT_COLUMNS = ['session', 'rep', 'timestamp', 'exercise', 'bicep_fatigue', 'shoulder_fatigue']
+
+# Models of the current worker process, loaded once by _init_worker
+_registry = None
+
+
+def find_sessions(data_dir):
+    """Return (session_name, imu_path, emg_path) for every complete recording"""
+    sessions = []
+    for imu_path in sorted(glob.glob(os.path.join(data_dir, '*_imu.csv'))):
+        session_name = os.path.basename(imu_path)[:-len('_imu.csv')]
+        emg_path = os.path.join(data_dir, f"{session_name}_emg.csv")
+        if os.path.exists(emg_path):
+            sessions.append((session_name, imu_path, emg_path))
+    return sessions
+
+
+def load_session(imu_path, emg_path):
+    """Load a recording as timestamp and sample arrays"""
+    imu_df = pd.read_csv(imu_path)
+    emg_df = pd.read_csv(emg_path)
+    return (imu_df['Timestamp'].to_numpy(), imu_df[IMU_COLUMNS].to_numpy(dtype=np.float32),
+            emg_df['Timestamp'].to_numpy(), emg_df[EMG_COLUMNS].to_numpy(dtype=np.float32))
+
+
+def segment_reps(imu_ts, imu, emg_ts, emg, rep_flags):
+    """
+    Rebuild the IMU/EMG windows each detected rep would have had live
+
+    Live, both windows are cleared after every accepted rep and are capped at
+    IMU_WINDOW_SIZE / EMG_WINDOW_SIZE samples; reps with windows shorter than
+    MIN_REP_WINDOW are ignored without clearing them.
+    """
+    reps = []
+    imu_start = 0
+    emg_start = 0
+    for batch_idx, flag in enumerate(rep_flags):
+        if not flag:
+            continue
+        imu_end = (batch_idx + 1) * REP_BATCH_SIZE
+        imu_lo = max(imu_start, imu_end - IMU_WINDOW_SIZE)
+
+        # EMG samples received up to the moment the rep was detected
+        emg_end = int(np.searchsorted(emg_ts, imu_ts[imu_end - 1], side='right'))
+        emg_lo = max(emg_start, emg_end - EMG_WINDOW_SIZE)
+
+        if imu_end - imu_lo < MIN_REP_WINDOW or emg_end - emg_lo < MIN_REP_WINDOW:
+            continue
+
+        reps.append({
+            'timestamp': float(imu_ts[imu_end - 1]),
+            'imu': imu[imu_lo:imu_end],
+            'emg': emg[emg_lo:emg_end]
+        })
+        imu_start = imu_end
+        emg_start = emg_end
+    return reps
+
+
+def predict_fatigue(reps, fatigue_models):
+    """
+    Fatigue level per rep for each fatigue model
+
+    Features are extracted once per rep and shared between models with the same
+    feature key, and each model scores the whole session in one batched call.
+    """
+    results = {}
+    features_by_key = {}
+    for exercise_type, model in fatigue_models.items():
+        if model.model is None:
+            results[exercise_type] = [model.fallback_predict(rep['emg']) for rep in reps]
+            continue
+        if model.feature_key not in features_by_key:
+            features_by_key[model.feature_key] = [model.extract_features(rep['emg']) for rep in reps]
+        results[exercise_type] = model.predict_session(features_by_key[model.feature_key])
+    return results
+
+
+def analyze_session(session_name, imu_path, emg_path):
+    """Run the live pipeline over one recording and return its per-rep rows"""
+    imu_ts, imu, emg_ts, emg = load_session(imu_path, emg_path)
+
+    # Rep detection on consecutive batches, all in one call
+    num_batches = len(imu) // REP_BATCH_SIZE
+    batches = imu[:num_batches * REP_BATCH_SIZE].reshape(num_batches, REP_BATCH_SIZE, len(IMU_COLUMNS))
+    rep_flags = _registry.get('rep_detection').predict_batch(batches)
+
+    reps = segment_reps(imu_ts, imu, emg_ts, emg, rep_flags)
+    exercises = _registry.get('exercise_classification').predict_batch([rep['imu'] for rep in reps])
+
+    # Keep the last known exercise, like the live pipeline does
+    current_exercise = 'unknown'
+    fatigue_reps = []
+    for rep, exercise in zip(reps, exercises):
+        if exercise != 'unknown':
+            current_exercise = exercise
+        rep['exercise'] = current_exercise
+        if current_exercise in ['bicep_curl', 'lat_raise'] and len(rep['emg']) >= MIN_FATIGUE_WINDOW:
+            fatigue_reps.append(rep)
+
+    fatigue = predict_fatigue(fatigue_reps, {
+        'bicep_curl': _registry.get('bicep_curl_fatigue'),
+        'lat_raise': _registry.get('lat_raise_fatigue')
+    })
+    for i, rep in enumerate(fatigue_reps):
+        rep['bicep_fatigue'] = fatigue['bicep_curl'][i]
+        rep['shoulder_fatigue'] = fatigue['lat_raise'][i]
+
+    rows = []
+    bicep_fatigue = shoulder_fatigue = 'unknown'
+    for rep_number, rep in enumerate(reps, start=1):
+        bicep_fatigue = rep.get('bicep_fatigue', bicep_fatigue)
+        shoulder_fatigue = rep.get('shoulder_fatigue', shoulder_fatigue)
+        rows.append([session_name, rep_number, rep['timestamp'], rep['exercise'],
+                     bicep_fatigue, shoulder_fatigue])
+    return rows
+
+
+def _init_worker():
+    """Load the models once per worker process"""
+    global _registry
+    _registry = ModelRegistry()
+    register_default_models(_registry)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the FleX models over recorded sessions')
+    parser.add_argument('--data-dir', default=os.path.join(os.getcwd(), 'data'),
+                        help='Directory containing *_imu.csv / *_emg.csv recordings')
+    parser.add_argument('--output', default='analysis_results.csv', help='Results CSV file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    args = parser.parse_args()
+
+    sessions = find_sessions(args.data_dir)
+    if not sessions:
+        print(f"[INFO] No recorded sessions found in {args.data_dir}")
+        return
+
+    print(f"[INFO] Analyzing {len(sessions)} sessions with {args.workers} workers")
+    start = time.time()
+    completed = 0
+    rep_total = 0
+
+    with open(args.output, 'w', newline='') as f, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as executor:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_COLUMNS)
+
+        futures = {executor.submit(analyze_session, *session): session[0] for session in sessions}
+        for future in as_completed(futures):
+            session_name = futures[future]
+            try:
+                rows = future.result()
+            except Exception as e:
+                print(f"[ERROR] Failed to analyze session {session_name}: {e}")
+                continue
+            writer.writerows(rows)
+            completed += 1
+            rep_total += len(rows)
+            print(f"[INFO] {session_name}: {len(rows)} reps")
+
+    elapsed = time.time() - start
+    rate = completed / elapsed if elapsed > 0 else 0.0
+    print(f"[INFO] Analyzed {completed}/{len(sessions)} sessions ({rep_total} reps) "
+          f"in {elapsed:.1f}s ({rate:.2f} sessions/s). Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Process-pool execution mode for the ML models.
+
+TSFEL/pandas feature extraction is pure-Python heavy and holds the GIL, so in
+the default in-process mode it competes with the BLE loop, the serial reader
+and the Flask request threads. In process mode, feature extraction and
+prediction for the models in ml_handlers.py run in worker processes instead.
+Windows are copied once into shared-memory slots and workers read them in
+place, instead of receiving pickled lists.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app.utils.ml_handlers import RepDetectionModel, ExerciseClassificationModel, FatigueClassificationModel
+from app.utils.model_registry import ModelRegistry
+from app.utils.resource_governor import governor
+
+# Smallest shared-memory slot; big enough for a 1000 x 4 float64 EMG window
+MIN_SLOT_SIZE = 64 * 1024
+
+# State of the current worker process
+_worker_registry = None
+_worker_segments = {}
+
+
+class _SlotPool:
+    """Reusable shared-memory blocks for passing windows to the workers"""
+    def __init__(self):
+        self.free = []
+        self.all = []
+        self.lock = threading.Lock()
+
+    def acquire(self, nbytes):
+        with self.lock:
+            for i, slot in enumerate(self.free):
+                if slot.size >= nbytes:
+                    return self.free.pop(i)
+            slot = shared_memory.SharedMemory(create=True, size=max(nbytes, MIN_SLOT_SIZE))
+            self.all.append(slot)
+            return slot
+
+    def release(self, slot):
+        with self.lock:
+            self.free.append(slot)
+
+    def close(self):
+        with self.lock:
+            for slot in self.all:
+                slot.close()
+                slot.unlink()
+            self.all = []
+            self.free = []
+
+
+class SharedWindowPool:
+    """Runs model operations in worker processes on shared-memory windows"""
+    def __init__(self, workers=2):
+        # Spawned workers don't inherit the device and web threads' locks
+        self.executor = ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_worker)
+        self.slots = _SlotPool()
+
+    def run(self, model_name, operation, data=None):
+        """
+        Run an operation on a model in a worker process
+
+        Args:
+            model_name: Registry name of the model
+            operation: 'predict', 'predict_with_features', 'extract', 'forward',
+                'describe' or 'warmup'
+            data: Optional window, copied once into a shared-memory slot
+
+        Returns:
+            Future with the operation's result
+        """
+        if data is None:
+            return self.executor.submit(_run_operation, model_name, operation, None)
+
+        data = np.ascontiguousarray(data)
+        slot = self.slots.acquire(data.nbytes)
+        np.ndarray(data.shape, dtype=data.dtype, buffer=slot.buf)[...] = data
+
+        window = (slot.name, data.shape, data.dtype.str)
+        future = self.executor.submit(_run_operation, model_name, operation, window)
+        future.add_done_callback(lambda _: self.slots.release(slot))
+        return future
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        self.slots.close()
+
+
+def _init_worker():
+    """
+    Register the models a worker runs operations on; each is loaded on its
+    first operation in this worker. The fatigue service stays in the parent.
+    """
+    global _worker_registry
+    governor.pin_current_process('inference')
+    _worker_registry = ModelRegistry()
+    _worker_registry.register('rep_detection', RepDetectionModel)
+    _worker_registry.register('exercise_classification', ExerciseClassificationModel)
+    _worker_registry.register('bicep_curl_fatigue', lambda: FatigueClassificationModel(exercise_type='bicep_curl'))
+    _worker_registry.register('lat_raise_fatigue', lambda: FatigueClassificationModel(exercise_type='lat_raise'))
+
+
+def _attach_window(window):
+    """Read-only view of a window in a shared-memory slot"""
+    name, shape, dtype = window
+    segment = _worker_segments.get(name)
+    if segment is None:
+        segment = shared_memory.SharedMemory(name=name)
+        try:
+            # The parent owns the slot; don't let this process's tracker unlink it
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        except Exception:
+            pass
+        _worker_segments[name] = segment
+    view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+    view.flags.writeable = False
+    return view
+
+
+def _run_operation(model_name, operation, window):
+    """Worker side of SharedWindowPool.run"""
+    model = _worker_registry.get(model_name)
+    data = _attach_window(window) if window is not None else None
+
+    if operation == 'predict':
+        return model.predict(data)
+    elif operation == 'predict_with_features':
+        return model.predict_with_features(data)
+    elif operation == 'extract':
+        return model.extract_features(data)
+    elif operation == 'forward':
+        return model.model.predict(data, verbose=0)
+    elif operation == 'warmup':
+        return model.warmup()
+    elif operation == 'describe':
+        keras_model = getattr(model, 'model', None)
+        return {
+            'loaded': keras_model is not None,
+            'input_shape': getattr(keras_model, 'input_shape', None),
+            'feature_key': getattr(model, 'feature_key', None)
+        }
+    raise ValueError(f"Unknown model operation: {operation}")
+
+
+class ProcessModel:
+    """Stand-in for a model whose predictions run in the worker pool"""
+    def __init__(self, pool, name):
+        self.pool = pool
+        self.name = name
+
+    def predict(self, data):
+        return self.pool.run(self.name, 'predict', data).result()
+
+    def predict_with_features(self, data):
+        return self.pool.run(self.name, 'predict_with_features', data).result()
+
+    def warmup(self):
+        self.pool.run(self.name, 'warmup').result()
+
+
+class _ProcessKerasModel:
+    """Stands in for a fatigue model's Keras model, running forward passes in the pool"""
+    def __init__(self, pool, name, input_shape):
+        self.pool = pool
+        self.name = name
+        self.input_shape = input_shape
+
+    def predict(self, batch, verbose=0):
+        return self.pool.run(self.name, 'forward', batch).result()
+
+
+class ProcessFatigueModel:
+    """
+    Stand-in for a FatigueClassificationModel whose feature extraction and
+    forward passes run in the worker pool, so a FatigueService in this process
+    can keep the session sequences and batching
+    """
+    build_sequence = FatigueClassificationModel.build_sequence
+    decode_prediction = FatigueClassificationModel.decode_prediction
+    fallback_predict = FatigueClassificationModel.fallback_predict
+
+    def __init__(self, pool, name, exercise_type):
+        self.pool = pool
+        self.name = name
+        self.exercise_type = exercise_type
+        info = pool.run(name, 'describe').result()
+        self.feature_key = tuple(info['feature_key'])
+        self.model = _ProcessKerasModel(pool, name, info['input_shape']) if info['loaded'] else None
+
+    def extract_features(self, emg_data):
+        return self.pool.run(self.name, 'extract', emg_data).result()
+
+    def warmup(self):
+        self.pool.run(self.name, 'warmup').result()
+
+
+def register_process_models(registry, workers=2):
+    """Point the registry's models at a shared-memory worker pool"""
+    # Not needed by the workers, which import this module too
+    from app.utils.fatigue_service import FatigueService
+
+    pool = SharedWindowPool(workers)
+    registry.register('rep_detection', lambda: ProcessModel(pool, 'rep_detection'))
+    registry.register('exercise_classification', lambda: ProcessModel(pool, 'exercise_classification'))
+    registry.register('bicep_curl_fatigue', lambda: ProcessFatigueModel(pool, 'bicep_curl_fatigue', 'bicep_curl'))
+    registry.register('lat_raise_fatigue', lambda: ProcessFatigueModel(pool, 'lat_raise_fatigue', 'lat_raise'))
+    registry.register('fatigue_service', lambda: FatigueService({
+        'bicep_curl': registry.get('bicep_curl_fatigue'),
+        'lat_raise': registry.get('lat_raise_fatigue')
+    }), warmup=False)
+    return pool
@@ -0,0 +1,152 @@
+"""
+CSV recordings of device streams.
+
+Device threads write rows while request handlers start and stop recordings,
+so every access to the file goes through the recorder's lock.
+"""
+import csv
+import datetime
+import os
+import threading
+import time
+
+
+def get_data_directory():
+    """
+    Get the absolute path to the data directory.
+    This ensures the data directory is found regardless of where the app is started from.
+    """
+    # The repository root, two levels above this package
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    data_dir = os.path.join(base_dir, 'data')
+
+    # Create the directory if it doesn't exist
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+        print(f"Created data directory at: {data_dir}")
+
+    return data_dir
+
+
+def recording_filename(filename, stream):
+    """
+    File name of a single-device recording: <name>_<stream>.csv
+
+    Args:
+        filename: Requested name (may be empty, or have another extension)
+        stream: 'emg' or 'imu'
+
+    Returns:
+        (filename, session_name)
+    """
+    suffix = f"_{stream}.csv"
+    if not filename:
+        # Generate a filename if not provided
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{stream}_data_{timestamp}{suffix}"
+    elif not filename.endswith(suffix):
+        filename = f"{filename.rsplit('.', 1)[0]}{suffix}"
+    return filename, filename.rsplit(suffix, 1)[0]
+
+
+class Recorder:
+    """
+    Writes a stream's rows to a CSV file while recording
+
+    With mark_repetitions, every row ends with the number of repetitions
+    marked so far.
+    """
+    def __init__(self, columns, mark_repetitions=False):
+        """
+        Args:
+            columns: Header of the file
+            mark_repetitions: Append a Repetition column
+        """
+        self.columns = list(columns) + (['Repetition'] if mark_repetitions else [])
+        self.mark_repetitions = mark_repetitions
+        self.lock = threading.Lock()
+        self.file = None
+        self.writer = None
+        self.path = None
+        self.name = None
+        self.repetitions = 0
+        self.start_time = 0
+
+    @property
+    def recording(self):
+        return self.file is not None
+
+    def start(self, path, name=None):
+        """
+        Create the file and start recording
+
+        Args:
+            path: CSV file to write (overwritten)
+            name: Session name reported by status()
+        """
+        with self.lock:
+            if self.file is not None:
+                raise RuntimeError('Already recording.')
+            recording_file = open(path, 'w', newline='')
+            self.writer = csv.writer(recording_file)
+            self.writer.writerow(self.columns)
+            recording_file.flush()
+            self.file = recording_file
+            self.path = path
+            self.name = name
+            self.repetitions = 0
+            self.start_time = time.time()
+
+    def stop(self):
+        """
+        Close the file (no-op if not recording)
+
+        Returns:
+            Number of repetitions marked
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+            self.file = None
+            self.writer = None
+            return self.repetitions
+
+    def write(self, row):
+        """Append a row if recording"""
+        self.write_rows([row])
+
+    def write_rows(self, rows):
+        """Append rows if recording"""
+        with self.lock:
+            if self.writer is None:
+                return
+            if self.mark_repetitions:
+                rows = [list(row) + [self.repetitions] for row in rows]
+            try:
+                self.writer.writerows(rows)
+                # Flush to ensure data is written immediately
+                self.file.flush()
+            except (OSError, ValueError) as e:
+                # Don't stop recording on a write error, just log it
+                print(f"[ERROR] Error writing to {self.path}: {e}")
+
+    def mark_repetition(self):
+        """
+        Start the next repetition
+
+        Returns:
+            The new repetition number
+        """
+        with self.lock:
+            self.repetitions += 1
+            return self.repetitions
+
+    def status(self):
+        """Recording state for the status endpoints"""
+        recording = self.recording
+        return {
+            'recording': recording,
+            'repetitions': self.repetitions if recording else 0,
+            'session_name': self.name if recording else None,
+            'recording_time': time.time() - self.start_time if recording else 0
+        }
@@ -0,0 +1,155 @@
+import math
+
+
+class RepSegmenter:
+    """
+    Deterministic streaming rep segmenter for IMU data.
+
+    The gyroscope axis with the most recent rotation energy is low-pass filtered
+    and tracked with a hysteresis state machine. A rep is one full oscillation of
+    that signal: an excursion past the threshold in one direction (concentric
+    phase) followed by one in the opposite direction (eccentric phase), bounded
+    by the quiet samples on either side. Thresholds adapt to the amplitude of
+    recent reps, so light and heavy movements are both picked up.
+
+    Everything is scalar arithmetic on the incoming sample, so the cost is a few
+    microseconds per sample.
+    """
+    IDLE = 'idle'
+    FIRST_PHASE = 'first_phase'
+    BETWEEN_PHASES = 'between_phases'
+    SECOND_PHASE = 'second_phase'
+
+    def __init__(self, fs=130, cutoff=3.0, min_amplitude=20.0, threshold_ratio=0.35,
+                 quiet_ratio=0.15, min_rep_duration=0.4, max_rep_duration=8.0):
+        """
+        Args:
+            fs: IMU sampling frequency (Hz)
+            cutoff: Low-pass cutoff frequency of the gyro signal (Hz)
+            min_amplitude: Lowest threshold (deg/s) a phase must exceed
+            threshold_ratio: Phase threshold as a fraction of the recent peak amplitude
+            quiet_ratio: Quiet level as a fraction of the recent peak amplitude
+            min_rep_duration / max_rep_duration: Accepted rep length (s)
+        """
+        self.fs = fs
+        self.alpha = 1.0 - math.exp(-2.0 * math.pi * cutoff / fs)
+        # Slow smoothing for axis energy and peak amplitude tracking (~2 s)
+        self.energy_alpha = 1.0 - math.exp(-1.0 / (2.0 * fs))
+        self.min_amplitude = min_amplitude
+        self.threshold_ratio = threshold_ratio
+        self.quiet_ratio = quiet_ratio
+        self.min_rep_samples = int(min_rep_duration * fs)
+        self.max_rep_samples = int(max_rep_duration * fs)
+        self.reset()
+
+    def reset(self):
+        """Reset the segmenter for a new session"""
+        self.filtered = [0.0, 0.0, 0.0]
+        self.axis_energy = [0.0, 0.0, 0.0]
+        self.axis = 0
+        self.peak_amplitude = self.min_amplitude / self.threshold_ratio
+        self.state = self.IDLE
+        self.direction = 0
+        self.last_quiet_index = 0
+        self.rep_start = 0
+        self.phase_peak = 0.0
+        self.rep_peak = 0.0
+        self.sample_index = -1
+        self.reps_detected = 0
+
+    def thresholds(self):
+        """Return the current (phase, quiet) thresholds"""
+        threshold = max(self.min_amplitude, self.threshold_ratio * self.peak_amplitude)
+        quiet = max(self.min_amplitude * 0.5, self.quiet_ratio * self.peak_amplitude)
+        return threshold, quiet
+
+    def update(self, reading, sample_index=None):
+        """
+        Feed one IMU reading
+
+        Args:
+            reading: [Accel_X, Accel_Y, Accel_Z, Gyro_X, Gyro_Y, Gyro_Z]
+            sample_index: Absolute index of the sample (defaults to a running count)
+
+        Returns:
+            Dict with the rep's 'start' and 'end' sample indices (end exclusive)
+            and its 'peak' amplitude when a rep completes, otherwise None
+        """
+        self.sample_index = self.sample_index + 1 if sample_index is None else sample_index
+        index = self.sample_index
+
+        alpha = self.alpha
+        energy_alpha = self.energy_alpha
+        for i in range(3):
+            self.filtered[i] += alpha * (reading[3 + i] - self.filtered[i])
+            self.axis_energy[i] += energy_alpha * (self.filtered[i] * self.filtered[i] - self.axis_energy[i])
+
+        # Only switch axis between reps so a rep is segmented on one signal
+        if self.state == self.IDLE:
+            self.axis = max(range(3), key=self.axis_energy.__getitem__)
+
+        value = self.filtered[self.axis]
+        magnitude = abs(value)
+        threshold, quiet = self.thresholds()
+
+        if self.state == self.IDLE:
+            if magnitude < quiet:
+                self.last_quiet_index = index
+            elif magnitude > threshold:
+                self.state = self.FIRST_PHASE
+                self.direction = 1 if value > 0 else -1
+                self.rep_start = self.last_quiet_index
+                self.phase_peak = magnitude
+                self.rep_peak = magnitude
+            return None
+
+        if index - self.rep_start > self.max_rep_samples:
+            # Movement that never completed a rep, start over
+            self.state = self.IDLE
+            self.last_quiet_index = index
+            return None
+
+        signed = value * self.direction
+        if self.state == self.FIRST_PHASE:
+            self.phase_peak = max(self.phase_peak, signed)
+            if signed < quiet:
+                self.state = self.BETWEEN_PHASES
+        elif self.state == self.BETWEEN_PHASES:
+            if signed > threshold:
+                # Same direction again: the first phase continued
+                self.state = self.FIRST_PHASE
+            elif -signed > threshold:
+                self.state = self.SECOND_PHASE
+                self.rep_peak = max(self.rep_peak, self.phase_peak)
+                self.phase_peak = -signed
+        elif self.state == self.SECOND_PHASE:
+            self.phase_peak = max(self.phase_peak, -signed)
+            if magnitude < quiet:
+                return self._finish_rep(index)
+        return None
+
+    def process_block(self, readings, start_index=None):
+        """Feed several readings and return the list of completed reps"""
+        reps = []
+        for offset, reading in enumerate(readings):
+            index = None if start_index is None else start_index + offset
+            rep = self.update(reading, index)
+            if rep:
+                reps.append(rep)
+        return reps
+
+    def _finish_rep(self, index):
+        """Close the current rep and adapt the thresholds to its amplitude"""
+        self.state = self.IDLE
+        self.last_quiet_index = index
+        rep_peak = max(self.rep_peak, self.phase_peak)
+        if index + 1 - self.rep_start < self.min_rep_samples:
+            return None
+
+        self.peak_amplitude += 0.3 * (rep_peak - self.peak_amplitude)
+        self.reps_detected += 1
+        return {
+            'start': self.rep_start,
+            'end': index + 1,
+            'peak': rep_peak
+        }
@@ -0,0 +1,220 @@
+"""
+CPU resource governor.
+
+Sizes the thread pools of the numerical libraries (BLAS/OpenMP used by NumPy
+and scikit-learn, TensorFlow's intra/inter-op pools), optionally pins the
+threads of each component (ingest, inference, web) to their own set of cores,
+and reports the CPU time used per component.
+
+Thread-pool sizes of the BLAS/OpenMP libraries are read from the environment
+when those libraries are first imported, so apply_thread_limits() must run
+before NumPy is imported; create_app() calls it before importing the routes.
+"""
+import os
+import threading
+import time
+import weakref
+
+COMPONENTS = ['ingest', 'inference', 'web']
+
+# Environment variables read by the BLAS/OpenMP runtimes at import time
+BLAS_THREAD_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                         'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS']
+
+
+def parse_cpu_list(spec):
+    """Parse a CPU list like '0,2-3' into a set of core numbers; None/'' -> None"""
+    if not spec:
+        return None
+    cpus = set()
+    for part in str(spec).split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.update(range(int(first), int(last) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
+
+
+class ResourceGovernor:
+    """Applies thread-pool limits and core pinning, and tracks component threads"""
+    def __init__(self):
+        self.blas_threads = None
+        self.tf_intra_op_threads = None
+        self.tf_inter_op_threads = None
+        self.sklearn_jobs = None
+        self.core_sets = {component: None for component in COMPONENTS}
+
+        # native thread id -> {'component', 'name', 'thread' (weakref), 'cpu_seconds'}
+        self.threads = {}
+        # CPU seconds of threads that have exited, per component
+        self.retired = {component: 0.0 for component in COMPONENTS}
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._tf_configured = False
+        self._clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self._last_report = None
+
+    def configure(self, config):
+        """
+        Read the governor settings from a config object
+
+        Args:
+            config: Object with BLAS_THREADS, TF_INTRA_OP_THREADS,
+                    TF_INTER_OP_THREADS, SKLEARN_JOBS and
+                    INGEST_CPUS / INFERENCE_CPUS / WEB_CPUS attributes
+        """
+        self.blas_threads = getattr(config, 'BLAS_THREADS', None)
+        self.tf_intra_op_threads = getattr(config, 'TF_INTRA_OP_THREADS', None)
+        self.tf_inter_op_threads = getattr(config, 'TF_INTER_OP_THREADS', None)
+        self.sklearn_jobs = getattr(config, 'SKLEARN_JOBS', None)
+        for component in COMPONENTS:
+            self.core_sets[component] = parse_cpu_list(getattr(config, f"{component.upper()}_CPUS", None))
+
+    def apply_thread_limits(self):
+        """Set the BLAS/OpenMP thread counts; values already in the environment win"""
+        if not self.blas_threads:
+            return
+        for variable in BLAS_THREAD_VARIABLES:
+            os.environ.setdefault(variable, str(self.blas_threads))
+
+    def configure_tensorflow(self):
+        """Size TensorFlow's thread pools; must run before TF creates its runtime"""
+        if self._tf_configured:
+            return
+        self._tf_configured = True
+        if not (self.tf_intra_op_threads or self.tf_inter_op_threads):
+            return
+        import tensorflow as tf
+        try:
+            if self.tf_intra_op_threads:
+                tf.config.threading.set_intra_op_parallelism_threads(self.tf_intra_op_threads)
+            if self.tf_inter_op_threads:
+                tf.config.threading.set_inter_op_parallelism_threads(self.tf_inter_op_threads)
+        except RuntimeError as e:
+            print(f"[WARNING] TensorFlow thread pools already initialized: {e}")
+
+    def configure_estimator(self, estimator):
+        """Limit the parallel jobs of a loaded scikit-learn estimator"""
+        if self.sklearn_jobs and hasattr(estimator, 'n_jobs'):
+            estimator.n_jobs = self.sklearn_jobs
+        return estimator
+
+    def pin_current_thread(self, component, track=True):
+        """
+        Register the calling thread as part of a component and pin it to the
+        component's cores, if a core set is configured
+
+        Args:
+            component: 'ingest', 'inference' or 'web'
+            track: Report the thread's CPU time; only for long-lived threads,
+                   since every tracked thread is kept until it exits
+        """
+        if getattr(self._local, 'component', None) == component:
+            return
+        self._local.component = component
+        thread = threading.current_thread()
+        native_id = threading.get_native_id()
+        if track:
+            with self.lock:
+                self._retire_exited()
+                self.threads[native_id] = {'component': component, 'name': thread.name,
+                                           'thread': weakref.ref(thread), 'cpu_seconds': 0.0}
+
+        cores = self.core_sets.get(component)
+        if cores and hasattr(os, 'sched_setaffinity'):
+            try:
+                os.sched_setaffinity(native_id, cores)
+            except OSError as e:
+                print(f"[WARNING] Could not pin {component} thread {thread.name} to CPUs {sorted(cores)}: {e}")
+
+    def pin_current_process(self, component):
+        """Pin a whole (worker) process to a component's cores"""
+        cores = self.core_sets.get(component)
+        if cores and hasattr(os, 'sched_setaffinity'):
+            try:
+                os.sched_setaffinity(0, cores)
+            except OSError as e:
+                print(f"[WARNING] Could not pin {component} process to CPUs {sorted(cores)}: {e}")
+
+    def _retire_exited(self):
+        """Move the CPU time of exited threads to retired (called with the lock held)"""
+        for native_id, info in list(self.threads.items()):
+            thread = info['thread']()
+            if thread is None or not thread.is_alive():
+                del self.threads[native_id]
+                self.retired[info['component']] += info['cpu_seconds']
+
+    def _thread_cpu_time(self, native_id):
+        """CPU seconds (user + system) used by a thread, None if it has exited"""
+        try:
+            with open(f"/proc/self/task/{native_id}/stat") as f:
+                stat = f.read()
+        except OSError:
+            return None
+        # Fields after the parenthesised thread name; utime and stime are fields 14 and 15
+        fields = stat.rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self._clock_ticks
+
+    def report(self):
+        """
+        CPU use per component
+
+        Returns:
+            Dict with each component's CPU seconds, CPU use (cores) since the
+            previous report, core set and threads, plus the process totals
+        """
+        now = time.time()
+        process_cpu = time.process_time()
+        with self.lock:
+            components = {component: {'cpu_seconds': self.retired[component],
+                                      'cpus': sorted(cores) if cores else None, 'threads': []}
+                          for component, cores in self.core_sets.items()}
+            threads = dict(self.threads)
+
+        for native_id, info in threads.items():
+            thread = info['thread']()
+            alive = thread is not None and thread.is_alive()
+            # A native id can be reused by a new thread once the tracked one exits
+            cpu_seconds = self._thread_cpu_time(native_id) if alive else None
+            if cpu_seconds is None:
+                # Keep the exited thread's last reading so totals never go down
+                with self.lock:
+                    if self.threads.pop(native_id, None):
+                        self.retired[info['component']] += info['cpu_seconds']
+                components[info['component']]['cpu_seconds'] += info['cpu_seconds']
+                continue
+            info['cpu_seconds'] = cpu_seconds
+            component = components[info['component']]
+            component['cpu_seconds'] += cpu_seconds
+            component['threads'].append({'name': info['name'], 'native_id': native_id,
+                                         'cpu_seconds': round(cpu_seconds, 2)})
+
+        tracked = sum(component['cpu_seconds'] for component in components.values())
+        components['other'] = {'cpu_seconds': max(process_cpu - tracked, 0.0), 'cpus': None, 'threads': []}
+
+        previous = self._last_report
+        self._last_report = (now, {name: component['cpu_seconds'] for name, component in components.items()})
+        for name, component in components.items():
+            if previous and now > previous[0]:
+                component['cpu_usage'] = round((component['cpu_seconds'] - previous[1].get(name, 0.0)) / (now - previous[0]), 3)
+            else:
+                component['cpu_usage'] = None
+            component['cpu_seconds'] = round(component['cpu_seconds'], 2)
+
+        return {
+            'components': components,
+            'process_cpu_seconds': round(process_cpu, 2),
+            'cpu_count': os.cpu_count(),
+            'thread_limits': {
+                'blas': self.blas_threads,
+                'tf_intra_op': self.tf_intra_op_threads,
+                'tf_inter_op': self.tf_inter_op_threads,
+                'sklearn_jobs': self.sklearn_jobs
+            }
+        }
+
+
+# Shared by the whole process
+governor = ResourceGovernor()
@@ -0,0 +1,65 @@
+"""
+Compact encodings for batches of stream samples served by /api/samples.
+
+Binary layout (all little-endian):
+
+    header   4s   magic b'FLXS'
+             H    format version (1)
+             H    number of channels
+             Q    sequence number of the first sample
+             Q    samples lost before it (gap), 0 if none
+             I    number of samples
+    body     float32 [channels][samples], one contiguous array per channel
+
+A float32 sample costs 4 bytes per channel, against ~20 for the same value
+as JSON text. MessagePack (when the msgpack package is installed) carries
+the same float32 channel arrays as binary fields of a map.
+"""
+import struct
+
+import numpy as np
+
+from app.utils.live_stream import STREAM_COLUMNS
+
+MAGIC = b'FLXS'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQI')
+
+SAMPLE_STREAMS = dict(STREAM_COLUMNS, emg_envelope=['bicep', 'shoulder', 'tricep'])
+
+
+def encode_binary(data, start, gap):
+    """Pack samples [n, channels] as a header plus little-endian float32 channel arrays"""
+    count, channels = data.shape
+    body = np.ascontiguousarray(np.asarray(data, dtype='<f4').T).tobytes()
+    return HEADER.pack(MAGIC, VERSION, channels, start, gap, count) + body
+
+
+def decode_binary(payload):
+    """
+    Unpack a binary sample batch
+
+    Returns:
+        (data [n, channels] float32, start, gap)
+    """
+    magic, version, channels, start, gap, count = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a FleX sample batch')
+    body = np.frombuffer(payload, dtype='<f4', offset=HEADER.size, count=channels * count)
+    return body.reshape(channels, count).T, start, gap
+
+
+def encode_msgpack(stream, data, start, gap):
+    """Pack samples as a MessagePack map with one float32 byte string per channel"""
+    import msgpack
+
+    data = np.asarray(data, dtype='<f4')
+    return msgpack.packb({
+        'stream': stream,
+        'start': start,
+        'next': start + len(data),
+        'gap': gap,
+        'count': len(data),
+        'channels': {name: np.ascontiguousarray(data[:, i]).tobytes()
+                     for i, name in enumerate(SAMPLE_STREAMS[stream])}
+    })
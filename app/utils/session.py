@@ -0,0 +1,882 @@
+"""
+Live workout sessions.
+
+A Session owns everything of one session: its devices (attached to this
+machine, or a station's devices streamed through the ingest gateway), sample
+windows, EMG conditioning, display series, live stream, the per-session state
+of the models (motion gate, set tracker, rep segmenter, fatigue sequence),
+its recordings and its results. The SessionManager keys sessions by ID and
+owns what they share: the inference scheduler and the load controller. One
+process can run many isolated sessions in parallel, as long as each uses
+different devices.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import wait
+
+import numpy as np
+
+from app.utils.device_handlers import IMUHandler, EMGHandler, BluetoothManager
+from app.utils.model_registry import registry
+from app.utils.motion_gate import MotionGate
+from app.utils.rep_segmenter import RepSegmenter
+from app.utils.set_tracker import SetTracker
+from app.utils.inference_scheduler import InferenceScheduler
+from app.utils.feature_store import SessionFeatureStore, session_feature_path
+from app.utils.load_controller import LoadController
+from app.utils.emg_conditioning import EMGConditioner
+from app.utils.windowing import (WindowingEngine, REP_BATCH_SIZE, IMU_WINDOW_SIZE, EMG_WINDOW_SIZE,
+                                 MIN_REP_WINDOW, MIN_FATIGUE_WINDOW)
+from app.utils.live_stream import LiveStreamEncoder
+from app.utils.snapshots import SnapshotStore
+from app.utils.display_series import DisplaySeries
+from app.utils.ingest_gateway import gateway
+from app.utils.recorder import Recorder
+
+# Session served by the single-session routes (/api/start_session, /api/data, ...)
+DEFAULT_SESSION_ID = 'default'
+
+SOURCES = ['local', 'remote']
+
+# Recent samples kept per session
+IMU_HISTORY_SIZE = 1300  # ~10 s at 130 Hz
+EMG_HISTORY_SIZE = 10000  # ~10 s at 1 kHz
+IMU_DISPLAY_HOP = 13  # IMU samples reduced per display update, ~0.1 s at 130 Hz
+
+# Seconds between publications of the scheduler and load statistics; each
+# one is a new snapshot version, which wakes every long poll of the session
+ML_STATS_INTERVAL = 5.0
+
+# Detector used in automatic mode: 'model' (TSFEL + random forest on 30-sample
+# batches) or 'segmenter' (streaming signal-processing segmenter)
+REP_DETECTORS = ['model', 'segmenter']
+
+# Rep detection drives the live rep count and has its own lane, exercise and
+# fatigue classification can run a few hundred ms later
+INFERENCE_PRIORITIES = {'rep_detection': 0, 'exercise': 1, 'fatigue': 2}
+INFERENCE_DEADLINES = {'rep_detection': 0.2, 'exercise': 0.5, 'fatigue': 0.5}
+
+SESSION_COLUMNS = ['Timestamp',
+                   'IMU_Accel_X', 'IMU_Accel_Y', 'IMU_Accel_Z',
+                   'IMU_Gyro_X', 'IMU_Gyro_Y', 'IMU_Gyro_Z',
+                   'EMG_Time', 'EMG_Bicep', 'EMG_Shoulder', 'EMG_Tricep']
+IMU_COLUMNS = ['Timestamp', 'Accel_X', 'Accel_Y', 'Accel_Z', 'Gyro_X', 'Gyro_Y', 'Gyro_Z']
+EMG_COLUMNS = ['Timestamp', 'Time_ms', 'Bicep', 'Shoulder', 'Tricep',
+               'Bicep_Envelope', 'Shoulder_Envelope', 'Tricep_Envelope']
+
+
+def initial_state():
+    """Sections of a new session's snapshot"""
+    return {
+        'imu': {
+            'accel_x': 0.0, 'accel_y': 0.0, 'accel_z': 0.0,
+            'gyro_x': 0.0, 'gyro_y': 0.0, 'gyro_z': 0.0
+        },
+        'emg': {
+            'time': 0, 'bicep': 0, 'shoulder': 0, 'tricep': 0
+        },
+        'emg_envelope': {
+            'bicep': 0.0, 'shoulder': 0.0, 'tricep': 0.0
+        },
+        'ml_results': {
+            'exercise': 'unknown',
+            'rep_count': 0,
+            'fatigue_level': 'unknown',
+            'bicep_fatigue': 'unknown',
+            'shoulder_fatigue': 'unknown',
+            'last_rep_time': 0,
+            'degradation_level': 0
+        },
+        'ml_stats': {
+            'motion_gate': {},
+            'set_tracker': {},
+            'scheduler': {},
+            'load': {}
+        }
+    }
+
+
+class Session:
+    """One live session: devices, sample pipeline, model state, recordings and results"""
+    def __init__(self, session_id, scheduler, load_controller, data_dir=None):
+        """
+        Args:
+            session_id: Key of the session in its SessionManager
+            scheduler: Shared InferenceScheduler with the INFERENCE_PRIORITIES classes
+            load_controller: Shared LoadController
+            data_dir: Directory of the recordings (default: ./data at start)
+        """
+        self.id = session_id
+        self.scheduler = scheduler
+        self.load_controller = load_controller
+        self.data_dir = data_dir
+
+        self.name = None
+        self.source = 'local'
+        self.station = None
+        self.active = False
+        self.thread = None
+        self.connection_message = "Ready to connect"
+        self.imu_handler = None
+        self.emg_handler = None
+
+        # Session state is published as immutable, versioned snapshots: writers
+        # call state.update(), readers get a consistent state.current()
+        self.state = SnapshotStore(initial_state())
+
+        # Skips rep-detection inference on IMU batches without movement
+        self.motion_gate = MotionGate()
+        # Classifies the exercise at the start of each set instead of on every rep
+        self.set_tracker = SetTracker()
+        self.rep_segmenter = RepSegmenter()
+        self.automatic_rep_detection = True
+        self.rep_detector = 'model'
+        self.load_rep_detector = None
+        self.ml_stats_published = 0
+        load_controller.register_listener(self.on_load_level_change)
+        load_controller.register_sample_listener(self.on_load_sample)
+
+        # Reps are counted from the scheduler (model), ingest (segmenter) and
+        # request (manual) threads
+        self.rep_lock = threading.Lock()
+        self.rep_count = 0
+        self.last_rep_time = 0
+        self.current_exercise = 'unknown'
+        self.imu_batch_count = 0  # Full batches seen, for skipping batches under load
+
+        # EMG windows of reps waiting for fatigue analysis; a queued fatigue job
+        # is superseded by the next rep's job, which then analyses all pending reps
+        self.pending_fatigue_windows = []
+        self.pending_fatigue_lock = threading.Lock()
+
+        # Scheduler futures of this session's queued or running tasks, so that
+        # stop() can let the last reps' results reach the feature store
+        self.pending_tasks = set()
+        self.pending_tasks_lock = threading.Lock()
+
+        # Persists every rep's features and model outputs for re-scoring
+        self.feature_store = None
+
+        self.recorders = {
+            'session': Recorder(SESSION_COLUMNS),
+            'imu': Recorder(IMU_COLUMNS),
+            'emg': Recorder(EMG_COLUMNS)
+        }
+
+        # Recent samples with arrival timestamps are kept once in the windowing
+        # engine; ML consumers get read-only views of the windows they need
+        self.windows = WindowingEngine()
+        self.windows.add_stream('imu', 6, IMU_HISTORY_SIZE)
+        self.windows.add_stream('emg', 4, EMG_HISTORY_SIZE)
+        self.windows.add_stream('emg_envelope', 3, EMG_HISTORY_SIZE)
+        self.windows.register('rep_detection', 'imu', REP_BATCH_SIZE, REP_BATCH_SIZE, self.process_imu_batch)
+
+        # Sequence numbers at which the current rep's IMU and EMG windows start,
+        # i.e. the end of the previous rep
+        self.rep_window_start = {'imu': 0, 'emg': 0}
+
+        # Band-pass, notch and envelope of the EMG channels, filtered once in
+        # blocks as samples arrive; the fatigue models still get the raw window
+        # they were trained on
+        self.emg_conditioner = EMGConditioner()
+        self.emg_conditioner.register_callback(self.store_conditioned_emg)
+
+        # Ready-to-plot series for the dashboard charts
+        self.display_series = DisplaySeries()
+        self.emg_conditioner.register_callback(self.display_series.push_emg_block)
+        self.windows.register('display', 'imu', IMU_DISPLAY_HOP, IMU_DISPLAY_HOP,
+                              lambda data, timestamps, end: self.display_series.push_imu(timestamps, data))
+
+        # Pushes new samples and ML result changes to /api/stream subscribers;
+        # one encoder per session, shared by all its viewers
+        self.live_encoder = LiveStreamEncoder(self.windows, lambda: self.state.current()['ml_results'])
+
+    @property
+    def running(self):
+        """Whether the session is connecting to its devices or active"""
+        return self.active or (self.thread is not None and self.thread.is_alive())
+
+    @property
+    def devices(self):
+        """Key of the devices the session uses, for conflict checks"""
+        return ('local',) if self.source == 'local' else ('remote', self.station)
+
+    def start(self, name, source='local', station=None, emg_port='/dev/cu.usbmodem213301', emg_baudrate=115200):
+        """
+        Reset the session and connect to its devices in a background thread;
+        data collection starts once both devices are connected
+
+        Args:
+            name: Session name, used for the recordings
+            source: 'local' (devices attached to this machine) or 'remote'
+                    (a station's edge node, through the ingest gateway)
+            station: Station id of a remote session
+            emg_port, emg_baudrate: Serial port of a local EMG board
+        """
+        if self.running:
+            raise ValueError('Session already active')
+        if not name:
+            raise ValueError('Session name required')
+        if source not in SOURCES:
+            raise ValueError(f"Unknown source: {source}")
+        if source == 'remote' and not station:
+            raise ValueError('Station required for a remote session')
+
+        self.name = name
+        self.source = source
+        self.station = station
+
+        # Reset rep count to 0 for new session
+        with self.rep_lock:
+            self.rep_count = 0
+        self.state.update('ml_results', rep_count=0, last_rep_time=0)
+
+        # Reset fatigue sequences for new session
+        registry.get('fatigue_service').reset_session(self.id)
+        self.motion_gate.reset()
+        self.set_tracker.reset()
+        with self.pending_fatigue_lock:
+            self.pending_fatigue_windows.clear()
+
+        # Clear all data buffers
+        self.windows.reset()
+        self.rep_window_start.update(imu=0, emg=0)
+        self.imu_batch_count = 0
+        self.rep_segmenter.reset()
+        self.emg_conditioner.reset()
+        self.display_series.reset()
+        self.live_encoder.reset()
+
+        data_dir = self.data_dir or os.path.join(os.getcwd(), 'data')
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+
+        # Per-rep features of this session are stored next to the recordings
+        self.feature_store = SessionFeatureStore(session_feature_path(data_dir, name))
+        self.recorders['session'].start(os.path.join(data_dir, f"{name}.csv"), name)
+
+        target = self.connect_remote_devices if source == 'remote' else self.connect_local_devices
+        args = () if source == 'remote' else (emg_port, emg_baudrate)
+        self.thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop data collection and release the devices"""
+        if not self.active:
+            raise ValueError('No active session')
+
+        # The session thread notices and disconnects the devices
+        self.active = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+        self.recorders['session'].stop()
+        if self.feature_store:
+            if not self.wait_for_tasks(timeout=5.0):
+                print(f"[WARNING] Session {self.id}: inference still running at stop, "
+                      f"its last results are not stored")
+            self.feature_store.flush()
+
+        # Clean up Bluetooth manager if it exists
+        if self.source == 'local':
+            try:
+                BluetoothManager().stop()
+            except Exception as e:
+                print(f"[ERROR] Error stopping BT manager: {e}")
+
+    def submit_task(self, task_class, fn, *args, **options):
+        """Queue a task on the shared scheduler (see InferenceScheduler.submit) and track it"""
+        future = self.scheduler.submit(task_class, fn, *args, **options)
+        with self.pending_tasks_lock:
+            self.pending_tasks.add(future)
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _task_done(self, future):
+        with self.pending_tasks_lock:
+            self.pending_tasks.discard(future)
+
+    def wait_for_tasks(self, timeout):
+        """
+        Wait until the session has no queued or running tasks, including the
+        ones its tasks queue (exercise -> fatigue)
+
+        Returns:
+            False if tasks were still pending at the timeout
+        """
+        deadline = time.time() + timeout
+        while True:
+            with self.pending_tasks_lock:
+                pending = list(self.pending_tasks)
+            remaining = deadline - time.time()
+            if not pending:
+                return True
+            if remaining <= 0:
+                return False
+            wait(pending, timeout=remaining)
+
+    def close(self):
+        """Detach from the shared load controller before the session is dropped"""
+        self.load_controller.unregister_listener(self.on_load_level_change)
+        self.load_controller.unregister_sample_listener(self.on_load_sample)
+
+    def connect_local_devices(self, emg_port, emg_baudrate):
+        """Connect to devices sequentially (IMU first, then EMG) and start data collection"""
+        # Initialize the Bluetooth manager
+        bt_manager = BluetoothManager()
+        bt_manager.start()
+
+        # First connect to IMU
+        self.connection_message = "Connecting to IMU device..."
+
+        try:
+            self.imu_handler = IMUHandler()
+
+            # First disconnect if already connected to ensure a fresh connection
+            if self.imu_handler.connected:
+                self.connection_message = "Disconnecting previous IMU session..."
+                disconnect_result = bt_manager.run_coroutine(self.imu_handler.disconnect())
+                print(f"[DEBUG] IMU disconnect result: {disconnect_result}")
+
+            # Connect to IMU
+            self.connection_message = "Attempting to connect to IMU device..."
+            connect_result = bt_manager.run_coroutine(self.imu_handler.connect())
+            print(f"[DEBUG] Connect result: {connect_result}")
+
+            if not self.imu_handler.connected:
+                self.connection_message = f"Failed to connect to IMU device: {connect_result}"
+                print(f"[ERROR] {self.connection_message}")
+                # Close the file since we won't be collecting data
+                self.recorders['session'].stop()
+                return
+
+            self.connection_message = "IMU connected successfully"
+            print(f"[DEBUG] {self.connection_message}")
+
+        except Exception as e:
+            self.connection_message = f"IMU connection error: {str(e)}"
+            print(f"[ERROR] {self.connection_message}")
+            self.recorders['session'].stop()
+            return
+
+        # Now connect to EMG
+        self.connection_message = "IMU connected. Now connecting to EMG device..."
+        self.emg_handler = EMGHandler()
+        emg_status = self.emg_handler.connect(port=emg_port, baudrate=emg_baudrate)
+        print(f"[DEBUG] EMG connect status: {emg_status}")
+
+        if not self.emg_handler.connected:
+            self.connection_message = f"Failed to connect to EMG device: {emg_status}"
+            print(f"[ERROR] {self.connection_message}")
+            # Disconnect IMU since EMG failed
+            try:
+                disconnect_result = bt_manager.run_coroutine(self.imu_handler.disconnect())
+                print(f"[DEBUG] IMU disconnect result: {disconnect_result}")
+            except Exception as e:
+                print(f"[ERROR] Error disconnecting IMU: {e}")
+            self.recorders['session'].stop()
+            return
+
+        def disconnect_local_devices():
+            print("[DEBUG] Disconnecting from devices")
+            self.emg_handler.disconnect()
+
+            # Disconnect from IMU
+            try:
+                disconnect_result = bt_manager.run_coroutine(self.imu_handler.disconnect())
+                print(f"[DEBUG] IMU disconnect result during cleanup: {disconnect_result}")
+
+                # Stop the Bluetooth manager
+                bt_manager.stop()
+            except Exception as e:
+                print(f"[ERROR] Error during final cleanup: {e}")
+
+        self.run(disconnect_local_devices)
+
+    def connect_remote_devices(self):
+        """Wait for the station's edge node to stream both devices and start data collection"""
+        self.imu_handler = gateway.device(self.station, 'imu')
+        self.emg_handler = gateway.device(self.station, 'emg')
+
+        self.connection_message = f"Waiting for IMU data from station {self.station}..."
+        status = self.imu_handler.connect()
+        print(f"[DEBUG] Remote IMU connect status: {status}")
+        if self.imu_handler.connected:
+            self.connection_message = f"Waiting for EMG data from station {self.station}..."
+            status = self.emg_handler.connect()
+            print(f"[DEBUG] Remote EMG connect status: {status}")
+
+        if not (self.imu_handler.connected and self.emg_handler.connected):
+            self.connection_message = f"Failed to connect to station {self.station}: {status}"
+            print(f"[ERROR] {self.connection_message}")
+            self.imu_handler.disconnect()
+            self.recorders['session'].stop()
+            return
+
+        def disconnect_remote_devices():
+            print(f"[DEBUG] Releasing the devices of station {self.station}")
+            self.imu_handler.disconnect()
+            self.emg_handler.disconnect()
+
+        self.run(disconnect_remote_devices)
+
+    def run(self, disconnect):
+        """
+        Collect and record the connected devices' data until the session is stopped
+
+        Args:
+            disconnect: Called at the end to release the devices
+        """
+        self.imu_handler.register_callback(self.on_imu)
+        self.emg_handler.register_callback(self.on_emg)
+
+        # Both devices connected successfully, start data collection
+        self.connection_message = f"Session '{self.name}' started. Both devices connected successfully."
+        print(f"[DEBUG] {self.connection_message}")
+
+        data_dir = os.path.dirname(self.recorders['session'].path)
+        self.recorders['imu'].start(os.path.join(data_dir, f"{self.name}_imu.csv"), self.name)
+        self.recorders['emg'].start(os.path.join(data_dir, f"{self.name}_emg.csv"), self.name)
+        self.active = True
+
+        try:
+            # Just keep the session active, the callbacks handle the data
+            while self.active:
+                time.sleep(0.1)
+        except Exception as e:
+            self.connection_message = f"Error in session: {e}"
+            print(f"[ERROR] {self.connection_message}")
+        finally:
+            self.active = False
+            self.imu_handler.unregister_callback(self.on_imu)
+            self.emg_handler.unregister_callback(self.on_emg)
+
+            # Write the last partial EMG block, then close the data files
+            self.emg_conditioner.flush()
+            self.recorders['imu'].stop()
+            self.recorders['emg'].stop()
+
+            disconnect()
+            print(f"[DEBUG] Session '{self.name}' ended")
+
+    def on_imu(self, data):
+        """
+        Device callback for an IMU sample
+
+        Remote devices pass the sample time (server clock) as data['timestamp'];
+        local samples are stamped on arrival.
+        """
+        timestamp = data.get('timestamp', time.time())
+        self.state.replace('imu', data)
+        self.imu_handler.process_imu_data(data)
+
+        new_reading = [
+            data['accel_x'], data['accel_y'], data['accel_z'],
+            data['gyro_x'], data['gyro_y'], data['gyro_z']
+        ]
+        self.recorders['imu'].write([timestamp] + new_reading)
+
+        # The windowing engine runs rep detection for every REP_BATCH_SIZE new readings
+        self.windows.append('imu', new_reading, timestamp)
+
+        # The segmenter reports exact rep boundaries, so the rep is processed
+        # from the sample history instead of the window since the last rep
+        if self.automatic_rep_detection and self.active_rep_detector() == 'segmenter':
+            rep = self.rep_segmenter.update(new_reading, self.windows.count('imu') - 1)
+            if rep:
+                print(f"[DEBUG] Rep segmented: samples {rep['start']}-{rep['end']}")
+                self.process_rep_data(*self.get_rep_samples(rep))
+
+    def on_emg(self, data):
+        """Device callback for an EMG sample"""
+        timestamp = data.get('timestamp', time.time())
+        self.state.replace('emg', data)
+        new_reading = [
+            data['time'], data['bicep'], data['shoulder'], data['tricep']
+        ]
+        self.windows.append('emg', new_reading, timestamp)
+        self.emg_conditioner.push(timestamp, new_reading)
+
+    def store_conditioned_emg(self, block):
+        """Keep and record a conditioned EMG block with its envelope"""
+        self.windows.extend('emg_envelope', block['envelope'], block['timestamps'])
+        self.state.replace('emg_envelope', self.emg_conditioner.latest)
+        self.recorders['emg'].write_rows([[timestamp] + raw + envelope for timestamp, raw, envelope in zip(
+            block['timestamps'].tolist(), block['raw'].tolist(), block['envelope'].tolist())])
+
+    def on_load_sample(self, load_stats):
+        """Publish the scheduler and load statistics, at most every ML_STATS_INTERVAL"""
+        now = time.time()
+        if now - self.ml_stats_published < ML_STATS_INTERVAL:
+            return
+        self.ml_stats_published = now
+        self.state.update('ml_stats', scheduler=self.scheduler.stats(), load=load_stats)
+
+    def active_rep_detector(self):
+        """Rep detector in use: the selected one unless the load controller overrides it"""
+        return self.load_controller.settings['rep_detector'] or self.rep_detector
+
+    def on_load_level_change(self, settings):
+        """Reset the detector buffers when the load controller switches detector"""
+        if settings['rep_detector'] != self.load_rep_detector:
+            self.rep_segmenter.reset()
+        self.load_rep_detector = settings['rep_detector']
+        self.state.update('ml_results', degradation_level=self.load_controller.level)
+
+    def set_rep_mode(self, automatic, detector=None):
+        """
+        Set automatic or manual rep detection and, optionally, the automatic detector
+
+        Args:
+            automatic: True for automatic detection, False for manual reps
+            detector: 'model' or 'segmenter'
+        """
+        if detector is not None:
+            if detector not in REP_DETECTORS:
+                raise ValueError(f"Unknown rep detector: {detector}")
+            if detector != self.rep_detector:
+                self.rep_segmenter.reset()
+            self.rep_detector = detector
+            print(f"[INFO] Session {self.id}: rep detector set to {detector}")
+
+        self.automatic_rep_detection = bool(automatic)
+        print(f"[INFO] Session {self.id}: rep detection mode set to "
+              f"{'automatic' if self.automatic_rep_detection else 'manual'}")
+
+    def manual_rep(self):
+        """Count a rep marked by the user and classify it"""
+        self.process_rep_data()
+        return self.rep_count
+
+    def process_imu_batch(self, imu_batch_array, timestamps, end):
+        """
+        Window consumer for rep detection, called by the windowing engine with a
+        read-only view of every REP_BATCH_SIZE new IMU readings
+        """
+        # In automatic mode, detect reps from IMU data; the segmenter does its own
+        # per-sample detection. In manual mode reps are marked by manual_rep().
+        if not (self.automatic_rep_detection and self.active_rep_detector() == 'model'):
+            return
+
+        # Under load only every Nth batch is evaluated
+        self.imu_batch_count += 1
+        if self.imu_batch_count % self.load_controller.settings['hop_multiplier']:
+            return
+
+        # Run rep detection on the scheduler's express lane so it never waits
+        # behind exercise or fatigue classification. The task may run after the
+        # buffer has wrapped past the view, so it gets a copy. A batch that
+        # missed its deadline is dropped: a later batch reports the rep sooner
+        # than the backlog would.
+        self.submit_task('rep_detection', self.detect_rep, np.array(imu_batch_array),
+                         deadline=INFERENCE_DEADLINES['rep_detection'], droppable=True)
+
+    def detect_rep(self, imu_batch_array):
+        """Run the motion gate and the rep detection model on one IMU batch"""
+        # Skip the rep detection model when there is clearly no movement
+        gate_decision = self.motion_gate.check(imu_batch_array)
+        self.state.update('ml_stats', motion_gate=self.motion_gate.stats())
+        if gate_decision == MotionGate.SKIP:
+            return 0
+
+        # Use the rep detection model to check for a new rep (returns 1 for new rep)
+        rep_status = registry.get('rep_detection').predict(imu_batch_array)
+        self.motion_gate.record(gate_decision, rep_status)
+        if rep_status != 1:
+            return 0
+
+        print(f"[DEBUG] Automatic rep detected by ML model")
+        self.process_rep_data()
+        return 1
+
+    def get_rep_samples(self, rep):
+        """
+        Views of the IMU and EMG samples of a segmented rep in the windowing engine
+
+        Args:
+            rep: Rep from the segmenter with absolute IMU 'start'/'end' sample indices
+
+        Returns:
+            (imu_data, emg_data, (start_time, end_time)); EMG samples are matched
+            by arrival time
+        """
+        imu_data, imu_timestamps, _ = self.windows.slice('imu', rep['start'], rep['end'])
+        if not len(imu_data):
+            return np.empty((0, 6)), np.empty((0, 4)), None
+
+        start_time, end_time = imu_timestamps[0], imu_timestamps[-1]
+        emg_data, _ = self.windows.slice_time('emg', start_time, end_time)
+        return imu_data, emg_data, (start_time, end_time)
+
+    def process_rep_data(self, imu_data=None, emg_data=None, rep_span=None):
+        """
+        Process data after a rep is detected (in either auto or manual mode)
+
+        Args:
+            imu_data: IMU samples of exactly this rep (from the rep segmenter);
+                      defaults to the IMU samples since the previous rep
+            emg_data: EMG samples of exactly this rep; defaults to the EMG
+                      samples since the previous rep
+            rep_span: (start_time, end_time) of the rep; defaults to the arrival
+                      times of the IMU window's first and last samples
+        """
+        with self.rep_lock:
+            if imu_data is None:
+                imu_data, imu_timestamps, _ = self.windows.read_since('imu', self.rep_window_start['imu'],
+                                                                      IMU_WINDOW_SIZE)
+                if rep_span is None and len(imu_timestamps):
+                    rep_span = (imu_timestamps[0], imu_timestamps[-1])
+            if emg_data is None:
+                emg_data, _, _ = self.windows.read_since('emg', self.rep_window_start['emg'], EMG_WINDOW_SIZE)
+
+            # Ensure the accumulated windows are sufficiently long
+            if len(imu_data) < MIN_REP_WINDOW or len(emg_data) < MIN_REP_WINDOW:
+                print(f"[DEBUG] Windows not long enough for processing: IMU={len(imu_data)}, EMG={len(emg_data)}")
+                return
+
+            # The windows are views into the ring buffers; the classification
+            # tasks run later, so they get copies
+            imu_data, emg_data = np.array(imu_data), np.array(emg_data)
+
+            # Update rep count and last rep time right away, the live rep count
+            # shouldn't wait for the slower models
+            self.rep_count += 1
+            rep_number = self.rep_count
+            self.last_rep_time = rep_time = time.time()
+
+            # The next rep's windows start here
+            self.rep_window_start.update(imu=self.windows.count('imu'), emg=self.windows.count('emg'))
+
+        self.state.update('ml_results', rep_count=rep_number, last_rep_time=rep_time)
+        print(f"[DEBUG] Session {self.id}: rep #{rep_number} recorded")
+
+        if rep_span is None:
+            rep_span = (rep_time, rep_time)
+        if self.feature_store:
+            self.feature_store.record(rep_number, start_time=float(rep_span[0]), end_time=float(rep_span[1]))
+
+        self.submit_task('exercise', self.classify_exercise, rep_number, imu_data, emg_data, rep_time,
+                         deadline=INFERENCE_DEADLINES['exercise'])
+
+    def classify_exercise(self, rep_number, imu_data, emg_data, rep_time):
+        """Classify the exercise of a rep and queue its fatigue analysis"""
+        # Classify the exercise from the IMU samples, but only at the start of a
+        # set; later reps of the same set keep the set's label
+        imu_features = None
+        if self.set_tracker.should_classify(imu_data, rep_time):
+            exercise_type, imu_features = registry.get('exercise_classification').predict_with_features(imu_data)
+            exercise_type = self.set_tracker.record_label(exercise_type)
+            print(f"[DEBUG] Exercise classification result: {exercise_type}")
+        else:
+            exercise_type = self.set_tracker.label
+        self.state.update('ml_stats', set_tracker=self.set_tracker.stats())
+
+        if exercise_type != 'unknown':
+            self.current_exercise = exercise_type
+            self.state.update('ml_results', exercise=self.current_exercise)
+
+        if self.feature_store:
+            self.feature_store.record(rep_number, imu_features=imu_features,
+                                      exercise=self.current_exercise, set=self.set_tracker.set_count)
+
+        # Process EMG window for fatigue classification if applicable
+        if self.current_exercise in ['bicep_curl', 'lat_raise']:
+            self.process_emg_for_fatigue(emg_data, rep_number)
+        return exercise_type
+
+    def process_emg_for_fatigue(self, emg_data=None, rep_number=None):
+        """Queue a rep's EMG window for fatigue classification"""
+        # Default to the EMG samples since the previous rep
+        if emg_data is None:
+            emg_data, _, _ = self.windows.read_since('emg', self.rep_window_start['emg'], EMG_WINDOW_SIZE)
+
+        # Skip if insufficient data
+        if len(emg_data) < MIN_FATIGUE_WINDOW:
+            return
+
+        # Under load fatigue is only analysed on every Nth rep
+        fatigue_every = self.load_controller.settings['fatigue_every']
+        if rep_number is not None and rep_number % fatigue_every:
+            print(f"[DEBUG] Skipping fatigue analysis of rep #{rep_number} (every {fatigue_every} reps under load)")
+            return
+
+        # Pending windows wait for a later fatigue job, so views are copied
+        with self.pending_fatigue_lock:
+            self.pending_fatigue_windows.append((rep_number, np.array(emg_data)))
+
+        # A fatigue job of this session still queued for an earlier rep is
+        # superseded by this one
+        self.submit_task('fatigue', self.run_fatigue_analysis,
+                         deadline=INFERENCE_DEADLINES['fatigue'], coalesce_key=f"fatigue:{self.id}")
+
+    def run_fatigue_analysis(self):
+        """Classify fatigue for all reps waiting for it and publish the latest levels"""
+        with self.pending_fatigue_lock:
+            pending = list(self.pending_fatigue_windows)
+            self.pending_fatigue_windows.clear()
+        if not pending:
+            return None
+
+        # Process fatigue for both bicep and shoulder regardless of exercise,
+        # extracting each rep's features only once for both models. Reps that
+        # piled up are submitted together so they share one forward pass.
+        fatigue_service = registry.get('fatigue_service')
+        submitted = [(rep_number, fatigue_service.submit_with_features(self.id, emg_data))
+                     for rep_number, emg_data in pending]
+        for rep_number, (future, emg_features) in submitted:
+            fatigue_levels = future.result()
+            if self.feature_store and rep_number is not None:
+                self.feature_store.record(rep_number, emg_features=emg_features,
+                                          bicep_fatigue=fatigue_levels['bicep_curl'],
+                                          shoulder_fatigue=fatigue_levels['lat_raise'])
+        bicep_fatigue = fatigue_levels['bicep_curl']
+        shoulder_fatigue = fatigue_levels['lat_raise']
+
+        # Also maintain the original fatigue_level based on the current exercise
+        if self.current_exercise == 'bicep_curl':
+            fatigue_level = bicep_fatigue
+        elif self.current_exercise == 'lat_raise':
+            fatigue_level = shoulder_fatigue
+        else:
+            fatigue_level = 'unknown'
+
+        # Publish both fatigue levels in one version
+        self.state.update('ml_results', bicep_fatigue=bicep_fatigue, shoulder_fatigue=shoulder_fatigue,
+                          fatigue_level=fatigue_level)
+
+    def connection_status(self):
+        """Connection state of the session's devices"""
+        if self.source == 'remote':
+            imu_connected = self.imu_handler is not None and self.imu_handler.connected
+            emg_connected = self.emg_handler is not None and self.emg_handler.connected
+        else:
+            # The IMU handler is shared by the process, the EMG handler is the session's own
+            imu_connected = IMUHandler().connected
+            emg_connected = getattr(self.emg_handler, 'connected', False)
+        status = {
+            'imu_connected': imu_connected,
+            'emg_connected': emg_connected,
+            'session_active': self.active,
+            'connection_message': self.connection_message,
+            'source': self.source
+        }
+        if self.source == 'remote':
+            status['station'] = self.station
+        return status
+
+    def summary(self):
+        """Identity and state of the session, for listings"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'source': self.source,
+            'station': self.station,
+            'active': self.active,
+            'running': self.running,
+            'rep_count': self.rep_count,
+            'exercise': self.current_exercise,
+            'viewers': self.live_encoder.hub.stats()
+        }
+
+
+class SessionManager:
+    """
+    Sessions by ID, with the inference scheduler and load controller they share
+
+    The default session always exists, so the single-session routes work
+    without creating one.
+    """
+    def __init__(self, data_dir=None):
+        """
+        Args:
+            data_dir: Directory of the recordings (default: ./data)
+        """
+        self.data_dir = data_dir
+        self.scheduler = InferenceScheduler(INFERENCE_PRIORITIES)
+        # Steps every session's pipeline down to cheaper settings (fewer rep
+        # detection batches, fatigue on every Nth rep, the segmenter instead of
+        # the rep model) while inference falls behind or the CPU is saturated
+        self.load_controller = LoadController(self.scheduler.queue_lag)
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.create(DEFAULT_SESSION_ID)
+
+    def create(self, session_id=None):
+        """
+        Add an idle session
+
+        Args:
+            session_id: ID of the session (default: a new random ID)
+        """
+        with self.lock:
+            session_id = session_id or uuid.uuid4().hex[:12]
+            if session_id in self.sessions:
+                raise ValueError(f"Session {session_id} already exists")
+            session = Session(session_id, self.scheduler, self.load_controller, self.data_dir)
+            self.sessions[session_id] = session
+            return session
+
+    def get(self, session_id):
+        """The session with this ID, or None"""
+        return self.sessions.get(session_id)
+
+    def list(self):
+        with self.lock:
+            return [session.summary() for session in self.sessions.values()]
+
+    def start(self, session, name, source='local', station=None, **device_options):
+        """
+        Start a session (see Session.start) after checking that no other
+        running session uses its devices or name
+
+        Raises:
+            ValueError: Invalid options or the session is already running
+            RuntimeError: The devices or the name are in use by another session
+        """
+        devices = ('local',) if source == 'local' else ('remote', station)
+        with self.lock:
+            for other in self.sessions.values():
+                if other is session or not other.running:
+                    continue
+                if other.devices == devices:
+                    raise RuntimeError(f"Devices already in use by session {other.id}")
+                if other.name == name:
+                    raise RuntimeError(f"Session name {name} already in use by session {other.id}")
+            session.start(name, source, station, **device_options)
+        self.load_controller.start()
+
+    def stop(self, session):
+        """Stop a session; load control stops with the last active session"""
+        session.stop()
+        with self.lock:
+            if not any(other.running for other in self.sessions.values()):
+                self.load_controller.stop()
+
+    def remove(self, session_id):
+        """
+        Stop (if active) and drop a session; the default session can't be removed
+
+        Raises:
+            ValueError: The default session
+            RuntimeError: The session thread is still connecting or disconnecting
+                          its devices (retry once it has finished)
+        """
+        if session_id == DEFAULT_SESSION_ID:
+            raise ValueError('The default session cannot be removed')
+        session = self.get(session_id)
+        if session is None:
+            return None
+        if session.active:
+            self.stop(session)
+        with self.lock:
+            # stop() only waits briefly for the session thread; a session whose
+            # thread still holds the devices stays registered so it can't leak
+            if session.running:
+                raise RuntimeError(f"Session {session_id} is still connecting or disconnecting its devices")
+            self.sessions.pop(session_id, None)
+        session.close()
+        if session.name is not None:
+            registry.get('fatigue_service').reset_session(session_id)
+        return session
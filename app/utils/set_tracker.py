@@ -0,0 +1,119 @@
+from collections import Counter
+
+import numpy as np
+
+
+class SetTracker:
+    """
+    Tracks sets so the exercise classifier runs once per set instead of every rep.
+
+    The first reps of a set are classified and the majority label is kept for
+    the rest of the set. Each rep's IMU signature (per-axis mean and standard
+    deviation) is compared with the set's running signature; a new set, and
+    with it a new classification, starts after a rest gap or when a rep stops
+    looking like the set.
+    """
+    def __init__(self, classify_reps=2, similarity_threshold=0.9, rest_gap=20.0):
+        """
+        Args:
+            classify_reps: Number of reps classified at the start of each set
+            similarity_threshold: Cosine similarity below which a rep starts a new set
+            rest_gap: Seconds without reps after which the next rep starts a new set
+        """
+        self.classify_reps = classify_reps
+        self.similarity_threshold = similarity_threshold
+        self.rest_gap = rest_gap
+        self.reset()
+
+    def reset(self):
+        """Forget the current set and counters for a new session"""
+        self.label = 'unknown'
+        self.votes = Counter()
+        self.signature = None
+        self.reps_in_set = 0
+        self.last_rep_time = None
+        self.set_count = 0
+        self.rep_count = 0
+        self.classifier_calls = 0
+        self.new_set_reasons = Counter()
+        self.last_similarity = 1.0
+
+    @staticmethod
+    def rep_signature(imu_data):
+        """
+        Cheap signature of a rep's IMU samples
+
+        Accelerometer and gyroscope parts are normalised separately so that
+        neither sensor's units dominate the comparison.
+        """
+        imu_data = np.asarray(imu_data, dtype=np.float64)
+        parts = []
+        for columns in (slice(0, 3), slice(3, 6)):
+            part = np.concatenate([imu_data[:, columns].mean(axis=0), imu_data[:, columns].std(axis=0)])
+            norm = np.linalg.norm(part)
+            parts.append(part / norm if norm > 0 else part)
+        return np.concatenate(parts) / np.sqrt(2.0)
+
+    def should_classify(self, imu_data, timestamp):
+        """
+        Register a rep and decide whether the exercise classifier must run on it
+
+        Args:
+            imu_data: IMU samples of the rep, shape [samples, 6]
+            timestamp: Time of the rep in seconds
+        """
+        signature = self.rep_signature(imu_data)
+        self.rep_count += 1
+
+        reason = None
+        if self.signature is None:
+            reason = 'first_set'
+        elif self.last_rep_time is not None and timestamp - self.last_rep_time > self.rest_gap:
+            reason = 'rest'
+        else:
+            self.last_similarity = float(np.dot(signature, self.signature))
+            if self.last_similarity < self.similarity_threshold:
+                reason = 'change'
+
+        if reason:
+            self._start_set(signature, reason)
+        else:
+            # Let the set signature follow slow drift, e.g. from fatigue
+            self.signature = 0.8 * self.signature + 0.2 * signature
+            norm = np.linalg.norm(self.signature)
+            if norm > 0:
+                self.signature = self.signature / norm
+
+        self.reps_in_set += 1
+        self.last_rep_time = timestamp
+        return self.reps_in_set <= self.classify_reps
+
+    def record_label(self, label):
+        """Record the classifier's output for the current set"""
+        self.classifier_calls += 1
+        if label == 'unknown':
+            return self.label
+        self.votes[label] += 1
+        self.label = self.votes.most_common(1)[0][0]
+        return self.label
+
+    def _start_set(self, signature, reason):
+        self.set_count += 1
+        self.new_set_reasons[reason] += 1
+        self.signature = signature
+        self.reps_in_set = 0
+        self.votes = Counter()
+        self.last_similarity = 1.0
+
+    def stats(self):
+        """Return set and classifier-call counters"""
+        return {
+            'label': self.label,
+            'sets': self.set_count,
+            'reps': self.rep_count,
+            'reps_in_set': self.reps_in_set,
+            'classifier_calls': self.classifier_calls,
+            'calls_saved': self.rep_count - self.classifier_calls,
+            'similarity': self.last_similarity,
+            'new_set_reasons': dict(self.new_set_reasons)
+        }
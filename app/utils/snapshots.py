@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+
+
+class Snapshot:
+    """
+    One immutable version of the published state
+
+    `data` is a dict of sections (dicts) that is never modified after
+    publishing; writers publish a new Snapshot instead. The JSON encoding is
+    computed once per version, on first use.
+    """
+    __slots__ = ('version', 'data', 'etag', '_json')
+
+    def __init__(self, version, data, epoch):
+        self.version = version
+        self.data = data
+        # The epoch keeps versions of a restarted server from matching old ETags
+        self.etag = f"{epoch}-{version}"
+        self._json = None
+
+    def __getitem__(self, section):
+        return self.data[section]
+
+    def json(self):
+        """Pre-serialized JSON of this version"""
+        if self._json is None:
+            self._json = json.dumps(self.data, separators=(',', ':')).encode()
+        return self._json
+
+
+class SnapshotStore:
+    """
+    State published as versioned, immutable snapshots
+
+    Writers replace fields of a section with update(); every change builds a
+    new Snapshot and swaps it in atomically, so readers always see a
+    consistent version and never a half-written one. Updates that don't change
+    anything don't create a version, so idle clients can rely on ETags and
+    long polls.
+    """
+    def __init__(self, initial):
+        self._changed = threading.Condition(threading.Lock())
+        self._epoch = f"{os.getpid():x}{int(time.time()):x}"
+        self._current = Snapshot(1, {section: dict(values) for section, values in initial.items()}, self._epoch)
+
+    def current(self):
+        """The latest snapshot"""
+        return self._current
+
+    def update(self, section, **fields):
+        """Publish a new version with the given fields of a section replaced"""
+        return self.update_sections({section: fields})
+
+    def replace(self, section, values):
+        """Publish a new version with a whole section replaced"""
+        with self._changed:
+            current = self._current
+            if current.data.get(section) == values:
+                return current
+            data = dict(current.data)
+            data[section] = dict(values)
+            return self._publish(data)
+
+    def update_sections(self, changes):
+        """
+        Publish several sections' field changes as one version
+
+        Args:
+            changes: Dict mapping section name to a dict of changed fields
+        """
+        with self._changed:
+            current = self._current
+            data = None
+            for section, fields in changes.items():
+                old = current.data.get(section, {})
+                if all(key in old and old[key] == value for key, value in fields.items()):
+                    continue
+                if data is None:
+                    data = dict(current.data)
+                data[section] = dict(old, **fields)
+            if data is None:
+                return current
+            return self._publish(data)
+
+    def _publish(self, data):
+        snapshot = Snapshot(self._current.version + 1, data, self._epoch)
+        self._current = snapshot
+        self._changed.notify_all()
+        return snapshot
+
+    def wait_for_version(self, version, timeout=None):
+        """
+        Long poll: wait until a version newer than `version` is published
+
+        Returns:
+            The latest snapshot, which is unchanged if the timeout expired
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._current.version > version, timeout)
+            return self._current
@@ -0,0 +1,255 @@
+"""
+Static asset pipeline.
+
+Build step (run once per deployment, with network access for the vendoring):
+
+    python -m app.utils.static_assets
+
+1. Vendors the third-party assets the pages use (Plotly, Font Awesome, the
+   Roboto fonts) into app/static/vendor/, so pages load with no external
+   requests.
+2. Copies every file under app/static/ to app/static/dist/ with a content
+   hash in its name (js/dashboard.js -> js/dashboard.<hash>.js), rewriting
+   url(...) references inside CSS to the hashed names.
+3. Writes gzip (and brotli, if the package is installed) versions of the
+   text assets next to them.
+4. Writes dist/manifest.json mapping original to hashed paths.
+
+At runtime, templates link assets with asset_url('js/dashboard.js'). Hashed
+files never change, so they are served with immutable one-year cache headers
+and a precompressed variant matching the client's Accept-Encoding. Before
+the build has run, asset_url() falls back to the unhashed files, and vendored
+assets that haven't been downloaded fall back to their CDN.
+"""
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import urllib.request
+
+from flask import current_app, request, send_from_directory, url_for
+
+from app.utils.compression import compress_bytes, negotiate_encoding, brotli
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# File types worth compressing ahead of time
+COMPRESSIBLE_EXTENSIONS = {'.js', '.css', '.svg', '.json', '.map', '.txt', '.html', '.ttf'}
+# Suffix of the precompressed variant of each encoding
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# plotly-latest.min.js on the CDN has been frozen at 1.58.5, which is what the
+# pages were written against
+PLOTLY_URL = 'https://cdn.plot.ly/plotly-1.58.5.min.js'
+FONT_AWESOME_URL = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.1.1/'
+FONTSOURCE_URL = 'https://cdn.jsdelivr.net/npm/@fontsource/'
+GOOGLE_FONTS_URL = ('https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;500;700'
+                    '&family=Roboto+Mono:wght@400;500&display=swap')
+
+# Vendored path (under app/static) -> download URL
+VENDOR_FILES = {'vendor/plotly.min.js': PLOTLY_URL,
+                'vendor/fontawesome/css/all.min.css': FONT_AWESOME_URL + 'css/all.min.css'}
+for _font in ['fa-solid-900', 'fa-regular-400', 'fa-brands-400', 'fa-v4compatibility']:
+    for _extension in ['woff2', 'ttf']:
+        VENDOR_FILES[f"vendor/fontawesome/webfonts/{_font}.{_extension}"] = \
+            f"{FONT_AWESOME_URL}webfonts/{_font}.{_extension}"
+
+# (family, package, weight) of the vendored fonts, declared in vendor/fonts/fonts.css
+FONT_FACES = [('Roboto', 'roboto', weight) for weight in [300, 400, 500, 700]] + \
+             [('Roboto Mono', 'roboto-mono', weight) for weight in [400, 500]]
+for _family, _package, _weight in FONT_FACES:
+    VENDOR_FILES[f"vendor/fonts/{_package}-latin-{_weight}-normal.woff2"] = \
+        f"{FONTSOURCE_URL}{_package}@5.0.8/files/{_package}-latin-{_weight}-normal.woff2"
+
+# Entry points used by the templates, and where to load them from while they
+# haven't been vendored
+CDN_FALLBACKS = {
+    'vendor/plotly.min.js': PLOTLY_URL,
+    'vendor/fontawesome/css/all.min.css': FONT_AWESOME_URL + 'css/all.min.css',
+    'vendor/fonts/fonts.css': GOOGLE_FONTS_URL
+}
+
+CSS_URL_PATTERN = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def vendor_assets(static_dir, refresh=False):
+    """
+    Download the vendored third-party assets that are missing
+
+    Args:
+        static_dir: The app's static folder
+        refresh: Download every asset again
+    """
+    for path, url in VENDOR_FILES.items():
+        target = os.path.join(static_dir, path)
+        if os.path.exists(target) and not refresh:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        print(f"[INFO] Downloading {url}")
+        with urllib.request.urlopen(url, timeout=60) as response:
+            content = response.read()
+        with open(target + '.tmp', 'wb') as f:
+            f.write(content)
+        os.replace(target + '.tmp', target)
+
+    faces = []
+    for family, package, weight in FONT_FACES:
+        faces.append("@font-face{font-family:'%s';font-style:normal;font-weight:%d;font-display:swap;"
+                     "src:url(%s-latin-%d-normal.woff2) format('woff2')}" % (family, weight, package, weight))
+    with open(os.path.join(static_dir, 'vendor', 'fonts', 'fonts.css'), 'w') as f:
+        f.write('\n'.join(faces) + '\n')
+
+
+def hashed_name(path, content):
+    """path/name.ext -> path/name.<hash>.ext"""
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    stem, extension = posixpath.splitext(path)
+    return f"{stem}.{digest}{extension}"
+
+
+def rewrite_css_urls(css_path, css, manifest):
+    """Point url(...) references of a CSS file at the hashed names of their targets"""
+    directory = posixpath.dirname(css_path)
+
+    def replace(match):
+        quote, reference = match.group(1), match.group(2)
+        if reference.startswith(('data:', 'http:', 'https:', '//', '#', '/')):
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', reference).groups()
+        target = posixpath.normpath(posixpath.join(directory, path))
+        if target not in manifest:
+            return match.group(0)
+        # Both files end up under dist/ with the same layout
+        relative = posixpath.relpath(manifest[target], posixpath.join(DIST_DIR, directory))
+        return f"url({quote}{relative}{suffix}{quote})"
+
+    return CSS_URL_PATTERN.sub(replace, css)
+
+
+def build_assets(static_dir, vendor=True, refresh=False, clean=False):
+    """
+    Build the fingerprinted, precompressed copy of the static folder
+
+    Files of earlier builds are kept (unless `clean`), so pages rendered
+    before a deployment can still load the assets they reference.
+
+    Returns:
+        The manifest: original path -> hashed path, both relative to static_dir
+    """
+    if vendor:
+        vendor_assets(static_dir, refresh)
+
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    if clean and os.path.exists(dist_dir):
+        shutil.rmtree(dist_dir)
+
+    sources = []
+    for root, directories, files in os.walk(static_dir):
+        directories[:] = [d for d in directories if os.path.join(root, d) != dist_dir]
+        for name in files:
+            if name.endswith('.tmp') or name.endswith('.DS_Store'):
+                continue
+            sources.append(os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, '/'))
+    # CSS last, so the files it references already have their hashed names
+    sources.sort(key=lambda path: (path.endswith('.css'), path))
+
+    manifest = {}
+    for path in sources:
+        with open(os.path.join(static_dir, path), 'rb') as f:
+            content = f.read()
+        if path.endswith('.css'):
+            content = rewrite_css_urls(path, content.decode('utf-8'), manifest).encode('utf-8')
+        output = posixpath.join(DIST_DIR, hashed_name(path, content))
+        manifest[path] = output
+
+        target = os.path.join(static_dir, output)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        if posixpath.splitext(path)[1] in COMPRESSIBLE_EXTENSIONS:
+            for encoding in (['br', 'gzip'] if brotli is not None else ['gzip']):
+                compressed = compress_bytes(content, encoding)
+                if len(compressed) < len(content):
+                    with open(target + ENCODING_SUFFIXES[encoding], 'wb') as f:
+                        f.write(compressed)
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"[INFO] Built {len(manifest)} assets into {dist_dir}")
+    return manifest
+
+
+def load_manifest(static_dir):
+    """The build manifest, or an empty dict if the assets haven't been built"""
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(filename):
+    """
+    URL of a static asset for templates: its fingerprinted copy if built,
+    its CDN if it is a vendored asset that hasn't been downloaded, or the
+    plain static file
+    """
+    manifest = current_app.extensions.get('static_assets', {})
+    if filename in manifest:
+        return url_for('static', filename=manifest[filename])
+    if filename in CDN_FALLBACKS and not os.path.exists(os.path.join(current_app.static_folder, filename)):
+        return CDN_FALLBACKS[filename]
+    return url_for('static', filename=filename)
+
+
+def send_static_asset(filename):
+    """Static file view: immutable caching and precompressed variants for fingerprinted assets"""
+    if not filename.startswith(DIST_DIR + '/'):
+        return current_app.send_static_file(filename)
+
+    static_dir = current_app.static_folder
+    available = [encoding for encoding, suffix in ENCODING_SUFFIXES.items()
+                 if os.path.exists(os.path.join(static_dir, filename + suffix))]
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'), available)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    response = send_from_directory(static_dir, filename + ENCODING_SUFFIXES[encoding] if encoding else filename,
+                                   mimetype=mimetype, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def init_app(app):
+    """Load the asset manifest and install asset_url() and the static file view"""
+    manifest = load_manifest(app.static_folder)
+    if not manifest:
+        print("[INFO] Static assets not built; serving unfingerprinted files "
+              "(python -m app.utils.static_assets)")
+    app.extensions['static_assets'] = manifest
+    app.add_template_global(asset_url)
+    app.view_functions['static'] = send_static_asset
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the fingerprinted, precompressed static assets')
+    parser.add_argument('--static-dir', default=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static'))
+    parser.add_argument('--no-vendor', action='store_true', help="Don't download third-party assets")
+    parser.add_argument('--refresh', action='store_true', help='Download the third-party assets again')
+    parser.add_argument('--clean', action='store_true', help='Remove the files of earlier builds')
+    args = parser.parse_args()
+
+    build_assets(args.static_dir, vendor=not args.no_vendor, refresh=args.refresh, clean=args.clean)
+
+
+if __name__ == '__main__':
+    main()
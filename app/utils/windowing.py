@@ -0,0 +1,197 @@
+import threading
+
+import numpy as np
+
+# Window sizes of the ML pipeline, in samples; shared by live sessions
+# (app/utils/session.py), offline analysis and the dataset builder
+REP_BATCH_SIZE = 30  # New IMU readings per rep detection batch
+IMU_WINDOW_SIZE = 300  # At most ~2-3 s of IMU data per rep for exercise classification
+EMG_WINDOW_SIZE = 1000  # At most ~1 s of EMG data per rep for fatigue
+MIN_REP_WINDOW = 30  # Reps with fewer IMU or EMG samples are ignored
+MIN_FATIGUE_WINDOW = 100  # At least 100ms of EMG at 1kHz for fatigue
+
+
+class StreamBuffer:
+    """
+    Ring buffer of one sample stream, written twice ("mirrored") so that any
+    run of up to `capacity` consecutive samples is contiguous in memory and can
+    be handed out as a NumPy view without copying.
+
+    Samples are addressed by their absolute sequence number: the first sample
+    of the stream is 0, and the buffer retains [count - capacity, count).
+    """
+    def __init__(self, channels, capacity):
+        self.channels = channels
+        self.capacity = capacity
+        self.data = np.zeros((2 * capacity, channels), dtype=np.float64)
+        self.timestamps = np.zeros(2 * capacity, dtype=np.float64)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.count = 0
+
+    def append(self, reading, timestamp):
+        """Append one sample; returns its sequence number"""
+        with self.lock:
+            pos = self.count % self.capacity
+            self.data[pos] = reading
+            self.data[pos + self.capacity] = reading
+            self.timestamps[pos] = timestamp
+            self.timestamps[pos + self.capacity] = timestamp
+            self.count += 1
+            return self.count - 1
+
+    def extend(self, readings, timestamps):
+        """Append a block of samples in one vectorized write"""
+        readings = np.asarray(readings, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        n = len(readings)
+        # Only the last `capacity` samples of a longer block can be retained
+        skipped = max(0, n - self.capacity)
+        with self.lock:
+            pos = (self.count + skipped + np.arange(n - skipped)) % self.capacity
+            self.data[pos] = readings[skipped:]
+            self.data[pos + self.capacity] = readings[skipped:]
+            self.timestamps[pos] = timestamps[skipped:]
+            self.timestamps[pos + self.capacity] = timestamps[skipped:]
+            self.count += n
+            return self.count
+
+    def oldest(self):
+        """Sequence number of the oldest retained sample"""
+        return max(0, self.count - self.capacity)
+
+    def slice(self, start, end):
+        """
+        Read-only views of samples [start, end), clipped to the retained range
+
+        Returns:
+            (data [n, channels], timestamps [n], start) where start is the
+            sequence number of the first returned sample
+        """
+        end = min(end, self.count)
+        start = min(max(start, self.oldest()), end)
+        pos = start % self.capacity
+        data = self.data[pos:pos + end - start]
+        timestamps = self.timestamps[pos:pos + end - start]
+        data.flags.writeable = False
+        timestamps.flags.writeable = False
+        return data, timestamps, start
+
+
+class WindowingEngine:
+    """
+    Shared windowing over the live IMU/EMG streams
+
+    Each stream is kept once in a StreamBuffer. Consumers register the stream,
+    window length and hop they need, and are called with read-only views into
+    the shared buffer whenever a window is due, instead of each one collecting
+    and copying its own list of samples.
+
+    Views are only valid until the buffer wraps, i.e. for (capacity - length)
+    more samples; consumers that hold on to a window longer must copy it.
+    """
+    def __init__(self):
+        self.streams = {}
+        self.consumers = {}
+
+    def add_stream(self, name, channels, capacity):
+        """Create a stream retaining the last `capacity` samples"""
+        self.streams[name] = StreamBuffer(channels, capacity)
+        self.consumers.setdefault(name, [])
+
+    def register(self, name, stream, length, hop, callback):
+        """
+        Register a consumer
+
+        Args:
+            name: Consumer name, used to unregister it
+            stream: Stream to window
+            length: Window length in samples
+            hop: New samples between consecutive windows
+            callback: Called as callback(data, timestamps, end) with read-only
+                      views of the window's samples and the sequence number
+                      following its last sample
+        """
+        if length > self.streams[stream].capacity:
+            raise ValueError(f"Window of {length} samples exceeds the {stream} buffer")
+        self.unregister(name)
+        self.consumers[stream].append({
+            'name': name, 'length': length, 'hop': hop, 'callback': callback,
+            'next': self.streams[stream].count + length
+        })
+
+    def unregister(self, name):
+        for consumers in self.consumers.values():
+            consumers[:] = [consumer for consumer in consumers if consumer['name'] != name]
+
+    def reset(self):
+        """Drop all samples and restart every consumer's windows"""
+        for stream, buffer in self.streams.items():
+            buffer.reset()
+            for consumer in self.consumers[stream]:
+                consumer['next'] = consumer['length']
+
+    def append(self, stream, reading, timestamp):
+        """Add a sample to a stream and run the consumers whose window is due"""
+        self.streams[stream].append(reading, timestamp)
+        self._dispatch(stream)
+
+    def extend(self, stream, readings, timestamps):
+        """Add a block of samples to a stream and run the consumers that are due"""
+        self.streams[stream].extend(readings, timestamps)
+        self._dispatch(stream)
+
+    def _dispatch(self, stream):
+        buffer = self.streams[stream]
+        for consumer in list(self.consumers[stream]):
+            if buffer.count < consumer['next']:
+                continue
+            end = buffer.count
+            # Windows missed because a block skipped past them aren't replayed
+            consumer['next'] = end + consumer['hop']
+            data, timestamps, _ = buffer.slice(end - consumer['length'], end)
+            try:
+                consumer['callback'](data, timestamps, end)
+            except Exception as e:
+                print(f"[ERROR] Error in {consumer['name']} window consumer: {e}")
+
+    def count(self, stream):
+        """Number of samples received on a stream"""
+        return self.streams[stream].count
+
+    def latest(self, stream, length):
+        """Views of the last `length` samples: (data, timestamps)"""
+        buffer = self.streams[stream]
+        data, timestamps, _ = buffer.slice(buffer.count - length, buffer.count)
+        return data, timestamps
+
+    def slice(self, stream, start, end):
+        """Views of samples [start, end) by sequence number: (data, timestamps, start)"""
+        return self.streams[stream].slice(start, end)
+
+    def read_since(self, stream, seq, max_length=None):
+        """
+        Views of every sample from sequence number `seq` on
+
+        Args:
+            max_length: Return at most this many of the most recent samples
+
+        Returns:
+            (data, timestamps, start); start > seq means samples were dropped
+        """
+        buffer = self.streams[stream]
+        end = buffer.count
+        if max_length is not None:
+            seq = max(seq, end - max_length)
+        return buffer.slice(seq, end)
+
+    def slice_time(self, stream, start_time, end_time):
+        """Views of the retained samples that arrived within [start_time, end_time]"""
+        buffer = self.streams[stream]
+        data, timestamps, start = buffer.slice(buffer.oldest(), buffer.count)
+        lo = int(np.searchsorted(timestamps, start_time, side='left'))
+        hi = int(np.searchsorted(timestamps, end_time, side='right'))
+        return data[lo:hi], timestamps[lo:hi]
@@ -1,3 +1,44 @@
+import os
+
 class Config:
     SECRET_KEY = 'your-secret-key'
-    DEBUG = True 
\ No newline at end of file
+    DEBUG = True
+    # Load and warm up the ML models in a background thread at startup
+    MODEL_WARMUP = True
+    # Where feature extraction and prediction run: 'thread' (in this process)
+    # or 'process' (shared-memory worker pool, keeps the GIL free for ingest and web)
+    ML_EXECUTION_MODE = os.environ.get('FLEX_ML_EXECUTION_MODE', 'thread')
+    ML_WORKER_PROCESSES = int(os.environ.get('FLEX_ML_WORKER_PROCESSES', 2))
+    # Unix socket of a shared model server (python -m app.utils.model_server).
+    # When unset, every process loads its own copy of the models.
+    MODEL_SERVER_SOCKET = os.environ.get('FLEX_MODEL_SERVER_SOCKET')
+    MODEL_SERVER_AUTHKEY = os.environ.get('FLEX_MODEL_SERVER_AUTHKEY')
+    # Thread-pool sizes of the numerical libraries (see app/utils/resource_governor.py).
+    # Inference windows are small, so one BLAS thread per caller avoids oversubscription.
+    BLAS_THREADS = int(os.environ.get('FLEX_BLAS_THREADS', 1))
+    TF_INTRA_OP_THREADS = int(os.environ.get('FLEX_TF_INTRA_OP_THREADS', 2))
+    TF_INTER_OP_THREADS = int(os.environ.get('FLEX_TF_INTER_OP_THREADS', 1))
+    SKLEARN_JOBS = int(os.environ.get('FLEX_SKLEARN_JOBS', 1))
+    # Optional core sets, e.g. '0' / '1-3' / '0': device ingest threads, ML
+    # inference threads and worker processes, and web request threads
+    INGEST_CPUS = os.environ.get('FLEX_INGEST_CPUS')
+    INFERENCE_CPUS = os.environ.get('FLEX_INFERENCE_CPUS')
+    WEB_CPUS = os.environ.get('FLEX_WEB_CPUS')
+    # Default writes per second to an /api/stream viewer (at most the encoder's 10)
+    STREAM_FRAME_RATE = int(os.environ.get('FLEX_STREAM_FRAME_RATE', 10))
+    # Ingest gateway for devices streamed by edge nodes (see app/utils/ingest_gateway.py),
+    # started by the first remote session. Set the WebSocket port to also accept WebSocket producers.
+    INGEST_HOST = os.environ.get('FLEX_INGEST_HOST', '0.0.0.0')
+    INGEST_UDP_PORT = int(os.environ.get('FLEX_INGEST_UDP_PORT', 9750))
+    INGEST_WEBSOCKET_PORT = int(os.environ['FLEX_INGEST_WEBSOCKET_PORT']) \
+        if os.environ.get('FLEX_INGEST_WEBSOCKET_PORT') else None
+
+
+class ProductionConfig(Config):
+    """Settings for serve.py (gevent server, see README "Production Serving")"""
+    DEBUG = False
+    # All greenlets share one OS thread, so per-thread core pinning doesn't
+    # apply; serve.py pins the whole server process and the model server instead
+    INGEST_CPUS = None
+    INFERENCE_CPUS = None
+    WEB_CPUS = None
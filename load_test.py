@@ -0,0 +1,204 @@
+"""
+Load profile of a running FleX server.
+
+Opens increasing numbers of concurrent /api/stream (Server-Sent Events)
+viewers while a fixed number of pollers request /api/live_data, and reports
+per step how many viewers stayed connected, the frame rate they received and
+the latency of ordinary requests:
+
+    python load_test.py --url http://localhost:8000 --viewers 50,100,200,400
+
+Frames are only pushed while a session is streaming data, so start a session
+before measuring frame rates; without one the profile still
+shows connection capacity and request latency. Uses only the standard
+library and doesn't import the app, so it can run from another machine.
+"""
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, fraction):
+    """Value at a fraction (0-1) of the sorted values, None if there are none"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def read_response_head(reader):
+    """Read the status line and headers of an HTTP response"""
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            return status, headers
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+async def read_body_chunks(reader, headers):
+    """Yield the body of a (possibly chunked) HTTP response as it arrives"""
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                return
+            chunk = await reader.readexactly(size + 2)
+            yield chunk[:-2]
+    else:
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def viewer(host, port, stats):
+    """
+    One /api/stream subscriber: counts the frames received until cancelled
+
+    Args:
+        stats: Dict the viewer's counters are added to
+    """
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        stats['connect_errors'] += 1
+        return
+    try:
+        writer.write(f"GET /api/stream HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+        await writer.drain()
+        status, headers = await read_response_head(reader)
+        if status != 200:
+            stats['connect_errors'] += 1
+            return
+        stats['connected'] += 1
+
+        buffer = ''
+        last_frame = None
+        async for chunk in read_body_chunks(reader, headers):
+            buffer += chunk.decode()
+            *events, buffer = buffer.split('\n\n')
+            for event in events:
+                if 'event: frame' not in event:
+                    continue
+                stats['frames'] += 1
+                for line in event.split('\n'):
+                    if line.startswith('id: '):
+                        frame_id = int(line[4:])
+                        if last_frame is not None and frame_id > last_frame + 1:
+                            stats['frames_skipped'] += frame_id - last_frame - 1
+                        last_frame = frame_id
+        # The server closed the stream
+        stats['disconnected'] += 1
+    except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+        stats['disconnected'] += 1
+    finally:
+        writer.close()
+
+
+async def poller(host, port, path, interval, latencies, stats, stop):
+    """Request `path` every `interval` seconds, recording each response time"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+            status, headers = await read_response_head(reader)
+            async for _ in read_body_chunks(reader, headers):
+                pass
+            writer.close()
+            if status >= 400:
+                stats['request_errors'] += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            stats['request_errors'] += 1
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+async def run_step(host, port, viewers, pollers, poll_path, poll_interval, duration, ramp):
+    """
+    Measure one load level
+
+    Returns:
+        Dict of the step's counters and latency percentiles
+    """
+    stats = {'connected': 0, 'connect_errors': 0, 'disconnected': 0, 'frames': 0,
+             'frames_skipped': 0, 'request_errors': 0}
+    latencies = []
+    stop = asyncio.Event()
+
+    tasks = []
+    for _ in range(viewers):
+        tasks.append(asyncio.create_task(viewer(host, port, stats)))
+        # Spread the connects over the ramp time instead of one burst
+        await asyncio.sleep(ramp / max(viewers, 1))
+    tasks += [asyncio.create_task(poller(host, port, poll_path, poll_interval, latencies, stats, stop))
+              for _ in range(pollers)]
+
+    # Count only frames received after all viewers are connected
+    await asyncio.sleep(1.0)
+    stats['frames'] = 0
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for task in tasks[:viewers]:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {
+        'viewers': viewers,
+        'connected': stats['connected'],
+        'connect_errors': stats['connect_errors'],
+        'disconnected': stats['disconnected'],
+        'frames_per_viewer_s': round(stats['frames'] / max(stats['connected'], 1) / elapsed, 2),
+        'frames_skipped': stats['frames_skipped'],
+        'requests': len(latencies),
+        'request_errors': stats['request_errors'],
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        'max_ms': round(max(latencies) * 1000, 1) if latencies else None
+    }
+
+
+def print_profile(results):
+    columns = ['viewers', 'connected', 'connect_errors', 'disconnected', 'frames_per_viewer_s',
+               'frames_skipped', 'requests', 'request_errors', 'p50_ms', 'p95_ms', 'max_ms']
+    print(' | '.join(columns))
+    print(' | '.join('---' for _ in columns))
+    for result in results:
+        print(' | '.join(str(result[column]) for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load profile of a running FleX server')
+    parser.add_argument('--url', default='http://localhost:8000', help='Base URL of the server')
+    parser.add_argument('--viewers', default='10,50,100,200',
+                        help='Comma-separated numbers of concurrent /api/stream viewers, one step each')
+    parser.add_argument('--pollers', type=int, default=10, help='Concurrent clients polling --poll-path')
+    parser.add_argument('--poll-path', default='/api/live_data')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='Seconds between polls per poller')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds measured per step')
+    parser.add_argument('--ramp', type=float, default=5, help='Seconds over which viewers connect')
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+
+    results = []
+    for viewers in [int(v) for v in args.viewers.split(',')]:
+        print(f"[INFO] Measuring {viewers} viewers and {args.pollers} pollers for {args.duration}s")
+        result = asyncio.run(run_step(host, port, viewers, args.pollers, args.poll_path,
+                                      args.poll_interval, args.duration, args.ramp))
+        results.append(result)
+    print_profile(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,11 @@
+from multiprocessing import parent_process
+
 from app import create_app
 
-app = create_app()
+# Spawned model workers re-import the main module; only the main process
+# builds the app (which WSGI servers and `flask run` load from here)
+if parent_process() is None:
+    app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,140 @@
+"""
+Production entry point: serves the app with gevent instead of the Flask
+development server.
+
+    python serve.py --host 0.0.0.0 --port 8000
+
+Every request, Server-Sent Events stream and long poll runs in its own
+greenlet, so thousands of idle or streaming connections cost only memory.
+The standard library is monkey-patched before anything else is imported,
+which turns the device, scheduler and streaming threads into greenlets too;
+their blocking calls (serial/socket reads, sleeps, locks and condition waits)
+then yield to each other instead of blocking the server.
+
+CPU-heavy work (TSFEL feature extraction, TensorFlow) would still stall the
+event loop, so by default the models run in a model server process
+(app/utils/model_server.py) that this script starts and stops with the web
+server. Pass --model-server-socket to use one that is already running.
+Requests to it go through a patched socket (model_server.SocketConnection),
+so a greenlet waiting for a prediction doesn't hold up the others.
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+
+import gevent
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+
+DEFAULT_MODEL_SOCKET = '/tmp/flex-models.sock'
+
+
+def start_model_server(socket_path, timeout=60):
+    """
+    Start the model server in a subprocess and wait until it listens
+
+    Returns:
+        The subprocess.Popen of the server
+    """
+    # A socket left behind by a previous run would look like a ready server
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    process = subprocess.Popen([sys.executable, '-m', 'app.utils.model_server', '--socket', socket_path],
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    deadline = time.time() + timeout
+    while not os.path.exists(socket_path):
+        if process.poll() is not None:
+            raise RuntimeError(f"Model server exited with code {process.returncode}")
+        if time.time() > deadline:
+            process.terminate()
+            raise RuntimeError(f"Model server did not create {socket_path} within {timeout}s")
+        time.sleep(0.1)
+    print(f"[INFO] Model server started (pid {process.pid}) on {socket_path}")
+    return process
+
+
+def pin_process(pid, cores, name):
+    """Pin a process to a set of cores, if any are configured"""
+    if cores and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(pid, cores)
+            print(f"[INFO] Pinned {name} to CPUs {sorted(cores)}")
+        except OSError as e:
+            print(f"[WARNING] Could not pin {name} to CPUs {sorted(cores)}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve FleX with gevent')
+    parser.add_argument('--host', default=os.environ.get('FLEX_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('FLEX_PORT', 8000)))
+    parser.add_argument('--max-connections', type=int,
+                        default=int(os.environ.get('FLEX_MAX_CONNECTIONS', 1000)),
+                        help='Concurrent connections (greenlets) accepted; further clients wait')
+    parser.add_argument('--model-server-socket', default=os.environ.get('FLEX_MODEL_SERVER_SOCKET'),
+                        help='Use an already running model server instead of starting one')
+    parser.add_argument('--in-process-models', action='store_true',
+                        help="Don't use a model server (inference then blocks the event loop "
+                             "unless FLEX_ML_EXECUTION_MODE=process)")
+    parser.add_argument('--access-log', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    # Config reads the environment when imported, so the model server socket
+    # is set before the app is imported
+    model_server = None
+    if not args.in_process_models:
+        if args.model_server_socket:
+            if not os.environ.get('FLEX_MODEL_SERVER_AUTHKEY'):
+                parser.error('FLEX_MODEL_SERVER_AUTHKEY must be set to the running model server\'s key')
+            os.environ['FLEX_MODEL_SERVER_SOCKET'] = args.model_server_socket
+        else:
+            # A fresh secret per run, inherited by the model server subprocess
+            os.environ.setdefault('FLEX_MODEL_SERVER_AUTHKEY', secrets.token_hex(32))
+            os.environ['FLEX_MODEL_SERVER_SOCKET'] = DEFAULT_MODEL_SOCKET
+            model_server = start_model_server(DEFAULT_MODEL_SOCKET)
+    elif os.environ.get('FLEX_ML_EXECUTION_MODE', 'thread') == 'thread':
+        print("[WARNING] Models run in the server process; feature extraction and prediction "
+              "will stall every connection while they run")
+
+    from config import Config, ProductionConfig
+    from app import create_app
+    from app.utils.resource_governor import parse_cpu_list
+
+    # Component core sets apply per process here (see ProductionConfig)
+    web_cores = (parse_cpu_list(Config.WEB_CPUS) or set()) | (parse_cpu_list(Config.INGEST_CPUS) or set())
+    pin_process(0, web_cores, 'web server')
+    if model_server:
+        pin_process(model_server.pid, parse_cpu_list(Config.INFERENCE_CPUS), 'model server')
+
+    app = create_app(ProductionConfig)
+    server = WSGIServer((args.host, args.port), app,
+                        spawn=Pool(args.max_connections),
+                        log='default' if args.access_log else None)
+
+    def shutdown(*_):
+        print("[INFO] Shutting down")
+        server.stop(timeout=5)
+
+    gevent.signal_handler(signal.SIGTERM, shutdown)
+    print(f"[INFO] Serving on http://{args.host}:{args.port} (max {args.max_connections} connections)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        shutdown()
+    finally:
+        if model_server and model_server.poll() is None:
+            model_server.terminate()
+            try:
+                model_server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                model_server.kill()
+
+
+if __name__ == '__main__':
+    main()